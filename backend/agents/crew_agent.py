@@ -1,38 +1,48 @@
 import sys
 sys.path.append('')
 import os
-os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
 import asyncio
-from crewai import Agent,Task,Process,Crew
-from agents.llm import llm_model
+import functools
+import re
+import threading
+from typing import Dict, List, Union
+from agents.day_planner import generate_by_day
+from agents.llm import MODEL_NAME, get_llm, import_crewai, stream_completion
+from agents.llm_router import llm_router
+from agents.itinerary_cache import itinerary_cache, itinerary_cache_key, itinerary_ttl
 from datetime import datetime
+from fastapi import HTTPException
 from utils.logger import get_logger
+from utils.metrics import stage
+from utils.scheduler import scheduler, SchedulerRejected
 
 logger = get_logger(__name__)
 
 
-async def generate_itinerary(must_visit_locations:str, flights_text:str, hotels_text:str, check_in_date, check_out_date):
-    """Generate a detailed travel itinerary based on flight and hotel information."""
-    try:
-        # Convert the string dates to datetime objects
-        check_in = datetime.strptime(check_in_date, "%Y-%m-%d")
-        check_out = datetime.strptime(check_out_date, "%Y-%m-%d")
+AGENT_ROLE = "AI Travel Planner"
+AGENT_GOAL = "Create a detailed itinerary for the user based on flight and hotel information"
+AGENT_BACKSTORY = "AI travel expert generating a day-by-day itinerary including flight details, hotel stays, and must-visit locations in the destination."
+EXPECTED_OUTPUT = "A well-structured, visually appealing itinerary in markdown format, including flight, hotel, and day-wise breakdown with emojis, headers, and bullet points."
 
-        # Calculate the difference in days
-        days = (check_out - check_in).days
 
-        model = llm_model
+class ItineraryGenerationFailed(HTTPException):
+    """Raised when no itinerary could be generated, so callers never store or reuse a failed plan."""
+
+    def __init__(self):
+        super().__init__(status_code=502, detail="Unable to generate itinerary due to an error. Please try again later.")
 
-        analyze_agent = Agent(
-            role="AI Travel Planner",
-            goal="Create a detailed itinerary for the user based on flight and hotel information",
-            backstory="AI travel expert generating a day-by-day itinerary including flight details, hotel stays, and must-visit locations in the destination.",
-            llm=model,
-            verbose=False
-        )
 
-        analyze_task = Task(
-            description=f"""
+def trip_days(check_in_date: str, check_out_date: str) -> int:
+    """Number of days between the hotel check-in and check-out dates (YYYY-MM-DD)."""
+    check_in = datetime.strptime(check_in_date, "%Y-%m-%d")
+    check_out = datetime.strptime(check_out_date, "%Y-%m-%d")
+    return (check_out - check_in).days
+
+
+def build_itinerary_prompt(must_visit_locations: str, flights_text: str, hotels_text: str, check_in_date, check_out_date) -> str:
+    """Render the itinerary task description handed to the planner agent."""
+    days = trip_days(check_in_date, check_out_date)
+    return f"""
             Based on the following details, create a {days}-day itinerary for the user:
 
             **Flight Details**:
@@ -60,28 +70,366 @@ async def generate_itinerary(must_visit_locations:str, flights_text:str, hotels_
             - Use bullet points for listing activities
             - Include estimated timings for each activity
             - Format the itinerary to be visually appealing and easy to read
-            """,
+            """
+
+
+def build_planner_messages(prompt: str) -> list:
+    """Chat messages equivalent to what the CrewAI planner agent sends for ``prompt``."""
+    return [
+        {"role": "system", "content": f"You are {AGENT_ROLE}. {AGENT_BACKSTORY}\nYour personal goal is: {AGENT_GOAL}"},
+        {"role": "user", "content": f"{prompt}\n\nThis is the expected criteria for your final answer: {EXPECTED_OUTPUT}"},
+    ]
+
+
+def build_planner_crew(model=None):
+    """Build the single-agent planner crew once; the rendered prompt is passed in as a kickoff input."""
+    crewai = import_crewai()
+    model = model or get_llm()
+    with stage("agent_build"):
+        analyze_agent = crewai.Agent(
+            role=AGENT_ROLE,
+            goal=AGENT_GOAL,
+            backstory=AGENT_BACKSTORY,
+            llm=model,
+            verbose=False
+        )
+
+        analyze_task = crewai.Task(
+            description="{itinerary_prompt}",
             agent=analyze_agent,
-            expected_output="A well-structured, visually appealing itinerary in markdown format, including flight, hotel, and day-wise breakdown with emojis, headers, and bullet points."
+            expected_output=EXPECTED_OUTPUT
         )
 
-        itinerary_planner_crew = Crew(
+        return crewai.Crew(
             agents=[analyze_agent],
             tasks=[analyze_task],
-            process=Process.sequential,
+            process=crewai.Process.sequential,
             verbose=False
         )
 
-        crew_results = await asyncio.to_thread(itinerary_planner_crew.kickoff)
 
-        # Handle different possible return types from CrewAI
-        if hasattr(crew_results, 'outputs') and crew_results.outputs:
-            return crew_results.outputs[0]
-        elif hasattr(crew_results, 'get'):
-            return crew_results.get("AI Travel Planner", "No itinerary available.")
+def crew_output_text(crew_results) -> str:
+    """Handle different possible return types from CrewAI."""
+    if hasattr(crew_results, 'outputs') and crew_results.outputs:
+        return crew_results.outputs[0]
+    elif hasattr(crew_results, 'get'):
+        return crew_results.get(AGENT_ROLE, "No itinerary available.")
+    else:
+        return str(crew_results)
+
+
+class PlannerPool:
+    """Pool of pre-built planner crews reused across requests.
+
+    ``Crew.kickoff(inputs=...)`` rewrites the task description in place, so each
+    crew serves one request at a time; the pool holds one per concurrent LLM call.
+    Crews are built on first use in a worker thread (CrewAI is imported then), or
+    ahead of time by ``warm()``.
+    """
+
+    def __init__(self, size: int, factory=build_planner_crew):
+        self.size = max(1, size)
+        self.factory = factory
+        self._idle = []
+        self._built = 0
+        self._lock = threading.Lock()
+        self._slots = None
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self._built += 1
+        return self.factory()
+
+    def _checkin(self, crew) -> None:
+        with self._lock:
+            self._idle.append(crew)
+
+    def warm(self) -> None:
+        """Build the remaining crews up front (blocking; call from a thread)."""
+        while True:
+            with self._lock:
+                if self._built >= self.size:
+                    return
+                self._built += 1
+            self._checkin(self.factory())
+
+    def _kickoff(self, prompt: str):
+        crew = self._checkout()
+        try:
+            return crew.kickoff(inputs={"itinerary_prompt": prompt})
+        finally:
+            self._checkin(crew)
+
+    async def run(self, prompt: str) -> str:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            crew_results = await asyncio.to_thread(self._kickoff, prompt)
+        return crew_output_text(crew_results)
+
+
+planner_pool = PlannerPool(size=int(os.getenv("LLM_MAX_CONCURRENCY", "4")))
+
+
+def execution_mode() -> str:
+    """'crew' (default) runs the pooled CrewAI planner, 'direct' sends the prompt straight to the LLM."""
+    return os.getenv("ITINERARY_EXECUTION_MODE", "crew").lower()
+
+
+def planner_model_name() -> str:
+    """Model identity used in itinerary cache keys."""
+    return llm_router.cache_name if llm_router is not None else MODEL_NAME
+
+
+async def run_direct(prompt: str, model=None, days=None) -> str:
+    """Send the rendered prompt straight to the LLM, bypassing Crew orchestration.
+
+    With LLM_ROUTER_MODELS configured and no explicit ``model``, the router picks
+    the model, preferring cheap ones for trips of ``days`` up to its short-trip limit.
+    """
+    if model is None and llm_router is not None:
+        return await llm_router.complete(build_planner_messages(prompt), days=days)
+    if model is None:
+        model = await asyncio.to_thread(get_llm)
+    return await asyncio.to_thread(model.call, build_planner_messages(prompt))
+
+
+def generation_mode() -> str:
+    """'single' (default) writes the itinerary in one completion, 'per_day' writes a skeleton, then each day concurrently."""
+    return os.getenv("ITINERARY_GENERATION_MODE", "single").lower()
+
+
+async def _generate_per_day(prompt: str, must_visit_locations: str, flights_text: str, hotels_text: str,
+                            check_in_date, check_out_date) -> str:
+    """Per-day generation; falls back to one single completion if no skeleton can be produced.
+
+    Per-day mode needs a skeleton call plus one call per day. When the LLM rate
+    limit cannot admit them all in time, or the scheduler rejects one of them,
+    the itinerary is written in one call instead of failing the plan.
+    """
+    days = trip_days(check_in_date, check_out_date)
+    if not scheduler.fits("llm", max(1, days) + 1):
+        logger.info(f"Not enough LLM budget for {max(1, days) + 1} per-day calls, generating the itinerary in one call")
+    else:
+        try:
+            # Every skeleton and day call keeps the trip length for the router's cheap-tier choice
+            return await generate_by_day(functools.partial(run_direct, days=days), must_visit_locations, flights_text, hotels_text,
+                                         check_in_date, check_out_date, days)
+        except SchedulerRejected as e:
+            logger.warning(f"Per-day generation was rejected ({e.detail}), generating the itinerary in one call")
+        except Exception as e:
+            logger.warning(f"Per-day generation failed, generating the itinerary in one call: {str(e)}")
+    async with scheduler.slot("llm"), stage("llm"):
+        return await run_direct(prompt, days=days)
+
+
+async def generate_itinerary(must_visit_locations:str, flights_text:str, hotels_text:str, check_in_date, check_out_date):
+    """Generate a detailed travel itinerary based on flight and hotel information.
+
+    Raises ``ItineraryGenerationFailed`` (a 502) when the model fails or returns nothing.
+    """
+    try:
+        prompt = build_itinerary_prompt(must_visit_locations, flights_text, hotels_text, check_in_date, check_out_date)
+        cache_key = itinerary_cache_key(prompt, planner_model_name())
+        cached = itinerary_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving itinerary from cache")
+            return cached
+
+        if generation_mode() == "per_day":
+            itinerary = await _generate_per_day(prompt, must_visit_locations, flights_text, hotels_text, check_in_date, check_out_date)
         else:
-            return str(crew_results)
+            async with scheduler.slot("llm"), stage("llm"):
+                # A crew is bound to one LLM, so routed generation always goes direct
+                if execution_mode() == "direct" or llm_router is not None:
+                    itinerary = await run_direct(prompt, days=trip_days(check_in_date, check_out_date))
+                else:
+                    itinerary = await planner_pool.run(prompt)
+
+        if not isinstance(itinerary, str) or not itinerary.strip():
+            raise ValueError("the model returned an empty itinerary")
+        itinerary_cache.set(cache_key, itinerary, itinerary_ttl())
+        return itinerary
 
+    except SchedulerRejected:
+        raise
     except Exception as e:
         logger.exception(f"Error generating itinerary: {str(e)}")
-        return "Unable to generate itinerary due to an error. Please try again later."
\ No newline at end of file
+        raise ItineraryGenerationFailed() from e
+
+
+async def stream_itinerary(must_visit_locations: str, flights_text: str, hotels_text: str, check_in_date, check_out_date):
+    """Stream the itinerary as markdown text deltas straight from the LLM.
+
+    Sends the same prompt the planner agent would, but bypasses ``crew.kickoff()``
+    so the first tokens reach the client as soon as the model produces them.
+    """
+    prompt = build_itinerary_prompt(must_visit_locations, flights_text, hotels_text, check_in_date, check_out_date)
+    cache_key = itinerary_cache_key(prompt, planner_model_name())
+    cached = itinerary_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    async with scheduler.slot("llm"):
+        with stage("llm"):
+            messages = build_planner_messages(prompt)
+            if llm_router is not None:
+                deltas = llm_router.stream(messages, days=trip_days(check_in_date, check_out_date))
+            else:
+                deltas = stream_completion(messages)
+            async for delta in deltas:
+                chunks.append(delta)
+                yield delta
+
+    itinerary = "".join(chunks)
+    if itinerary.strip():
+        itinerary_cache.set(cache_key, itinerary, itinerary_ttl())
+
+
+def build_revision_prompt(prompt: str, itinerary: str, headings: List[str]) -> str:
+    """Ask for only the listed sections of an earlier itinerary, rewritten for the updated details in ``prompt``."""
+    listed = "\n".join(f"- {heading}" for heading in headings)
+    return (
+        f"{prompt.strip()}\n\n"
+        "An itinerary was already written for an earlier version of these details:\n\n"
+        f"{itinerary.strip()}\n\n"
+        "Some of the flight, hotel or attraction details above have changed since. Rewrite only the sections "
+        "listed below so they match the new details and stay consistent with the rest of the itinerary. "
+        "Return just these sections, in this order, each starting with its original heading line unchanged:\n"
+        f"{listed}"
+    )
+
+
+async def revise_sections(itinerary: str, headings: List[str], must_visit_locations: str, flights_text: str,
+                          hotels_text: str, check_in_date, check_out_date) -> str:
+    """Regenerate the given sections of an itinerary; returns just the rewritten sections as markdown."""
+    prompt = build_itinerary_prompt(must_visit_locations, flights_text, hotels_text, check_in_date, check_out_date)
+    revision_prompt = build_revision_prompt(prompt, itinerary, headings)
+    cache_key = itinerary_cache_key(revision_prompt, planner_model_name())
+    cached = itinerary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    async with scheduler.slot("llm"), stage("llm"):
+        revised = await run_direct(revision_prompt)
+    if isinstance(revised, str) and revised.strip():
+        itinerary_cache.set(cache_key, revised, itinerary_ttl())
+    return revised
+
+
+_BATCH_SEPARATOR = re.compile(r"^\s*=+\s*ITINERARY\s+(\d+)\s*=+\s*$", re.MULTILINE)
+_TITLE_HEADING = re.compile(r"^#\s+\S", re.MULTILINE)
+_DAY_HEADING = re.compile(r"^#{1,3}\s+.*?\bDay\s+(\d+)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def build_batch_prompt(prompts: List[str]) -> str:
+    """Combine several itinerary prompts into one request with numbered, separated answers."""
+    sections = [
+        f"You will write {len(prompts)} independent itineraries, one per request below. "
+        "Start each itinerary with a line of the form `=== ITINERARY <n> ===` using the request number, "
+        "then the itinerary itself. Do not add anything before the first separator."
+    ]
+    for index, prompt in enumerate(prompts, start=1):
+        sections.append(f"--- REQUEST {index} ---\n{prompt.strip()}")
+    return "\n\n".join(sections)
+
+
+def split_batch_output(text: str, count: int) -> Dict[int, str]:
+    """Split a combined answer back into itineraries keyed by 0-based request index."""
+    parts = _BATCH_SEPARATOR.split(text)
+    results = {}
+    # parts = [preamble, number, body, number, body, ...]
+    for number, body in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        if 0 <= index < count and body.strip() and index not in results:
+            results[index] = body.strip()
+    return results
+
+
+def itinerary_is_complete(text: str, days: int) -> bool:
+    """Whether a batched answer has its ``# title`` and a heading for every day, i.e. was not truncated or mis-split."""
+    found = {int(day) for day in _DAY_HEADING.findall(text)}
+    return bool(_TITLE_HEADING.search(text)) and all(day in found for day in range(1, days + 1))
+
+
+def batch_group_size() -> int:
+    """Itineraries generated per combined LLM call (ITINERARY_BATCH_SIZE, default: 3)."""
+    return max(1, int(os.getenv("ITINERARY_BATCH_SIZE", "3")))
+
+
+async def _generate_alone(item: dict) -> Union[str, HTTPException]:
+    try:
+        return await generate_itinerary(**item)
+    except HTTPException as he:
+        return he
+
+
+async def _generate_group(group: List[dict]) -> List[Union[str, HTTPException]]:
+    """Generate a group of itineraries with one LLM call, falling back per item if its part is missing or incomplete.
+
+    An item whose own fallback fails gets its exception in place of the itinerary.
+    """
+    if len(group) == 1:
+        return [await _generate_alone(group[0])]
+
+    prompts = [build_itinerary_prompt(**item) for item in group]
+    parsed: Dict[int, str] = {}
+    try:
+        async with scheduler.slot("llm"), stage("llm"):
+            combined = await run_direct(build_batch_prompt(prompts))
+        parsed = split_batch_output(combined, len(group))
+    except SchedulerRejected:
+        raise
+    except Exception as e:
+        logger.warning(f"Batched itinerary generation failed, retrying individually: {str(e)}")
+
+    results = []
+    for index, (item, prompt) in enumerate(zip(group, prompts)):
+        if index in parsed and not itinerary_is_complete(parsed[index], trip_days(item["check_in_date"], item["check_out_date"])):
+            logger.warning(f"Batched itinerary {index + 1} of {len(group)} is incomplete, generating it individually")
+            del parsed[index]
+        if index in parsed:
+            itinerary_cache.set(itinerary_cache_key(prompt, planner_model_name()), parsed[index], itinerary_ttl())
+            results.append(parsed[index])
+        else:
+            results.append(await _generate_alone(item))
+    return results
+
+
+async def generate_itineraries(items: List[dict]) -> List[Union[str, HTTPException]]:
+    """Generate itineraries for many requests using as few LLM calls as possible.
+
+    Each item holds the keyword arguments of ``generate_itinerary``. Cached and
+    duplicate prompts are resolved without a call; the rest are packed into
+    groups of ``ITINERARY_BATCH_SIZE`` that share one completion each. Failures
+    don't spread: an item that could not be generated, or every item of a group
+    the scheduler rejected, gets the ``HTTPException`` instead of an itinerary.
+    """
+    results: List[Union[str, HTTPException]] = [None] * len(items)
+    pending: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        prompt = build_itinerary_prompt(**item)
+        cached = itinerary_cache.get(itinerary_cache_key(prompt, planner_model_name()))
+        if cached is not None:
+            results[index] = cached
+        else:
+            pending.setdefault(prompt, []).append(index)
+
+    unique = [indexes for indexes in pending.values()]
+    size = batch_group_size()
+    groups = [unique[start:start + size] for start in range(0, len(unique), size)]
+    outputs = await asyncio.gather(*(_generate_group([items[indexes[0]] for indexes in group]) for group in groups),
+                                   return_exceptions=True)
+    for group, group_outputs in zip(groups, outputs):
+        if isinstance(group_outputs, HTTPException):
+            group_outputs = [group_outputs] * len(group)
+        elif isinstance(group_outputs, BaseException):
+            raise group_outputs
+        for indexes, itinerary in zip(group, group_outputs):
+            for index in indexes:
+                results[index] = itinerary
+    return results
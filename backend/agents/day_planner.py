@@ -0,0 +1,225 @@
+import sys
+sys.path.append('')
+import asyncio
+import json
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+
+from utils.logger import get_logger
+from utils.metrics import stage
+from utils.scheduler import scheduler, SchedulerRejected
+
+logger = get_logger(__name__)
+
+# A trip is planned in two steps: a short JSON skeleton assigning attractions to
+# days, then each day's detail written by its own LLM call. The day calls run
+# concurrently, so a long trip takes about as long as its slowest day.
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+_DAY_HEADING = re.compile(r"^##\s+Day\s+(\d+)\b", re.IGNORECASE)
+_TOP_HEADING = re.compile(r"^#{1,2}\s")
+
+
+def day_parallelism() -> int:
+    """Day sections generated at once (ITINERARY_DAY_PARALLEL, default: 4)."""
+    return max(1, int(os.getenv("ITINERARY_DAY_PARALLEL", "4")))
+
+
+def day_retries() -> int:
+    """Extra attempts for a skeleton or day call that fails (ITINERARY_DAY_RETRIES, default: 2)."""
+    return max(0, int(os.getenv("ITINERARY_DAY_RETRIES", "2")))
+
+
+def trip_dates(check_in_date: str, days: int) -> List[str]:
+    start = datetime.strptime(check_in_date, "%Y-%m-%d")
+    return [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)]
+
+
+def build_skeleton_prompt(must_visit_locations: str, flights_text: str, hotels_text: str,
+                          check_in_date: str, check_out_date: str, days: int) -> str:
+    dates = ", ".join(f"Day {i} = {day}" for i, day in enumerate(trip_dates(check_in_date, days), start=1))
+    return f"""
+            Outline a {days}-day trip from {check_in_date} to {check_out_date} ({dates}).
+
+            **Flight Details**:
+            {flights_text}
+
+            **Hotel Details**:
+            {hotels_text}
+
+            **Must-visit locations**: {must_visit_locations}
+
+            Pick the best flight and hotel, and spread the best attractions over the days so that
+            each day is realistic and nearby sights share a day. Answer with JSON only, no prose:
+            {{"title": "<trip title with an emoji>",
+              "overview": "<markdown bullets: chosen flight arrival/departure, hotel with check-in/check-out>",
+              "days": [{{"day": 1, "theme": "<short theme>", "attractions": ["<name>", ...]}}, ...]}}
+            """
+
+
+def parse_skeleton(text: str, days: int) -> Dict[str, Any]:
+    """Validate the skeleton JSON; every day 1..days gets an entry (possibly without attractions)."""
+    match = _JSON_OBJECT.search(text or "")
+    if not match:
+        raise ValueError("skeleton is not JSON")
+    data = json.loads(match.group())
+    planned = {}
+    for entry in data.get("days") or []:
+        if isinstance(entry, dict) and isinstance(entry.get("day"), int):
+            planned.setdefault(entry["day"], entry)
+    if not planned:
+        raise ValueError("skeleton has no days")
+    return {
+        "title": str(data.get("title") or "Your Trip Itinerary").lstrip("# ").strip(),
+        "overview": str(data.get("overview") or "").strip(),
+        "days": [
+            {
+                "day": day,
+                "theme": str(planned.get(day, {}).get("theme") or "Explore").strip(),
+                "attractions": [str(name) for name in planned.get(day, {}).get("attractions") or []],
+            }
+            for day in range(1, days + 1)
+        ],
+    }
+
+
+def build_day_prompt(skeleton: Dict[str, Any], day: Dict[str, Any], date: str, days: int,
+                     flights_text: str, hotels_text: str) -> str:
+    outline = "\n".join(
+        f"- Day {entry['day']}: {entry['theme']} ({', '.join(entry['attractions']) or 'free'})" for entry in skeleton["days"]
+    )
+    if day["day"] == 1:
+        extra = "This is the arrival day: include the flight arrival and hotel check-in."
+    elif day["day"] == days:
+        extra = "This is the departure day: include hotel check-out and the flight departure."
+    else:
+        extra = ""
+    return f"""
+            You are writing one day of the trip "{skeleton['title']}".
+
+            **Trip overview**:
+            {skeleton['overview']}
+
+            **Plan for all days** (do not use other days' attractions):
+            {outline}
+
+            **Flight Details**:
+            {flights_text}
+
+            **Hotel Details**:
+            {hotels_text}
+
+            Write only Day {day['day']} ({date}): {day['theme']}, visiting {', '.join(day['attractions']) or 'places of your choice'}.
+            {extra}
+
+            📝 **Format Requirements**:
+            - Start with the heading `## Day {day['day']}: {day['theme']}` and write nothing before it
+            - Use ### for sections such as Morning, Afternoon and Evening
+            - Use bullet points with estimated timings and emojis (🏛️ for landmarks, 🍽️ for restaurants, etc.)
+            - Include restaurant recommendations for meals and local transportation tips
+            """
+
+
+def normalize_day(text: str, day: Dict[str, Any]) -> str:
+    """Make a day's markdown start with its ``## Day N`` heading and contain no top-level headings."""
+    lines = (text or "").strip().splitlines()
+    # Drop any preamble before the day heading the model was asked to start with
+    for index, line in enumerate(lines):
+        if _DAY_HEADING.match(line.strip()):
+            lines = lines[index:]
+            break
+    else:
+        lines.insert(0, f"## Day {day['day']}: {day['theme']}")
+    # Later # / ## headings would split the merged itinerary into extra sections
+    for index in range(1, len(lines)):
+        if _TOP_HEADING.match(lines[index]):
+            lines[index] = f"### {lines[index].lstrip('#').strip()}"
+    return "\n".join(lines).strip()
+
+
+def fallback_day(day: Dict[str, Any], date: str) -> str:
+    """Day section built from the skeleton alone when every attempt for the day failed."""
+    lines = [f"## Day {day['day']}: {day['theme']}", f"📅 {date}"]
+    lines += [f"- 🏛️ {name}" for name in day["attractions"]] or ["- 🚶 Free time to explore"]
+    return "\n".join(lines)
+
+
+def merge_itinerary(skeleton: Dict[str, Any], day_sections: List[str]) -> str:
+    """Assemble the markdown the PDF renderer expects: ``# title``, the overview, then ``## Day N`` sections."""
+    parts = [f"# {skeleton['title']}"]
+    if skeleton["overview"]:
+        parts.append(skeleton["overview"])
+    parts.extend(day_sections)
+    return "\n\n".join(parts)
+
+
+async def _call(complete: Callable[[str], Awaitable[str]], prompt: str) -> str:
+    async with scheduler.slot("llm"), stage("llm"):
+        return await complete(prompt)
+
+
+async def _with_retries(what: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+    retries = day_retries()
+    for number in range(retries + 1):
+        try:
+            return await attempt()
+        except SchedulerRejected:
+            raise
+        except Exception as e:
+            if number == retries:
+                raise
+            logger.warning(f"{what} failed ({e}), retrying ({number + 1}/{retries})")
+            await asyncio.sleep(0.5 * 2 ** number)
+
+
+async def generate_by_day(complete: Callable[[str], Awaitable[str]], must_visit_locations: str, flights_text: str,
+                          hotels_text: str, check_in_date: str, check_out_date: str, days: int) -> str:
+    """Generate an itinerary as a skeleton plus concurrently written days.
+
+    ``complete`` sends one prompt to the LLM and returns its text. A day that
+    keeps failing is retried on its own and, as a last resort, filled in from
+    the skeleton; only a skeleton that cannot be produced, or a call the
+    scheduler rejects, fails the whole call.
+    """
+    days = max(1, days)
+    skeleton_prompt = build_skeleton_prompt(must_visit_locations, flights_text, hotels_text, check_in_date, check_out_date, days)
+
+    async def skeleton_attempt():
+        return parse_skeleton(await _call(complete, skeleton_prompt), days)
+
+    skeleton = await _with_retries("Itinerary skeleton", skeleton_attempt)
+    dates = trip_dates(check_in_date, days)
+    semaphore = asyncio.Semaphore(day_parallelism())
+
+    async def write_day(day):
+        prompt = build_day_prompt(skeleton, day, dates[day["day"] - 1], days, flights_text, hotels_text)
+
+        async def day_attempt():
+            text = await _call(complete, prompt)
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("empty day")
+            return normalize_day(text, day)
+
+        async with semaphore:
+            try:
+                return await _with_retries(f"Day {day['day']}", day_attempt)
+            except SchedulerRejected:
+                raise
+            except Exception:
+                logger.exception(f"Day {day['day']} could not be generated; using the skeleton outline")
+                return fallback_day(day, dates[day["day"] - 1])
+
+    tasks = [asyncio.ensure_future(write_day(day)) for day in skeleton["days"]]
+    try:
+        sections = await asyncio.gather(*tasks)
+    except BaseException:
+        # A rejected day fails the whole call; don't keep spending on the others
+        for task in tasks:
+            task.cancel()
+        raise
+    return merge_itinerary(skeleton, list(sections))
+
+
+__all__ = ["generate_by_day", "parse_skeleton", "merge_itinerary", "normalize_day", "build_skeleton_prompt", "build_day_prompt"]
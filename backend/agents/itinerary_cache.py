@@ -0,0 +1,42 @@
+import sys
+sys.path.append('')
+import hashlib
+import os
+import re
+
+from utils.cache import cache_from_env
+
+# Generated itineraries stay useful for a while; flight/hotel prices in them age the fastest.
+itinerary_cache = cache_from_env("ITINERARY_CACHE", namespace="itinerary", default_max_entries=512)
+
+_PRICE_PATTERN = re.compile(r"\$\s*\$?\s*\d[\d,]*(?:\.\d+)?")
+_NUMBER_AFTER_PRICE_LABEL = re.compile(r"(\*\*(?:Price|Cost per night):\*\*\s*)[^\n]*", re.IGNORECASE)
+
+
+def itinerary_ttl() -> float:
+    """TTL in seconds for cached itineraries (ITINERARY_CACHE_TTL, default: 6 hours, 0 disables)."""
+    return float(os.getenv("ITINERARY_CACHE_TTL", str(6 * 60 * 60)))
+
+
+def near_duplicate_mode() -> bool:
+    """Whether volatile fields such as prices are ignored when hashing (ITINERARY_CACHE_NEAR_DUPLICATE)."""
+    return os.getenv("ITINERARY_CACHE_NEAR_DUPLICATE", "false").lower() in ("1", "true", "yes")
+
+
+def normalize_prompt(prompt: str, near_duplicate: bool = False) -> str:
+    """Canonical form of a rendered prompt: per-line whitespace collapsed, prices masked in near-duplicate mode."""
+    lines = (" ".join(line.split()) for line in prompt.strip().splitlines())
+    canonical = "\n".join(line for line in lines if line)
+    if near_duplicate:
+        canonical = _NUMBER_AFTER_PRICE_LABEL.sub(r"\1<price>", canonical)
+        canonical = _PRICE_PATTERN.sub("<price>", canonical)
+    return canonical
+
+
+def itinerary_cache_key(prompt: str, model_name: str, near_duplicate: bool = None) -> str:
+    """Hash of the model name and the canonical rendered prompt."""
+    if near_duplicate is None:
+        near_duplicate = near_duplicate_mode()
+    canonical = normalize_prompt(prompt, near_duplicate)
+    digest = hashlib.sha256(f"{model_name}\n{canonical}".encode("utf-8")).hexdigest()
+    return f"{'near' if near_duplicate else 'exact'}:{digest}"
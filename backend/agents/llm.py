@@ -1,11 +1,93 @@
-from crewai import LLM
+import sys
+sys.path.append('')
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv
+from utils.fixtures import FixtureStore, replay_latency
 load_dotenv()
 
+# CrewAI and LiteLLM take seconds to import, so they are only loaded on first
+# use (or by the start-up warm-up), never when this module is imported.
+
 api_key = os.getenv("GEMINI_API_KEY")
 
-llm_model = LLM(
-    model='gemini/gemini-2.0-flash',
-    api_key=api_key
-)
\ No newline at end of file
+MODEL_NAME = 'gemini/gemini-2.0-flash'
+
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def import_crewai():
+    """Import CrewAI with its telemetry disabled."""
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    import crewai
+    return crewai
+
+
+def llm_from_env():
+    """Build the planner LLM.
+
+    Honors:
+    - LLM_MODE: 'live' (default), 'record' to also save completions as fixtures, or 'replay' to serve them offline
+    - LLM_FIXTURES_DIR: fixture directory for record/replay (default: fixtures/llm)
+    - REPLAY_LATENCY_MS: artificial delay added to each replayed completion (default: 0)
+    """
+    mode = os.getenv("LLM_MODE", "live").lower()
+    fixtures = FixtureStore(os.getenv("LLM_FIXTURES_DIR", os.path.join("fixtures", "llm")))
+    if mode == "record":
+        from agents.replay_llm import RecordingLLM
+        return RecordingLLM(model=MODEL_NAME, api_key=api_key, fixtures=fixtures)
+    if mode == "replay":
+        from agents.replay_llm import ReplayLLM
+        return ReplayLLM(model=MODEL_NAME, api_key=api_key, fixtures=fixtures, latency=replay_latency())
+    if mode != "live":
+        raise ValueError(f"Unknown LLM_MODE: {mode!r}")
+    return import_crewai().LLM(
+        model=MODEL_NAME,
+        api_key=api_key
+    )
+
+
+def get_llm():
+    """The process-wide planner LLM, created on first use."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = llm_from_env()
+    return _llm
+
+
+# Replayed completions are streamed in slices of this many characters.
+REPLAY_STREAM_CHUNK = 64
+
+
+async def stream_completion(messages, llm=None):
+    """Stream a chat completion from the configured model, yielding text deltas as they arrive."""
+    if llm is None:
+        llm = await asyncio.to_thread(get_llm)
+    mode = getattr(llm, "fixture_mode", None)
+    if mode == "replay":
+        text = await asyncio.to_thread(llm.call, messages)
+        for start in range(0, len(text), REPLAY_STREAM_CHUNK):
+            yield text[start:start + REPLAY_STREAM_CHUNK]
+        return
+
+    import litellm
+    response = await litellm.acompletion(
+        model=llm.model,
+        api_key=llm.api_key,
+        base_url=llm.base_url,
+        messages=messages,
+        stream=True,
+    )
+    chunks = []
+    async for chunk in response:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            chunks.append(delta)
+            yield delta
+    if mode == "record":
+        from agents.replay_llm import fixture_request
+        llm.fixtures.save("llm", fixture_request(llm.model, messages), "".join(chunks))
@@ -0,0 +1,304 @@
+import sys
+sys.path.append('')
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from utils.logger import get_logger
+from utils.resilience import CircuitBreaker, CircuitOpenError, UpstreamGuard
+
+logger = get_logger(__name__)
+
+# Rough characters per token, for checking that a prompt fits a model's context.
+CHARS_PER_TOKEN = 4
+
+
+class LLMRouterError(Exception):
+    """Raised when no configured model could answer a prompt."""
+
+
+class ModelRoute:
+    """One configured model with its rolling latency, error rate and circuit breaker.
+
+    Full completions and streams share the breaker but keep separate latency
+    windows: a stream's latency is its time to first token, which is not
+    comparable with the time to a whole itinerary.
+    """
+
+    def __init__(self, name: str, model: str, api_base: Optional[str] = None, api_key: Optional[str] = None,
+                 max_input_tokens: int = 32000, timeout: float = 60.0, tier: str = "standard",
+                 window: int = 50, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 stream_idle_timeout: float = 30.0):
+        self.name = name
+        self.model = model
+        self.api_base = api_base
+        self.api_key = api_key
+        self.max_input_tokens = max_input_tokens
+        self.tier = tier
+        self.stream_idle_timeout = stream_idle_timeout
+        breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.guard = UpstreamGuard(name, timeout=timeout, hedge=False, breaker=breaker, latency_window=window)
+        self.stream_guard = UpstreamGuard(name, timeout=timeout, hedge=False, breaker=breaker, latency_window=window)
+        self._outcomes: "deque[bool]" = deque(maxlen=max(1, window))
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **defaults) -> "ModelRoute":
+        api_key = config.get("api_key")
+        if api_key is None and config.get("api_key_env"):
+            api_key = os.getenv(config["api_key_env"])
+        options = {key: config[key] for key in ("max_input_tokens", "timeout", "tier", "stream_idle_timeout") if key in config}
+        return cls(config.get("name") or config["model"], config["model"], config.get("api_base"), api_key,
+                   **{**defaults, **options})
+
+    def record(self, ok: bool) -> None:
+        self._outcomes.append(ok)
+
+    def error_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def latency(self, stream: bool = False) -> Optional[float]:
+        """Median of recent successful calls (time to first token for streams), or None before the first one."""
+        return (self.stream_guard if stream else self.guard).latency.percentile(50.0)
+
+    def is_open(self) -> bool:
+        breaker = self.guard.breaker
+        return breaker.state == "open" and breaker.retry_after() > 0
+
+    def stats(self) -> Dict[str, Any]:
+        latency, first_token = self.latency(), self.latency(stream=True)
+        return {
+            "model": self.model,
+            "tier": self.tier,
+            "p50_seconds": round(latency, 4) if latency is not None else None,
+            "stream_first_token_p50_seconds": round(first_token, 4) if first_token is not None else None,
+            "streams": self.stream_guard.calls,
+            "stream_timeouts": self.stream_guard.timeouts,
+            "error_rate": round(self.error_rate(), 4),
+            **self.guard.stats(),
+        }
+
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(message.get("content") or "")) for message in messages) // CHARS_PER_TOKEN
+
+
+async def litellm_completion(route: ModelRoute, messages: List[Dict[str, Any]], **kwargs):
+    """Call ``route``'s model through LiteLLM, which speaks to any OpenAI-compatible ``api_base``."""
+    import litellm
+    # No client-side retries: failing over to another model is the router's job
+    return await litellm.acompletion(model=route.model, messages=messages, api_base=route.api_base,
+                                     api_key=route.api_key, max_retries=0, **kwargs)
+
+
+class LLMRouter:
+    """Send each prompt to the fastest healthy model that fits it, failing over to the next on errors.
+
+    Models whose prompt limit is too small are never tried. The rest are tried
+    in order: closed circuits before open ones, error rates under
+    ``max_error_rate`` before worse, the preferred tier (``cheap`` for trips of at
+    most ``short_trip_days`` days, ``standard`` otherwise) before the other, and
+    then by recent median latency, models without measurements first in
+    configuration order. A model that times out or errors is skipped for the
+    rest of the request and counted against its circuit breaker. Streams are
+    ranked by time to first token and fail over only until the first delta;
+    after that a gap of more than the model's ``stream_idle_timeout`` ends the stream.
+    """
+
+    def __init__(self, routes: List[ModelRoute], short_trip_days: int = 3, max_error_rate: float = 0.5,
+                 health_interval: float = 0.0, completion=litellm_completion):
+        if not routes:
+            raise ValueError("LLMRouter needs at least one model")
+        self.routes = routes
+        self.short_trip_days = short_trip_days
+        self.max_error_rate = max_error_rate
+        self.health_interval = health_interval
+        self.completion = completion
+        self.failovers = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cache_name(self) -> str:
+        """Identity of the model set, for cache keys of the itineraries it writes."""
+        return "router:" + ",".join(route.model for route in self.routes)
+
+    def candidates(self, messages: List[Dict[str, Any]], days: Optional[int] = None,
+                   stream: bool = False) -> List[ModelRoute]:
+        tokens = estimate_tokens(messages)
+        fitting = [route for route in self.routes if tokens <= route.max_input_tokens]
+        if not fitting:
+            raise LLMRouterError(f"Prompt of ~{tokens} tokens fits none of the configured models")
+        preferred = "cheap" if days is not None and days <= self.short_trip_days else "standard"
+
+        def rank(indexed):
+            index, route = indexed
+            latency = route.latency(stream)
+            return (route.is_open(), route.error_rate() > self.max_error_rate, route.tier != preferred,
+                    0.0 if latency is None else latency, index)
+
+        return [route for _, route in sorted(enumerate(fitting), key=rank)]
+
+    async def _attempt(self, route: ModelRoute, call, stream: bool = False):
+        try:
+            result = await (route.stream_guard if stream else route.guard).call(call)
+        except CircuitOpenError:
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            route.record(False)
+            raise
+        route.record(True)
+        return result
+
+    async def _failover(self, messages: List[Dict[str, Any]], days: Optional[int], attempt, stream: bool = False):
+        errors = []
+        for number, route in enumerate(self.candidates(messages, days, stream)):
+            if number:
+                self.failovers += 1
+            try:
+                return await self._attempt(route, lambda: attempt(route), stream)
+            except asyncio.TimeoutError:
+                errors.append(f"{route.name}: timed out after {route.guard.timeout}s")
+            except CircuitOpenError as e:
+                errors.append(str(e))
+            except Exception as e:
+                errors.append(f"{route.name}: {e}")
+            logger.warning(f"LLM {errors[-1]}, trying the next model")
+        raise LLMRouterError("No model could answer: " + "; ".join(errors))
+
+    async def complete(self, messages: List[Dict[str, Any]], days: Optional[int] = None) -> str:
+        """Completion text from the first model in routing order that answers within its timeout."""
+        async def attempt(route):
+            response = await self.completion(route, messages)
+            text = response.choices[0].message.content if response.choices else None
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("empty completion")
+            logger.info(f"Itinerary completion served by {route.name}")
+            return text
+
+        return await self._failover(messages, days, attempt)
+
+    async def stream(self, messages: List[Dict[str, Any]], days: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream text deltas; fails over only until the first delta, which the timeout applies to.
+
+        Raises ``LLMRouterError`` if the chosen model then stalls for longer than its ``stream_idle_timeout``.
+        """
+        async def attempt(route):
+            response = await self.completion(route, messages, stream=True)
+            deltas = _deltas(response)
+            try:
+                return route, deltas, await deltas.__anext__()
+            except BaseException:
+                await deltas.aclose()
+                raise
+
+        route, deltas, first = await self._failover(messages, days, attempt, stream=True)
+        try:
+            yield first
+            while True:
+                try:
+                    delta = await asyncio.wait_for(deltas.__anext__(), route.stream_idle_timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    route.stream_guard.timeouts += 1
+                    route.stream_guard.breaker.record_failure()
+                    route.record(False)
+                    raise LLMRouterError(f"{route.name} stalled for more than {route.stream_idle_timeout}s mid-stream")
+                yield delta
+        finally:
+            await deltas.aclose()
+
+    async def health_check(self) -> None:
+        """Ping every model with a one-token prompt so broken ones are known before a request hits them."""
+        ping = [{"role": "user", "content": "ping"}]
+
+        async def check(route):
+            # Not through the guard: a ping's latency says little about a full itinerary's
+            try:
+                await asyncio.wait_for(self.completion(route, ping, max_tokens=1), route.guard.timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"LLM health check of {route.name} failed: {e}")
+                route.guard.breaker.record_failure()
+                route.record(False)
+                return
+            route.guard.breaker.record_success()
+            route.record(True)
+
+        await asyncio.gather(*(check(route) for route in self.routes))
+
+    async def _loop(self) -> None:
+        while True:
+            await self.health_check()
+            await asyncio.sleep(self.health_interval)
+
+    def start(self) -> None:
+        if self._task is None and self.health_interval > 0:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "failovers": self.failovers,
+            "health_checks": self._task is not None,
+            "models": {route.name: route.stats() for route in self.routes},
+        }
+
+
+async def _deltas(response) -> AsyncIterator[str]:
+    async for chunk in response:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+def router_from_env() -> Optional[LLMRouter]:
+    """Build the router from LLM_ROUTER_MODELS, or None to keep the single planner LLM.
+
+    LLM_ROUTER_MODELS is a JSON list of models, e.g.
+    ``[{"name": "flash", "model": "gemini/gemini-2.0-flash", "api_key_env": "GEMINI_API_KEY", "tier": "cheap",
+    "max_input_tokens": 100000, "timeout": 30}, {"model": "openai/gpt-4o", "api_base": "http://localhost:8001/v1"}]``.
+
+    Also honors:
+    - LLM_ROUTER_SHORT_TRIP_DAYS: trips of at most this many days prefer ``cheap`` models (default: 3)
+    - LLM_ROUTER_MAX_ERROR_RATE: recent error rate above which a model is tried last (default: 0.5)
+    - LLM_ROUTER_WINDOW: calls remembered per model for latency and error rate (default: 50)
+    - LLM_ROUTER_FAILURE_THRESHOLD / LLM_ROUTER_RESET_TIMEOUT: circuit breaker per model (default: 3 / 30)
+    - LLM_ROUTER_STREAM_IDLE_TIMEOUT: longest gap between streamed deltas before the stream is abandoned (default: 30)
+    - LLM_ROUTER_HEALTH_INTERVAL: seconds between background health pings, each a paid one-token completion
+      per model and worker; 0 disables them (default: 0)
+    """
+    raw = os.getenv("LLM_ROUTER_MODELS")
+    if not raw:
+        return None
+    defaults = {
+        "window": int(os.getenv("LLM_ROUTER_WINDOW", "50")),
+        "failure_threshold": int(os.getenv("LLM_ROUTER_FAILURE_THRESHOLD", "3")),
+        "reset_timeout": float(os.getenv("LLM_ROUTER_RESET_TIMEOUT", "30")),
+        "stream_idle_timeout": float(os.getenv("LLM_ROUTER_STREAM_IDLE_TIMEOUT", "30")),
+    }
+    routes = [ModelRoute.from_config(config, **defaults) for config in json.loads(raw)]
+    return LLMRouter(
+        routes,
+        short_trip_days=int(os.getenv("LLM_ROUTER_SHORT_TRIP_DAYS", "3")),
+        max_error_rate=float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5")),
+        health_interval=float(os.getenv("LLM_ROUTER_HEALTH_INTERVAL", "0")),
+    )
+
+
+llm_router = router_from_env()
+
+
+__all__ = ["LLMRouter", "LLMRouterError", "ModelRoute", "estimate_tokens", "router_from_env", "llm_router"]
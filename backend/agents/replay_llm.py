@@ -0,0 +1,56 @@
+import sys
+sys.path.append('')
+import time
+
+from agents.llm import import_crewai
+from utils.fixtures import FixtureStore
+
+LLM = import_crewai().LLM
+
+
+def fixture_request(model: str, messages) -> dict:
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return {"model": model, "messages": [{"role": m.get("role"), "content": m.get("content")} for m in messages]}
+
+
+class RecordingLLM(LLM):
+    """Live LLM that also saves every completion as a replayable fixture."""
+
+    fixture_mode = "record"
+
+    def __init__(self, *args, fixtures: FixtureStore, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fixtures = fixtures
+
+    def call(self, messages, *args, **kwargs):
+        result = super().call(messages, *args, **kwargs)
+        if isinstance(result, str):
+            self.fixtures.save("llm", fixture_request(self.model, messages), result)
+        return result
+
+
+class ReplayLLM(LLM):
+    """LLM that answers from recorded fixtures, after an artificial delay, without network access.
+
+    Falls back to the ``llm.json`` default fixture when the exact conversation
+    was never recorded, and raises ``LookupError`` if there is none.
+    """
+
+    fixture_mode = "replay"
+
+    def __init__(self, *args, fixtures: FixtureStore, latency: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fixtures = fixtures
+        self.latency = latency
+
+    def call(self, messages, *args, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        result = self.fixtures.load("llm", fixture_request(self.model, messages))
+        if result is None:
+            raise LookupError(f"No recorded LLM fixture in {self.fixtures.directory}")
+        return result
+
+
+__all__ = ["RecordingLLM", "ReplayLLM", "fixture_request"]
@@ -0,0 +1,167 @@
+import sys
+sys.path.append('')
+import asyncio
+
+import pytest
+
+from agents import crew_agent
+from agents.crew_agent import build_itinerary_prompt, generate_itineraries, itinerary_is_complete, split_batch_output
+from agents.itinerary_cache import itinerary_cache_key
+from utils.cache import MemoryCache
+from utils.scheduler import Scheduler, SchedulerRejected, scheduler_from_env
+
+
+def itinerary(title, days):
+    return f"# {title}\n" + "\n".join(f"## Day {day}: Explore\n- 🏛️ Sights" for day in range(1, days + 1))
+
+
+def request(city, check_in="2026-05-01", check_out="2026-05-03"):
+    return {"must_visit_locations": f"{city} sights", "flights_text": f"Flights to {city}",
+            "hotels_text": f"Hotels in {city}", "check_in_date": check_in, "check_out_date": check_out}
+
+
+def test_split_batch_output_keeps_numbered_parts_in_range():
+    combined = (
+        "Sure, here they are!\n"
+        "=== ITINERARY 2 ===\n# Porto\n"
+        "==== ITINERARY 1 ====\n# Lisbon\n"
+        "=== ITINERARY 1 ===\n# Lisbon again\n"
+        "=== ITINERARY 3 ===\n   \n"
+        "=== ITINERARY 7 ===\n# Out of range\n"
+    )
+    assert split_batch_output(combined, 3) == {0: "# Lisbon", 1: "# Porto"}
+    assert split_batch_output("# No separators at all", 2) == {}
+
+
+def test_incomplete_parts_are_detected():
+    assert itinerary_is_complete(itinerary("Lisbon", 3), 3)
+    assert itinerary_is_complete("# Lisbon\n### 🗓️ Day 1 - Alfama\n### 🗓️ Day 2 - Belém", 2)
+    assert not itinerary_is_complete(itinerary("Lisbon", 2), 3)  # cut off after day 2
+    assert not itinerary_is_complete("## Day 1\n## Day 2", 2)  # no title: the start was split off
+
+
+@pytest.fixture
+def batch_env(monkeypatch):
+    cache = MemoryCache(namespace="itinerary")
+    monkeypatch.setattr(crew_agent, "itinerary_cache", cache)
+    monkeypatch.setattr(crew_agent, "llm_router", None)
+    monkeypatch.setattr(crew_agent, "scheduler", scheduler_from_env())  # keep the shared LLM rate budget untouched
+    monkeypatch.setenv("ITINERARY_EXECUTION_MODE", "direct")
+    monkeypatch.setenv("ITINERARY_GENERATION_MODE", "single")
+    monkeypatch.setenv("ITINERARY_BATCH_SIZE", "2")
+    return cache
+
+
+def test_duplicates_share_a_call_and_truncated_parts_are_regenerated(batch_env, monkeypatch):
+    calls = []
+
+    async def run_direct(prompt, model=None, days=None):
+        calls.append(prompt)
+        if prompt.startswith("You will write 2 independent itineraries"):
+            # Porto was cut off after its first day
+            return f"=== ITINERARY 1 ===\n{itinerary('Lisbon', 2)}\n=== ITINERARY 2 ===\n# Porto\n## Day 1: Ribeira\n"
+        city = "Porto" if "Porto" in prompt else "Faro"
+        return itinerary(f"{city} alone", 2)
+
+    monkeypatch.setattr(crew_agent, "run_direct", run_direct)
+    items = [request("Lisbon"), request("Porto"), request("Lisbon"), request("Faro")]
+    results = asyncio.run(generate_itineraries(items))
+
+    assert results == [itinerary("Lisbon", 2), itinerary("Porto alone", 2), itinerary("Lisbon", 2),
+                       itinerary("Faro alone", 2)]
+    # One combined call for Lisbon + Porto, then Porto again on its own; Faro is a group of one
+    assert len(calls) == 3
+    model = crew_agent.planner_model_name()
+    assert batch_env.get(itinerary_cache_key(build_itinerary_prompt(**request("Porto")), model)) == itinerary("Porto alone", 2)
+    assert batch_env.get(itinerary_cache_key(build_itinerary_prompt(**request("Lisbon")), model)) == itinerary("Lisbon", 2)
+
+
+def test_cached_itineraries_are_not_regenerated(batch_env, monkeypatch):
+    model = crew_agent.planner_model_name()
+    batch_env.set(itinerary_cache_key(build_itinerary_prompt(**request("Lisbon")), model), "# Cached", 60)
+
+    async def run_direct(prompt, model=None, days=None):
+        raise AssertionError("every itinerary is cached")
+
+    monkeypatch.setattr(crew_agent, "run_direct", run_direct)
+    assert asyncio.run(generate_itineraries([request("Lisbon"), request("Lisbon")])) == ["# Cached", "# Cached"]
+
+
+def test_per_day_mode_writes_in_one_call_when_the_llm_budget_cannot_cover_it(batch_env, monkeypatch):
+    monkeypatch.setenv("ITINERARY_GENERATION_MODE", "per_day")
+    calls = []
+
+    async def run_direct(prompt, model=None, days=None):
+        assert days == 2  # the router still sees the trip length
+        calls.append(prompt)
+        return itinerary("Lisbon", 2)
+
+    async def rejected_by_day(*args):
+        raise SchedulerRejected("llm", "rate limit exceeded", 429, 1.0)
+
+    async def unaffordable_by_day(*args):
+        raise AssertionError("3 calls at 1/s with a burst of 1 do not fit a 1s queue timeout")
+
+    tight = Scheduler()
+    tight.register("llm", max_concurrency=4, rate=1.0, burst=1.0, queue_timeout=1.0)
+    monkeypatch.setattr(crew_agent, "run_direct", run_direct)
+    monkeypatch.setattr(crew_agent, "scheduler", tight)
+    monkeypatch.setattr(crew_agent, "generate_by_day", unaffordable_by_day)
+    assert asyncio.run(crew_agent.generate_itinerary(**request("Lisbon"))) == itinerary("Lisbon", 2)
+
+    # Affordable up front, but a day call is rejected part-way: still one single-shot call, not a failed plan
+    monkeypatch.setattr(crew_agent, "scheduler", scheduler_from_env())
+    monkeypatch.setattr(crew_agent, "generate_by_day", rejected_by_day)
+    assert asyncio.run(crew_agent.generate_itinerary(**request("Porto"))) == itinerary("Lisbon", 2)
+    assert len(calls) == 2 and all("create a 2-day itinerary" in prompt for prompt in calls)
+
+
+def test_failed_generation_raises_instead_of_returning_text(batch_env, monkeypatch):
+    async def run_direct(prompt, model=None, days=None):
+        return "   "
+
+    monkeypatch.setattr(crew_agent, "run_direct", run_direct)
+    with pytest.raises(crew_agent.ItineraryGenerationFailed) as failed:
+        asyncio.run(crew_agent.generate_itinerary(**request("Lisbon")))
+    assert failed.value.status_code == 502
+    assert len(batch_env) == 0
+
+
+
+def test_a_rejected_group_only_fails_its_own_items(batch_env, monkeypatch):
+    model = crew_agent.planner_model_name()
+    batch_env.set(itinerary_cache_key(build_itinerary_prompt(**request("Braga")), model), "# Cached", 60)
+
+    async def run_direct(prompt, model=None, days=None):
+        if prompt.startswith("You will write 2 independent itineraries"):
+            if "Lisbon" in prompt:
+                raise SchedulerRejected("llm", "rate limit exceeded", 429, 1.0)
+            return f"=== ITINERARY 1 ===\n{itinerary('Coimbra', 2)}\n"  # Faro's part is missing
+        return "   "  # and generating Faro on its own fails too
+
+    monkeypatch.setattr(crew_agent, "run_direct", run_direct)
+    items = [request("Lisbon"), request("Braga"), request("Porto"), request("Coimbra"), request("Faro")]
+    results = asyncio.run(generate_itineraries(items))
+
+    # Lisbon and Porto share the rejected call; Coimbra and Faro share the other one
+    rejected = results[0]
+    assert isinstance(rejected, SchedulerRejected) and results[2] is rejected
+    assert results[1] == "# Cached" and results[3] == itinerary("Coimbra", 2)
+    assert isinstance(results[4], crew_agent.ItineraryGenerationFailed)
+
+
+def test_per_day_calls_pass_the_trip_length_to_the_router(batch_env, monkeypatch):
+    monkeypatch.setenv("ITINERARY_GENERATION_MODE", "per_day")
+    seen = []
+
+    async def run_direct(prompt, model=None, days=None):
+        seen.append(days)
+        return itinerary("Lisbon", 3)
+
+    async def by_day(complete, *args):
+        return await complete("one day")
+
+    monkeypatch.setattr(crew_agent, "run_direct", run_direct)
+    monkeypatch.setattr(crew_agent, "generate_by_day", by_day)
+    asyncio.run(crew_agent.generate_itinerary(**request("Lisbon", check_out="2026-05-04")))
+    assert seen == [3]
@@ -0,0 +1,52 @@
+import sys
+sys.path.append('')
+import asyncio
+import json
+import re
+
+from agents.day_planner import generate_by_day, normalize_day
+
+SKELETON = {
+    "title": "🌍 Lisbon Getaway",
+    "overview": "- ✈️ Arrive 09:00 at LIS\n- 🏨 Casa Azul",
+    "days": [
+        {"day": 1, "theme": "Belem", "attractions": ["Belem Tower"]},
+        {"day": 2, "theme": "Alfama", "attractions": ["Castelo"]},
+        {"day": 3, "theme": "Sintra", "attractions": ["Pena Palace"]},
+    ],
+}
+
+
+def test_days_are_written_concurrently_and_failed_days_retried_alone(monkeypatch):
+    monkeypatch.setenv("ITINERARY_DAY_RETRIES", "1")
+    monkeypatch.setenv("ITINERARY_DAY_PARALLEL", "3")
+    calls, in_flight, peak = [], 0, 0
+
+    async def complete(prompt):
+        nonlocal in_flight, peak
+        if "Answer with JSON only" in prompt:
+            calls.append("skeleton")
+            return f"```json\n{json.dumps(SKELETON)}\n```"
+        day = int(re.search(r"Write only Day (\d+)", prompt).group(1))
+        calls.append(day)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        if day == 2 and calls.count(2) == 1:
+            raise TimeoutError("model timed out")
+        return f"Sure! Here it is:\n## Day {day}: Theme\n# Morning\n- 🕘 09:00 Visit"
+
+    itinerary = asyncio.run(generate_by_day(complete, "sights", "flights", "hotels", "2026-06-01", "2026-06-04", 3))
+
+    assert calls.count("skeleton") == 1
+    assert sorted(call for call in calls if call != "skeleton") == [1, 2, 2, 3]
+    assert peak == 3
+    assert itinerary.startswith("# 🌍 Lisbon Getaway\n\n- ✈️ Arrive")
+    assert re.findall(r"^## Day (\d+)", itinerary, re.MULTILINE) == ["1", "2", "3"]
+    assert "Sure!" not in itinerary and "### Morning" in itinerary
+
+
+def test_day_without_heading_gets_one():
+    day = {"day": 4, "theme": "Beach"}
+    assert normalize_day("- 🏖️ Cascais", day) == "## Day 4: Beach\n- 🏖️ Cascais"
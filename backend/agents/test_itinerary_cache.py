@@ -0,0 +1,52 @@
+import sys
+sys.path.append('')
+
+from agents.itinerary_cache import itinerary_cache_key, normalize_prompt
+
+PROMPT = """
+            Based on the following details, create a 3-day itinerary for the user:
+
+            **Flight Details**:
+            - F1: $420 | 7h30m | nonstop
+
+            **Hotel Details**:
+            - H1: Alfama Inn | ⭐ 4.6 | $120/night
+            **Price:** 120 USD
+            """
+
+
+def test_whitespace_and_indentation_do_not_change_the_key():
+    reindented = "\n".join("  " + "   ".join(line.split()) + "  " for line in PROMPT.splitlines()) + "\n\n"
+    assert normalize_prompt(reindented) == normalize_prompt(PROMPT)
+    assert normalize_prompt(PROMPT).startswith("Based on the following details, create a 3-day itinerary")
+    assert "\n\n" not in normalize_prompt(PROMPT)
+    assert itinerary_cache_key(reindented, "gemini", near_duplicate=False) == itinerary_cache_key(PROMPT, "gemini", near_duplicate=False)
+
+
+def test_content_model_and_mode_change_the_key():
+    key = itinerary_cache_key(PROMPT, "gemini", near_duplicate=False)
+    assert itinerary_cache_key(PROMPT.replace("3-day", "4-day"), "gemini", near_duplicate=False) != key
+    assert itinerary_cache_key(PROMPT.replace("nonstop", "1 stop"), "gemini", near_duplicate=False) != key
+    assert itinerary_cache_key(PROMPT, "gpt-4o", near_duplicate=False) != key
+    assert itinerary_cache_key(PROMPT, "gemini", near_duplicate=True) != key
+    assert key.startswith("exact:") and itinerary_cache_key(PROMPT, "gemini", near_duplicate=True).startswith("near:")
+
+
+def test_near_duplicate_mode_masks_only_prices():
+    repriced = PROMPT.replace("$420", "$ 455.50").replace("$120/night", "$$135/night").replace("120 USD", "1,135 USD")
+    assert itinerary_cache_key(repriced, "gemini", near_duplicate=False) != itinerary_cache_key(PROMPT, "gemini", near_duplicate=False)
+    assert itinerary_cache_key(repriced, "gemini", near_duplicate=True) == itinerary_cache_key(PROMPT, "gemini", near_duplicate=True)
+    assert "**Price:** <price>" in normalize_prompt(PROMPT, near_duplicate=True)
+
+    # Everything that is not a price still tells near-duplicates apart
+    other_hotel = PROMPT.replace("Alfama Inn", "Baixa Suites")
+    longer_flight = PROMPT.replace("7h30m", "9h05m")
+    for changed in (other_hotel, longer_flight):
+        assert itinerary_cache_key(changed, "gemini", near_duplicate=True) != itinerary_cache_key(PROMPT, "gemini", near_duplicate=True)
+
+
+def test_mode_defaults_to_the_environment(monkeypatch):
+    monkeypatch.setenv("ITINERARY_CACHE_NEAR_DUPLICATE", "true")
+    assert itinerary_cache_key(PROMPT, "gemini") == itinerary_cache_key(PROMPT, "gemini", near_duplicate=True)
+    monkeypatch.delenv("ITINERARY_CACHE_NEAR_DUPLICATE")
+    assert itinerary_cache_key(PROMPT, "gemini") == itinerary_cache_key(PROMPT, "gemini", near_duplicate=False)
@@ -0,0 +1,137 @@
+import sys
+sys.path.append('')
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agents.llm_router import LLMRouter, LLMRouterError, ModelRoute, litellm_completion
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions endpoint answering as ``server.reply`` after ``server.delay``."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        time.sleep(self.server.delay)
+        if self.server.status != 200:
+            payload = {"error": {"message": "overloaded", "type": "server_error"}}
+        else:
+            payload = {
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self.server.reply}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_models():
+    servers = []
+
+    def start(reply, delay=0.0, status=200):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubModelHandler)
+        server.reply, server.delay, server.status, server.requests = reply, delay, status, []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def route(name, api_base, **options):
+    return ModelRoute(name, f"openai/{name}", api_base=api_base, api_key="test-key", **options)
+
+
+def test_slow_model_fails_over_and_is_then_routed_around(stub_models):
+    slow, slow_base = stub_models("# Slow", delay=2.0)
+    fast, fast_base = stub_models("# Fast")
+    _, warm_base = stub_models("# Warm")
+    router = LLMRouter([route("slow", slow_base, timeout=1.0, failure_threshold=1), route("fast", fast_base)])
+    messages = [{"role": "user", "content": "Plan 5 days in Lisbon"}]
+
+    async def scenario():
+        # LiteLLM's first call sets up clients, which must not count against the timeout
+        await litellm_completion(route("warm", warm_base), messages)
+        return [await router.complete(messages, days=5) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == ["# Fast", "# Fast"]
+    # The timeout opened the slow model's circuit, so the second request went straight to the fast one
+    assert len(slow.requests) == 1 and len(fast.requests) == 2
+    assert router.failovers == 1
+    assert router.stats()["models"]["slow"]["breaker"]["state"] == "open"
+
+
+def test_short_trips_prefer_cheap_models_and_big_prompts_skip_small_ones(stub_models):
+    _, standard_base = stub_models("# Standard")
+    cheap, cheap_base = stub_models("# Cheap")
+    router = LLMRouter([route("standard", standard_base), route("cheap", cheap_base, tier="cheap", max_input_tokens=50)],
+                       short_trip_days=2)
+
+    async def scenario():
+        return (
+            await router.complete([{"role": "user", "content": "Weekend in Porto"}], days=2),
+            await router.complete([{"role": "user", "content": "Weekend in Porto"}], days=6),
+            await router.complete([{"role": "user", "content": "x" * 400}], days=2),
+        )
+
+    assert asyncio.run(scenario()) == ("# Cheap", "# Standard", "# Standard")
+    assert len(cheap.requests) == 1
+
+
+def test_all_models_failing_raises_and_health_checks_mark_them(stub_models):
+    _, base = stub_models("", status=500)
+    router = LLMRouter([route("broken", base, failure_threshold=1)])
+    asyncio.run(router.health_check())
+    assert router.routes[0].is_open()
+    with pytest.raises(LLMRouterError, match="broken"):
+        asyncio.run(router.complete([{"role": "user", "content": "Plan"}]))
+
+
+def test_stalled_stream_is_abandoned_and_first_token_latency_kept_apart():
+    from types import SimpleNamespace
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def completion(route, messages, stream=False):
+        async def deltas():
+            yield chunk("# Lisbon")
+            await asyncio.sleep(5)  # the model stops sending mid-response
+            yield chunk(" never")
+        return deltas()
+
+    router = LLMRouter([ModelRoute("stalls", "openai/stalls", window=2, stream_idle_timeout=0.05)], completion=completion)
+
+    async def scenario():
+        received = []
+        with pytest.raises(LLMRouterError, match="stalled"):
+            async for delta in router.stream([{"role": "user", "content": "Plan"}]):
+                received.append(delta)
+        return received
+
+    start = time.monotonic()
+    assert asyncio.run(scenario()) == ["# Lisbon"]
+    assert time.monotonic() - start < 1.0
+    model = router.routes[0]
+    assert model.latency(stream=True) is not None and model.latency() is None
+    for seconds in (1.0, 2.0, 3.0):
+        model.guard.latency.observe(seconds)
+    assert len(model.guard.latency) == 2  # LLM_ROUTER_WINDOW also bounds the latency window
+    assert model.stats()["stream_timeouts"] == 1 and model.error_rate() == 0.5
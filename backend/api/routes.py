@@ -1,81 +1,211 @@
 import sys
 sys.path.append('')
 import asyncio
+import json
+import os
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from models.api_models import RequestResponse, ItineraryResponse, PDFRequest
-from modules.Service_Api import flight_schedules, hotel_list, tourist_attractions
-from modules.helper import format_api_data, download_data
-from agents.crew_agent import generate_itinerary
-from utils.logger import get_logger
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from typing import Dict, List, Optional, Tuple
+from models.api_models import RequestResponse, PlanItineraryRequest, ItineraryResponse, FlexibleItineraryRequest, FlexibleItineraryResponse, PDFRequest, ItineraryJobRequest, JobStatusResponse, BatchItineraryRequest, BatchItemResult, BatchItineraryResponse
+from modules.Service_Api import flight_schedules, hotel_list, tourist_attractions, search_cache, search_singleflight, search_guard_stats, search_prefetcher
+from modules.pdf_renderer import render_pdf, iter_chunks, pdf_cache, pdf_render_pool
+from modules.prompt_budget import render_for_prompt
+from modules.date_grid import search_date_grid
+from modules.geo_planner import geo_planning_enabled, plan_sights_text
+from modules.job_queue import job_queue_from_env
+from modules.plan_sessions import (changed_services, dates_changed, load_session, new_plan_id, restore_results, save_session,
+                                   section_heading, sections_to_regenerate, splice_sections, split_sections)
+from modules.warmup import warmup_status
+from agents.crew_agent import generate_itinerary, generate_itineraries, revise_sections, stream_itinerary
+from agents.itinerary_cache import itinerary_cache
+from agents.llm_router import llm_router
+from utils.logger import get_logger, logging_stats
+from utils.scheduler import scheduler, SchedulerRejected
+from utils.metrics import registry
 
 router = APIRouter()
 logger = get_logger(__name__)
 
 
-async def get_complete_iternary(request: RequestResponse):
-    """Get data from all services in parallel and format them."""
+def _as_search_result(name: str, result):
+    """Turn an exception raised by a search into the ``{"error": ...}`` shape the parsers return."""
+    if isinstance(result, HTTPException):
+        logger.warning(f"Continuing without {name}: {result.detail}")
+        return {"error": str(result.detail)}
+    if isinstance(result, Exception):
+        logger.error(f"Continuing without {name}: {result}")
+        return {"error": str(result)}
+    return result
+
+
+def _no_travel_options(flight_text: str, hotel_text: str) -> bool:
+    """Planning needs at least flights or hotels; a missing one is tolerated as partial data."""
+    return "No flights information available" in flight_text and "No hotels information available" in hotel_text
+
+
+# Request field, search function, prompt section and key of the rendered text for each upstream service
+_SERVICES = (
+    ("flight_request", flight_schedules, "flights", "flight_text"),
+    ("hotel_request", hotel_list, "hotels", "hotel_text"),
+    ("sights_request", tourist_attractions, "attractions", "sights_text"),
+)
+
+
+async def search_services(request: RequestResponse, fields: Optional[List[str]] = None) -> Dict[str, list]:
+    """Search all services (or only the given request ``fields``) in parallel; results keyed by prompt section."""
+    services = [service for service in _SERVICES if fields is None or service[0] in fields]
+    tasks = [asyncio.create_task(search(getattr(request, field))) for field, search, _, _ in services]
+
+    # A failed or timed-out search degrades to an empty section instead of failing the plan
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    found = {}
+    for (_, _, data_type, _), result in zip(services, results):
+        result = _as_search_result(data_type, result)
+        found[data_type] = [] if isinstance(result, dict) and "error" in result else result
+    return found
+
+
+def _day_plan_text(request: RequestResponse, results: Dict[str, list]) -> Optional[str]:
+    """Attractions grouped into day routes around the hotel, when geo planning is on and possible."""
+    if not geo_planning_enabled() or "attractions" not in results or "hotels" not in results:
+        return None
+    return plan_sights_text(results["attractions"], results["hotels"],
+                            request.hotel_request.check_in_date, request.hotel_request.check_out_date)
+
+
+def _sights_prompt_text(attractions: list, hotels: list, check_in_date: str, check_out_date: str) -> str:
+    """Attractions for the prompt: day routes around the hotel when geo planning can build them, else the listing."""
+    day_plan = plan_sights_text(attractions, hotels, check_in_date, check_out_date) if geo_planning_enabled() else None
+    return day_plan if day_plan is not None else render_for_prompt("attractions", attractions)
+
+
+def render_texts(request: RequestResponse, found: Dict[str, list]) -> Dict[str, str]:
+    """Prompt texts for the searched sections."""
+    texts = {text_key: render_for_prompt(data_type, found[data_type])
+             for _, _, data_type, text_key in _SERVICES if data_type in found}
+    # Hand the model attractions already grouped into day routes around the hotel
+    day_plan = _day_plan_text(request, found)
+    if day_plan is not None:
+        texts["sights_text"] = day_plan
+    return texts
+
+
+async def get_complete_iternary(request: RequestResponse, fields: Optional[List[str]] = None):
+    """Get data from all services (or only the given request ``fields``) in parallel and format them."""
     try:
-        flight_task = asyncio.create_task(flight_schedules(request.flight_request))
-        hotel_task = asyncio.create_task(hotel_list(request.hotel_request))
-        sights_task = asyncio.create_task(tourist_attractions(request.sights_request))
-        
-        flights_result, hotel_result, sights_result = await asyncio.gather(flight_task, hotel_task, sights_task)
-        
-        # Initialize all details as empty lists
-        flight_details = []
-        hotel_details = []
-        sights_details = []
-        
-        # Format flight details
-        if not (isinstance(flights_result, dict) and "error" in flights_result):
-            flight_details = flights_result
-        flight_text = format_api_data("flights", flight_details)
-        
-        # Format hotel details
-        if not (isinstance(hotel_result, dict) and "error" in hotel_result):
-            hotel_details = hotel_result
-        hotel_text = format_api_data("hotels", hotel_details)
-        
-        # Format sights details
-        if not (isinstance(sights_result, dict) and "error" in sights_result):
-            sights_details = sights_result
-        sights_text = format_api_data("attractions", sights_details)
-        
-        return {
-            "flight_text": flight_text,
-            "hotel_text": hotel_text,
-            "sights_text": sights_text
-        }
-        
+        return render_texts(request, await search_services(request, fields))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error getting complete itinerary")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _require_travel_options(data: dict) -> None:
+    # Check if we have any flights and hotels in the text
+    if _no_travel_options(data["flight_text"], data["hotel_text"]):
+        raise HTTPException(
+            status_code=400, 
+            detail="No flights or hotels found for the given criteria"
+        )
+
+
+def _generation_args(request: RequestResponse, data: dict) -> dict:
+    return {
+        "must_visit_locations": data["sights_text"],
+        "flights_text": data["flight_text"],
+        "hotels_text": data["hotel_text"],
+        "check_in_date": request.hotel_request.check_in_date,
+        "check_out_date": request.hotel_request.check_out_date,
+    }
+
+
+async def _plan_with_texts(request: RequestResponse) -> Tuple[str, dict, dict]:
+    """Run the search fan-out and itinerary generation for one request; also returns the search texts and results."""
+    # Get all the data from various services
+    try:
+        found = await search_services(request)
+        data = render_texts(request, found)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error getting complete itinerary")
+        raise HTTPException(status_code=500, detail=str(e))
+    _require_travel_options(data)
+    
+    # Generate detailed itinerary using the AI agent
+    return await generate_itinerary(**_generation_args(request, data)), data, found
+
+
+async def _plan(request: RequestResponse) -> str:
+    """Run the search fan-out and itinerary generation for one request."""
+    itinerary, _, _ = await _plan_with_texts(request)
+    return itinerary
+
+
+async def _replan(request: RequestResponse, session: dict) -> Tuple[str, dict, dict]:
+    """Refine a stored plan: search again only for changed request fields and rewrite only affected sections."""
+    current = request.model_dump(include={"flight_request", "hotel_request", "sights_request"})
+    data = dict(session["texts"])
+    results = restore_results(session)
+    changed = changed_services(session["request"], current)
+    if changed:
+        found = await search_services(request, fields=changed)
+        data.update(render_texts(request, found))
+        results.update(found)
+        # Day routes depend on both the hotel and the attractions; re-plan them with the stored side
+        if found.keys() & {"hotels", "attractions"} and not found.keys() >= {"hotels", "attractions"}:
+            day_plan = _day_plan_text(request, results)
+            if day_plan is not None:
+                data["sights_text"] = day_plan
+            elif geo_planning_enabled() and "attractions" in results:
+                data["sights_text"] = render_for_prompt("attractions", results["attractions"])
+    _require_travel_options(data)
+
+    old_itinerary = session["itinerary"]
+    new_dates = dates_changed(session["request"], current)
+    if data == session["texts"] and not new_dates:
+        logger.info("Plan refinement changed no search results; reusing the itinerary")
+        return old_itinerary, data, results
+
+    args = _generation_args(request, data)
+    sections = split_sections(old_itinerary)
+    indexes = None if new_dates else sections_to_regenerate(sections, session["texts"], data)
+    if indexes is not None:
+        headings = [section_heading(sections[index]) for index in indexes]
+        try:
+            revised = await revise_sections(old_itinerary, headings, **args)
+            itinerary = splice_sections(sections, revised, indexes)
+        except SchedulerRejected:
+            raise
+        except Exception as e:
+            logger.warning(f"Section revision failed, regenerating the whole plan: {str(e)}")
+            itinerary = None
+        if itinerary is not None:
+            logger.info(f"Regenerated {len(indexes)} of {len(sections)} itinerary sections")
+            return itinerary, data, results
+    return await generate_itinerary(**args), data, results
+
+
 @router.post("/plan-itinerary")
-async def plan_itinerary(request: RequestResponse):
-    """Create a complete travel itinerary based on user preferences."""
+async def plan_itinerary(request: PlanItineraryRequest):
+    """Create a complete travel itinerary based on user preferences.
+
+    Pass the ``plan_id`` of an earlier response to refine that plan: only the
+    searches and itinerary sections affected by the changed fields are redone.
+    """
     try:
-        # Get all the data from various services
-        data = await get_complete_iternary(request)
+        plan_request = RequestResponse.model_validate(request.model_dump(exclude={"plan_id"}))
+        session = load_session(request.plan_id) if request.plan_id else None
+        if session is not None:
+            output, data, results = await _replan(plan_request, session)
+        else:
+            output, data, results = await _plan_with_texts(plan_request)
         
-        # Check if we have any flights and hotels in the text
-        if "No flights information available" in data["flight_text"] or "No hotels information available" in data["hotel_text"]:
-            raise HTTPException(
-                status_code=400, 
-                detail="No flights or hotels found for the given criteria"
-            )
-        
-        # Generate detailed itinerary using the AI agent
-        output = await generate_itinerary(
-            must_visit_locations=data["sights_text"],
-            flights_text=data["flight_text"],
-            hotels_text=data["hotel_text"],
-            check_in_date=request.hotel_request.check_in_date,
-            check_out_date=request.hotel_request.check_out_date
-        )
-        
-        response = ItineraryResponse(itinerary=output)
+        plan_id = request.plan_id or new_plan_id()
+        save_session(plan_id, plan_request.model_dump(), data, output, results)
+        response = ItineraryResponse(itinerary=output, plan_id=plan_id)
         
         return response
         
@@ -86,12 +216,229 @@ async def plan_itinerary(request: RequestResponse):
         logger.exception("Error planning itinerary")
         raise HTTPException(status_code=500, detail=str(e))
 
+
+
+@router.post("/plan-itinerary/flexible", response_model=FlexibleItineraryResponse)
+async def plan_itinerary_flexible(request: FlexibleItineraryRequest):
+    """Search a grid of dates around the requested ones and plan the trip for the cheapest date pair."""
+    grid, sights_result = await asyncio.gather(
+        search_date_grid(request.flight_request, request.hotel_request, request.outbound_flex_days,
+                         request.return_flex_days, request.stay_flex_nights),
+        tourist_attractions(request.sights_request),
+        return_exceptions=True,
+    )
+    if isinstance(grid, BaseException):
+        raise grid
+    if not grid["cheapest"]:
+        raise HTTPException(status_code=400, detail="No flights or hotels found for any of the date pairs")
+
+    best = grid["cheapest"][0]
+    sights_result = _as_search_result("attractions", sights_result)
+    itinerary = await generate_itinerary(
+        must_visit_locations=_sights_prompt_text([] if isinstance(sights_result, dict) else sights_result,
+                                                 grid["hotels"], best["outbound_date"], best["return_date"]),
+        flights_text=render_for_prompt("flights", grid["flights"]),
+        hotels_text=render_for_prompt("hotels", grid["hotels"]),
+        check_in_date=best["outbound_date"],
+        check_out_date=best["return_date"]
+    )
+    return FlexibleItineraryResponse(
+        itinerary=itinerary,
+        outbound_date=best["outbound_date"],
+        return_date=best["return_date"],
+        cheapest=grid["cheapest"],
+        grid=grid["grid"]
+    )
+
+
+@router.post("/plan-itinerary/batch", response_model=BatchItineraryResponse)
+async def plan_itinerary_batch(request: BatchItineraryRequest):
+    """Plan several itineraries at once, sharing identical searches and batching LLM calls."""
+    semaphore = asyncio.Semaphore(int(os.getenv("BATCH_MAX_PARALLEL", "6")))
+
+    async def bounded(search, service_request):
+        async with semaphore:
+            try:
+                return await search(service_request)
+            except HTTPException as he:
+                return {"error": str(he.detail)}
+            except Exception as e:
+                logger.exception("Batch search failed")
+                return {"error": str(e)}
+
+    # Each distinct flight/hotel/sights query is searched once for the whole batch
+    searches = {}
+    for item in request.requests:
+        for field, search, _, _ in _SERVICES:
+            service_request = getattr(item, field)
+            searches.setdefault((field, service_request.model_dump_json()), (search, service_request))
+    fetched = await asyncio.gather(*(bounded(search, service_request) for search, service_request in searches.values()))
+    search_results = dict(zip(searches.keys(), fetched))
+
+    results = [BatchItemResult(index=index) for index in range(len(request.requests))]
+    generation_items, generation_indexes = [], []
+    for index, item in enumerate(request.requests):
+        found = {}
+        for field, _, data_type, _ in _SERVICES:
+            result = search_results[(field, getattr(item, field).model_dump_json())]
+            found[data_type] = [] if isinstance(result, dict) and "error" in result else result
+        texts = {data_type: render_for_prompt(data_type, result) for data_type, result in found.items() if data_type != "attractions"}
+        texts["attractions"] = _sights_prompt_text(found["attractions"], found["hotels"],
+                                                   item.hotel_request.check_in_date, item.hotel_request.check_out_date)
+        if _no_travel_options(texts["flights"], texts["hotels"]):
+            results[index].error = "No flights or hotels found for the given criteria"
+            continue
+        generation_items.append({
+            "must_visit_locations": texts["attractions"],
+            "flights_text": texts["flights"],
+            "hotels_text": texts["hotels"],
+            "check_in_date": item.hotel_request.check_in_date,
+            "check_out_date": item.hotel_request.check_out_date,
+        })
+        generation_indexes.append(index)
+
+    itineraries = await generate_itineraries(generation_items)
+    for index, itinerary in zip(generation_indexes, itineraries):
+        if isinstance(itinerary, HTTPException):
+            results[index].error = str(itinerary.detail)
+        else:
+            results[index].itinerary = itinerary
+
+    return BatchItineraryResponse(results=results)
+
+
+async def _run_itinerary_job(payload: dict) -> dict:
+    """Job queue handler: plan the itinerary for a stored request payload."""
+    return {"itinerary": await _plan(RequestResponse.model_validate(payload))}
+
+
+job_queue = job_queue_from_env(_run_itinerary_job)
+
+
+def _job_response(job: dict) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        deduplicated=job.get("deduplicated", False),
+        itinerary=(job["result"] or {}).get("itinerary"),
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        expires_at=job["expires_at"]
+    )
+
+@router.post("/jobs/itinerary", status_code=202, response_model=JobStatusResponse)
+async def submit_itinerary_job(request: ItineraryJobRequest):
+    """Queue itinerary generation and return a job id immediately."""
+    payload = RequestResponse.model_validate(request.model_dump(exclude={"callback_url"})).model_dump()
+    return _job_response(job_queue.submit(payload, callback_url=request.callback_url))
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_itinerary_job(job_id: str):
+    """Fetch the status, and once finished the result, of a queued itinerary job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return _job_response(job)
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Encode one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_plan(request: RequestResponse):
+    """Yield SSE frames: each search result as it lands, then the itinerary token by token."""
+    async def labelled(kind, data_type, coro):
+        try:
+            result = await coro
+        except Exception as e:
+            result = _as_search_result(kind, e)
+        if isinstance(result, dict) and "error" in result:
+            result = []
+        return kind, result, render_for_prompt(data_type, result)
+
+    searches = [
+        labelled("flights", "flights", flight_schedules(request.flight_request)),
+        labelled("hotels", "hotels", hotel_list(request.hotel_request)),
+        labelled("sights", "attractions", tourist_attractions(request.sights_request)),
+    ]
+    found, texts = {}, {}
+    try:
+        for next_result in asyncio.as_completed(searches):
+            kind, found[kind], texts[kind] = await next_result
+            yield _sse_event(kind, {"text": texts[kind]})
+
+        if _no_travel_options(texts["flights"], texts["hotels"]):
+            yield _sse_event("error", {"status": 400, "detail": "No flights or hotels found for the given criteria"})
+            return
+
+        chunks = []
+        async for delta in stream_itinerary(
+            must_visit_locations=_sights_prompt_text(found["sights"], found["hotels"], request.hotel_request.check_in_date,
+                                                     request.hotel_request.check_out_date),
+            flights_text=texts["flights"],
+            hotels_text=texts["hotels"],
+            check_in_date=request.hotel_request.check_in_date,
+            check_out_date=request.hotel_request.check_out_date
+        ):
+            chunks.append(delta)
+            yield _sse_event("itinerary", {"delta": delta})
+
+        yield _sse_event("done", {"itinerary": "".join(chunks)})
+
+    except HTTPException as he:
+        yield _sse_event("error", {"status": he.status_code, "detail": he.detail})
+    except Exception as e:
+        logger.exception("Error streaming itinerary")
+        yield _sse_event("error", {"status": 500, "detail": str(e)})
+
+
+@router.post("/plan-itinerary/stream")
+async def plan_itinerary_stream(request: RequestResponse):
+    """Stream a travel itinerary as Server-Sent Events while it is being built."""
+    return StreamingResponse(
+        _stream_plan(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/generate-pdf")
 async def generate_pdf(request: PDFRequest):
     """Generate PDF from itinerary text."""
-    buffer = download_data(request.itinerary_text)
+    pdf = await render_pdf(request.itinerary_text)
     return StreamingResponse(
-        buffer,
+        iter_chunks(pdf),
         media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=Itinerary.pdf"}
-    )
\ No newline at end of file
+        headers={"Content-Disposition": "attachment; filename=Itinerary.pdf", "Content-Length": str(len(pdf))}
+    )
+
+
+@router.get("/health")
+async def health():
+    """Liveness check; answers as soon as the app is up, before the heavy subsystems are loaded."""
+    return {"status": "ok", "warmup": warmup_status()}
+
+
+@router.get("/stats")
+async def stats():
+    """Runtime counters for the shared caches, search coalescing and the outbound scheduler."""
+    return {
+        "search_cache": search_cache.stats(),
+        "search_singleflight": search_singleflight.stats(),
+        "search_engines": search_guard_stats(),
+        "prefetch": search_prefetcher.stats(),
+        "itinerary_cache": itinerary_cache.stats(),
+        "llm_router": llm_router.stats() if llm_router is not None else None,
+        "pdf_cache": pdf_cache.stats(),
+        "pdf_render_pool": pdf_render_pool.stats(),
+        "scheduler": scheduler.stats(),
+        "jobs": job_queue.stats(),
+        "logging": logging_stats(),
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage and request latency histograms, in-flight gauges and error counters in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,177 @@
+import sys
+sys.path.append('')
+import os
+os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from agents import crew_agent
+from agents import llm as llm_module
+from agents.replay_llm import ReplayLLM
+from api.routes import router
+from modules import Service_Api, geo_planner
+from modules.serpapi_transport import ReplayTransport
+from utils.cache import MemoryCache
+from utils.fixtures import FixtureStore
+from utils.scheduler import scheduler_from_env
+
+
+class CountingReplayTransport(ReplayTransport):
+    def __init__(self, fixtures):
+        super().__init__(fixtures)
+        self.searches = []
+
+    async def search(self, params):
+        self.searches.append(params["engine"])
+        return await super().search(params)
+
+
+class CountingReplayLLM(ReplayLLM):
+    prompts = []
+
+    def call(self, messages, *args, **kwargs):
+        type(self).prompts.append(messages[-1]["content"])
+        return super().call(messages, *args, **kwargs)
+
+
+@pytest.fixture
+def replayed(tmp_path, monkeypatch):
+    """The API wired to recorded SerpAPI and LLM fixtures instead of the live services."""
+    fixtures = FixtureStore(str(tmp_path))
+    fixtures.save("google_flights", None, {"best_flights": [{"price": 420, "total_duration": 160, "flights": [
+        {"departure_airport": {"name": "JFK", "time": "2026-05-01 08:00"},
+         "arrival_airport": {"name": "Humberto Delgado Airport", "time": "2026-05-01 20:00"}}]}]}, default=True)
+    fixtures.save("google_hotels", None, {"properties": [
+        {"name": "Alfama Inn", "description": "Old town", "rate_per_night": {"lowest": "$120"},
+         "overall_rating": 4.6, "link": "https://example.com/alfama", "extracted_hotel_class": 4}]}, default=True)
+    fixtures.save("tripadvisor", None, {"locations": [
+        {"title": "Belém Tower", "description": "Fortress", "location": "Lisbon", "rating": 4.7,
+         "link": "https://example.com/belem"}]}, default=True)
+
+    transport = CountingReplayTransport(fixtures)
+    CountingReplayLLM.prompts = []
+    monkeypatch.setattr(Service_Api, "serpapi_transport", transport)
+    monkeypatch.setattr(Service_Api, "search_cache", MemoryCache(namespace="serpapi"))
+    monkeypatch.setattr(crew_agent, "itinerary_cache", MemoryCache(namespace="itinerary"))
+    monkeypatch.setattr(crew_agent, "llm_router", None)
+    # A fresh scheduler so the shared LLM and search rate budgets of other tests are untouched
+    monkeypatch.setattr(crew_agent, "scheduler", scheduler_from_env())
+    monkeypatch.setattr(Service_Api, "scheduler", scheduler_from_env())
+    replay_llm = lambda: CountingReplayLLM(model="gemini/gemini-2.0-flash", fixtures=fixtures)
+    monkeypatch.setattr(crew_agent, "get_llm", replay_llm)
+    monkeypatch.setattr(llm_module, "get_llm", replay_llm)
+    monkeypatch.setenv("ITINERARY_EXECUTION_MODE", "direct")
+    monkeypatch.setenv("ITINERARY_GENERATION_MODE", "single")
+    monkeypatch.setenv("ITINERARY_BATCH_SIZE", "3")
+
+    app = FastAPI()
+    app.include_router(router)
+    return app, fixtures, transport
+
+
+def plan_request(outbound, back):
+    return {
+        "flight_request": {"departure_airport_code": "JFK", "arrival_airport_code": "LIS",
+                           "outbound_date": outbound, "return_date": back},
+        "hotel_request": {"city": "Lisbon", "check_in_date": outbound, "check_out_date": back, "hotel_class": "4"},
+        "sights_request": {"query": "Lisbon attractions"},
+    }
+
+
+def post(app, path, body):
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(path, json=body)
+
+    return asyncio.run(send())
+
+
+def test_batch_endpoint_shares_searches_and_one_llm_call(replayed):
+    app, fixtures, transport = replayed
+    may, june = "# Lisbon in May\n## Day 1: Alfama\n## Day 2: Belém", "# Lisbon in June\n## Day 1: Sintra\n## Day 2: Baixa"
+    fixtures.save("llm", None, f"=== ITINERARY 1 ===\n{may}\n=== ITINERARY 2 ===\n{june}", default=True)
+
+    requests = [plan_request("2026-05-01", "2026-05-03"), plan_request("2026-06-01", "2026-06-03"),
+                plan_request("2026-05-01", "2026-05-03")]
+    response = post(app, "/plan-itinerary/batch", {"requests": requests})
+
+    assert response.status_code == 200
+    assert [item["itinerary"] for item in response.json()["results"]] == [may, june, may]
+    # Two distinct flight and hotel searches, one shared attraction search
+    assert sorted(transport.searches) == ["google_flights"] * 2 + ["google_hotels"] * 2 + ["tripadvisor"]
+    assert len(CountingReplayLLM.prompts) == 1
+
+
+def test_batch_endpoint_regenerates_a_truncated_part_on_its_own(replayed):
+    app, fixtures, _ = replayed
+    # The combined answer stops after June's first day
+    fixtures.save("llm", None, "=== ITINERARY 1 ===\n# Lisbon in May\n## Day 1\n## Day 2\n"
+                               "=== ITINERARY 2 ===\n# Lisbon in June\n## Day 1", default=True)
+
+    requests = [plan_request("2026-05-01", "2026-05-03"), plan_request("2026-06-01", "2026-06-03")]
+    results = post(app, "/plan-itinerary/batch", {"requests": requests}).json()["results"]
+
+    assert results[0]["itinerary"] == "# Lisbon in May\n## Day 1\n## Day 2"
+    assert results[1]["itinerary"] != "# Lisbon in June\n## Day 1"
+    batch_prompt, retry_prompt = CountingReplayLLM.prompts
+    assert "independent itineraries" in batch_prompt
+    assert "independent itineraries" not in retry_prompt and "2026-06-01 to 2026-06-03" in retry_prompt
+
+
+def sse_frames(body):
+    frames = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        frames.append((fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+def test_stream_sends_each_stage_then_deltas_then_done(replayed):
+    app, fixtures, _ = replayed
+    itinerary = "# Lisbon Getaway\n" + "".join(f"## Day {day}: Explore\n- 🏛️ Belém Tower at 10:00\n" for day in (1, 2))
+    fixtures.save("llm", None, itinerary, default=True)
+
+    response = post(app, "/plan-itinerary/stream", plan_request("2026-05-01", "2026-05-03"))
+
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/event-stream")
+    frames = sse_frames(response.text)
+    events = [event for event, _ in frames]
+    assert sorted(events[:3]) == ["flights", "hotels", "sights"]
+    assert "Alfama Inn" in dict(frames[:3])["hotels"]["text"]
+    deltas = [data["delta"] for event, data in frames if event == "itinerary"]
+    assert len(deltas) > 1 and events[3:] == ["itinerary"] * len(deltas) + ["done"]
+    assert "".join(deltas) == frames[-1][1]["itinerary"] == itinerary
+
+
+def test_stream_reports_failures_as_error_events(replayed):
+    app, fixtures, _ = replayed  # no LLM fixture recorded: the model call fails after the searches
+
+    frames = sse_frames(post(app, "/plan-itinerary/stream", plan_request("2026-05-01", "2026-05-03")).text)
+    assert [event for event, _ in frames[3:]] == ["error"]
+    assert frames[-1][1]["status"] == 500 and "No recorded LLM fixture" in frames[-1][1]["detail"]
+
+    fixtures.save("google_flights", None, {"best_flights": []}, default=True)
+    fixtures.save("google_hotels", None, {"properties": []}, default=True)
+    frames = sse_frames(post(app, "/plan-itinerary/stream", plan_request("2026-06-01", "2026-06-03")).text)
+    assert frames[-1] == ("error", {"status": 400, "detail": "No flights or hotels found for the given criteria"})
+    assert len(frames) == 4
+
+
+def test_batch_stream_and_flexible_paths_plan_day_routes_when_geo_planning_is_on(replayed, monkeypatch):
+    app, fixtures, _ = replayed
+    monkeypatch.setenv("GEO_DAY_PLANNING", "true")
+    monkeypatch.setattr(geo_planner, "gazetteer", geo_planner.Gazetteer(
+        {"Alfama Inn": [38.7118, -9.1300], "Belém Tower": [38.6916, -9.2160]}, MemoryCache("geo")))
+    fixtures.save("llm", None, "# Lisbon\n## Day 1: Belém\n## Day 2: Alfama", default=True)
+
+    post(app, "/plan-itinerary/batch", {"requests": [plan_request("2026-05-01", "2026-05-03")]})
+    post(app, "/plan-itinerary/stream", plan_request("2026-06-01", "2026-06-03"))
+    flexible = dict(plan_request("2026-07-01", "2026-07-03"), outbound_flex_days=0, return_flex_days=0)
+    assert post(app, "/plan-itinerary/flexible", flexible).status_code == 200
+
+    assert len(CountingReplayLLM.prompts) == 3
+    assert all("each day starts and ends at Alfama Inn" in prompt for prompt in CountingReplayLLM.prompts)
@@ -1,12 +1,66 @@
 import sys
 sys.path.append('')
+
+if __name__ == "__main__":
+    # Multi-worker mode has to pick the shared stores before the app modules are imported
+    import serve
+    if serve.worker_count(sys.argv[1:]) > 1:
+        sys.exit(serve.main(sys.argv[1:]))
+
+import os
+from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from api.routes import router
+from api.routes import router, job_queue
+from agents.llm_router import llm_router
+from modules.Service_Api import serpapi_transport, search_prefetcher
+from modules.prefetcher import prefetch_enabled, prefetch_snapshot_path
+from modules.pdf_renderer import pdf_render_pool
+from modules.warmup import start_warm_up, warmup_enabled
+from utils.logger import get_logger
+from utils.metrics import MetricsMiddleware
+from utils.workers import is_primary_worker
+
+logger = get_logger(__name__)
 
-app = FastAPI(title="Travel Agent")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()
+    await pdf_render_pool.start()
+    if warmup_enabled():
+        # Heavy subsystems otherwise load on first use; don't hold up the health check for them
+        start_warm_up()
+    # With several workers, one prefetcher and one health loop serve them all
+    primary = is_primary_worker()
+    snapshot = prefetch_snapshot_path()
+    if snapshot and os.path.exists(snapshot):
+        try:
+            # Every worker warms its cache, the request counts are seeded once
+            loaded = search_prefetcher.import_snapshot(snapshot, counts=primary)
+            logger.info(f"Loaded {loaded} searches from {snapshot}")
+        except Exception:
+            logger.exception(f"Could not load prefetch snapshot {snapshot}")
+    if prefetch_enabled():
+        # The other workers only publish their request counts for the first one to rank
+        search_prefetcher.start(refresh=primary)
+    if llm_router is not None and primary:
+        llm_router.start()
+    yield
+    if llm_router is not None:
+        await llm_router.stop()
+    await search_prefetcher.stop()
+    if snapshot and primary:
+        search_prefetcher.export_snapshot(snapshot)
+    await job_queue.stop()
+    pdf_render_pool.shutdown()
+    # Release pooled upstream connections on shutdown
+    await serpapi_transport.close()
+
+
+app = FastAPI(title="Travel Agent", lifespan=lifespan)
 
 # CORS configuration so the standalone static frontend (opened via file:// or another port) can call the API.
 # 405 Method Not Allowed was likely from a blocked OPTIONS preflight for application/json POST.
@@ -18,7 +72,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms for GET /metrics; SERVER_TIMING=true also adds a Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(router)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    args = serve.parse_args(sys.argv[1:])
+    uvicorn.run(app, host=args.host, port=args.port, timeout_graceful_shutdown=args.drain_timeout)
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""Parsing and formatting cost of large search results: validated models vs the fast path.
+
+Feeds SerpAPI-shaped payloads with hundreds of results through the real
+flight_schedules / hotel_list / tourist_attractions parsers (run_search is
+stubbed) and then through format_api_data. The legacy path builds pydantic
+models and renders with repeated string concatenation; the fast path builds
+slotted records and renders with a single join.
+
+Usage (from backend/):
+    python -m benchmarks.bench_formatting --results 500 --repeat 20
+    python -m benchmarks.bench_formatting --fixtures fixtures/serpapi
+"""
+import sys
+sys.path.append('')
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+
+from models.api_models import FlightSchedule, HotelDetails, Sights
+from modules import Service_Api
+from modules.helper import format_api_data
+
+
+def legacy_format_api_data(data_type, data):
+    """format_api_data as it was before the join-based renderer (+= concatenation)."""
+    if isinstance(data, dict) and "error" in data:
+        return f"❌ **Error retrieving {data_type}**: {data['error']}"
+    if not data:
+        return f"ℹ️ No {data_type} information available."
+    if data_type == "flights":
+        formatted_text = "✈️ **Available Flight Options**:\n\n"
+        for i, flight in enumerate(data):
+            formatted_text += (
+                f"**Flight {i + 1}:**\n"
+                f"🛬 **Destination:** {flight.destination_airport}\n"
+                f"⏱️ **Duration:** {flight.duration} minutes\n"
+                f"🛑 **Stops:** {flight.stops}\n"
+                f"🕔 **Departure:** {flight.departure_time}\n"
+                f"🕖 **Arrival:** {flight.arrival_time}\n"
+                f"💰 **Price:** ${flight.price}\n\n"
+            )
+    elif data_type == "hotels":
+        formatted_text = "🏨 **Available Hotel Options**:\n\n"
+        for i, hotel in enumerate(data):
+            formatted_text += (
+                f"**Hotel {i + 1}:**\n"
+                f"🏨 **Name:** {hotel.name}\n"
+                f"📝 **Description:** {hotel.description[:100]}{'...' if len(hotel.description) > 100 else ''}\n"
+                f"💰 **Cost per night:** ${hotel.cost_per_night}\n"
+                f"⭐ **Rating:** {hotel.rating}\n"
+                f"🔗 **More Info:** [Link]({hotel.link})\n\n"
+            )
+    else:
+        formatted_text = "🗿 **Available Tourist Attractions**:\n\n"
+        for i, sight in enumerate(data):
+            formatted_text += (
+                f"**Attraction {i + 1}:**\n"
+                f"🏛️ **Name:** {sight.name}\n"
+                f"📝 **Description:** {sight.description[:100]}{'...' if len(sight.description) > 100 else ''}\n"
+                f"📍 **Location:** {sight.location}\n"
+                f"⭐ **Rating:** {sight.rating}\n"
+                f"🔗 **More Info:** [Link]({sight.link})\n\n"
+            )
+    return formatted_text.strip()
+
+
+def synthetic_payloads(results: int) -> dict:
+    description = "Spacious rooms close to the old town, rooftop pool, breakfast included and a 24h front desk. " * 2
+    return {
+        "google_flights": {"best_flights": [
+            {"flights": [{"departure_airport": {"name": "JFK", "time": "2026-11-01 08:00"},
+                          "arrival_airport": {"name": f"Airport {i % 7}", "time": "2026-11-01 20:00"}}] * (1 + i % 3),
+             "total_duration": 300 + i, "price": 200 + i}
+            for i in range(results)
+        ]},
+        "google_hotels": {"properties": [
+            {"name": f"Hotel {i}", "description": description, "rate_per_night": {"lowest": f"${80 + i}"},
+             "overall_rating": 3.5 + (i % 15) / 10, "link": f"https://example.com/hotel/{i}", "extracted_hotel_class": 2 + i % 4}
+            for i in range(results)
+        ]},
+        "tripadvisor": {"locations": [
+            {"title": f"Sight {i}", "description": description, "location": "Lisbon, Portugal",
+             "rating": 3.0 + (i % 20) / 10, "link": f"https://example.com/sight/{i}"}
+            for i in range(results)
+        ]},
+    }
+
+
+def recorded_payloads(directory: str) -> dict:
+    """Largest recorded response per engine from a SERPAPI_TRANSPORT=record fixture directory."""
+    payloads = {}
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        with open(path, "r", encoding="utf-8") as handle:
+            fixture = json.load(handle)
+        engine = os.path.basename(path).split("-")[0].removesuffix(".json")
+        if len(json.dumps(fixture["response"])) > len(json.dumps(payloads.get(engine, {}))):
+            payloads[engine] = fixture["response"]
+    return payloads
+
+
+SEARCHES = (
+    ("google_flights", "flights", lambda: Service_Api.flight_schedules(
+        FlightSchedule(departure_airport_code="JFK", arrival_airport_code="LIS", outbound_date="2026-11-01", return_date="2026-11-08"))),
+    ("google_hotels", "hotels", lambda: Service_Api.hotel_list(
+        HotelDetails(city="Lisbon", check_in_date="2026-11-01", check_out_date="2026-11-08", hotel_class="4"))),
+    ("tripadvisor", "attractions", lambda: Service_Api.tourist_attractions(Sights(query="Lisbon"))),
+)
+
+
+def measure(payloads: dict, fast: bool, repeat: int):
+    """Seconds per parse and per format, summed over the three searches."""
+    os.environ["SEARCH_FAST_PATH"] = "true" if fast else "false"
+    formatter = format_api_data if fast else legacy_format_api_data
+    parse_seconds = format_seconds = 0.0
+    texts = []
+    for engine, data_type, search in SEARCHES:
+        if engine not in payloads:
+            continue
+
+        async def fake_run_search(params, payload=payloads[engine]):
+            return payload
+
+        Service_Api.run_search = fake_run_search
+
+        async def run(search=search, data_type=data_type):
+            parse = fmt = 0.0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                parsed = await search()
+                middle = time.perf_counter()
+                text = formatter(data_type, parsed)
+                parse += middle - start
+                fmt += time.perf_counter() - middle
+            return parse, fmt, text
+
+        parse, fmt, text = asyncio.run(run())
+        parse_seconds += parse
+        format_seconds += fmt
+        texts.append(text)
+    return parse_seconds / repeat, format_seconds / repeat, texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=500, help="results per engine in the synthetic payloads")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--fixtures", default=None, help="recorded SerpAPI fixture directory instead of synthetic payloads")
+    args = parser.parse_args()
+
+    payloads = recorded_payloads(args.fixtures) if args.fixtures else synthetic_payloads(args.results)
+    legacy_parse, legacy_format, legacy_texts = measure(payloads, fast=False, repeat=args.repeat)
+    fast_parse, fast_format, fast_texts = measure(payloads, fast=True, repeat=args.repeat)
+    assert fast_texts == legacy_texts, "fast path must render identical text"
+
+    print(f"{'path':<26}{'parse ms':>10}{'format ms':>11}{'total ms':>10}")
+    print(f"{'pydantic + concatenation':<26}{legacy_parse * 1000:>10.2f}{legacy_format * 1000:>11.2f}{(legacy_parse + legacy_format) * 1000:>10.2f}")
+    print(f"{'records + join':<26}{fast_parse * 1000:>10.2f}{fast_format * 1000:>11.2f}{(fast_parse + fast_format) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""PDF rendering benchmark on multi-hundred-page itineraries.
+
+Compares the original quadratic renderer (kept here as the baseline), the
+linear-time engine in modules/pdf_renderer.py, and a cached re-download.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf --days 120
+"""
+import sys
+sys.path.append('')
+import argparse
+import asyncio
+import re
+import time
+from io import BytesIO
+
+from reportlab.pdfgen import canvas
+
+from modules.pdf_renderer import pdf_cache, render_pdf, render_pdf_bytes
+
+
+def legacy_download_data(text: str) -> BytesIO:
+    """The renderer as it was before the PDF engine: re-measures the whole line per word."""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, invariant=True)
+    page_width, page_height = 595.27, 841.89
+    left_margin = right_margin = top_margin = bottom_margin = 50
+    line_height = 14
+    y_position = page_height - top_margin
+    for line in text.split('\n'):
+        clean_line = line.strip()
+        if y_position < bottom_margin:
+            c.showPage()
+            y_position = page_height - top_margin
+        if clean_line.startswith('###'):
+            c.setFont("Helvetica-Bold", 11)
+            clean_line = clean_line.replace('###', '').strip()
+        elif clean_line.startswith('##'):
+            c.setFont("Helvetica-Bold", 13)
+            clean_line = clean_line.replace('##', '').strip()
+        elif clean_line.startswith('#'):
+            c.setFont("Helvetica-Bold", 16)
+            clean_line = clean_line.replace('#', '').strip()
+        elif '**' in clean_line:
+            c.setFont("Helvetica-Bold", 10)
+            clean_line = clean_line.replace('**', '')
+        else:
+            c.setFont("Helvetica", 10)
+        clean_line = ''.join(char for char in clean_line if ord(char) < 128 or char.isspace())
+        max_width = page_width - left_margin - right_margin
+        if clean_line:
+            current_line = ''
+            for word in clean_line.split(' '):
+                test_line = current_line + word + ' '
+                if c.stringWidth(test_line, c._fontname, c._fontsize) < max_width:
+                    current_line = test_line
+                else:
+                    if current_line:
+                        c.drawString(left_margin, y_position, current_line.strip())
+                        y_position -= line_height
+                        if y_position < bottom_margin:
+                            c.showPage()
+                            y_position = page_height - top_margin
+                    current_line = word + ' '
+            if current_line.strip():
+                c.drawString(left_margin, y_position, current_line.strip())
+                y_position -= line_height
+        else:
+            y_position -= line_height / 2
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def sample_itinerary(days: int) -> str:
+    """Markdown itinerary with long, emoji-heavy paragraphs like the LLM produces."""
+    paragraph = ("🏛️ Start the morning with a guided walk through the historic quarter, stopping at the "
+                 "cathedral, the covered market and the riverside promenade before a relaxed café break. ") * 6
+    parts = ["# 🌍 Grand Tour Itinerary", "", "## ✈️ Flights", "**Outbound:** JFK → CDG, 08:15 - 21:40", ""]
+    for day in range(1, days + 1):
+        parts += [f"## Day {day}: Exploring the city", "", "### Morning"]
+        parts += [f"- {paragraph}" for _ in range(3)]
+        parts += ["", "### 🍽️ Dining", f"- **Lunch:** {paragraph}", f"- **Dinner:** {paragraph}", ""]
+    return "\n".join(parts)
+
+
+def _pages(pdf: bytes) -> int:
+    return len(re.findall(rb"/Type /Page\b", pdf))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=120, help="itinerary length; ~2.5 pages per day")
+    args = parser.parse_args()
+
+    text = sample_itinerary(args.days)
+    print(f"itinerary: {len(text) / 1024:.0f} KiB, {text.count(chr(10)) + 1} lines")
+
+    start = time.perf_counter()
+    legacy = legacy_download_data(text).getvalue()
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = render_pdf_bytes(text, invariant=True)
+    engine_s = time.perf_counter() - start
+
+    pdf_cache.clear()
+
+    async def first_and_cached():
+        first_start = time.perf_counter()
+        await render_pdf(text)
+        first = time.perf_counter() - first_start
+        cached_start = time.perf_counter()
+        await render_pdf(text)
+        return first, time.perf_counter() - cached_start
+
+    pooled_s, cached_s = asyncio.run(first_and_cached())
+
+    print(f"{'renderer':<28}{'seconds':>10}{'pages':>8}")
+    print(f"{'legacy (quadratic wrap)':<28}{legacy_s:>10.3f}{_pages(legacy):>8}")
+    print(f"{'engine (linear wrap)':<28}{engine_s:>10.3f}{_pages(engine):>8}")
+    print(f"{'engine via worker pool':<28}{pooled_s:>10.3f}")
+    print(f"{'cached re-download':<28}{cached_s:>10.5f}")
+    print(f"speedup: {legacy_s / engine_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""PDF throughput under concurrent load for the thread and process render backends.
+
+Fires a burst of distinct itineraries at a PDFRenderPool for each worker count
+up to the number of cores and reports documents per second. The process
+backend should scale with cores; the thread backend stays GIL-bound.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_pool --docs 24 --days 20
+"""
+import sys
+sys.path.append('')
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.bench_pdf import sample_itinerary
+from modules.pdf_renderer import PDFRenderPool
+
+
+async def _throughput(backend: str, workers: int, texts):
+    pool = PDFRenderPool(backend=backend, workers=workers, max_queue=len(texts), timeout=600)
+    await pool.start()
+    await pool.ready()
+    try:
+        start = time.perf_counter()
+        pdfs = await asyncio.gather(*(pool.render(text) for text in texts))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+    assert all(pdf.startswith(b"%PDF") for pdf in pdfs)
+    return len(texts) / elapsed
+
+
+def _worker_counts(cores: int):
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=24, help="documents rendered per run")
+    parser.add_argument("--days", type=int, default=20, help="itinerary length per document")
+    args = parser.parse_args()
+
+    base = sample_itinerary(args.days)
+    texts = [f"{base}\n\nDocument {i}" for i in range(args.docs)]
+    cores = os.cpu_count() or 1
+    print(f"{args.docs} documents of {args.days} days each, {cores} cores")
+    print(f"{'backend':<10}{'workers':>8}{'docs/s':>10}")
+    for backend in ("thread", "process"):
+        for workers in _worker_counts(cores):
+            rate = asyncio.run(_throughput(backend, workers, texts))
+            print(f"{backend:<10}{workers:>8}{rate:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
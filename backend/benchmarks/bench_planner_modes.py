@@ -0,0 +1,97 @@
+"""Per-request overhead of the itinerary planner execution modes, using a stubbed LLM.
+
+Compares building a fresh Agent/Task/Crew per request (the old behaviour), the
+pooled pre-built crew, and the direct LLM mode. The stub returns instantly, so
+the numbers are pure orchestration overhead.
+
+Usage (from backend/):
+    python -m benchmarks.bench_planner_modes --requests 50
+"""
+import sys
+sys.path.append('')
+import os
+os.environ.setdefault("CREWAI_TESTING", "true")  # skip CrewAI's interactive first-run trace prompt
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from crewai import LLM
+
+from agents.crew_agent import PlannerPool, build_itinerary_prompt, build_planner_crew, crew_output_text, run_direct
+
+STUB_ITINERARY = "# 🌴 Trip Itinerary\n\n## Day 1\n- 🏛️ Visit the old town (2h)\n- 🍽️ Dinner by the harbour\n"
+
+
+class StubLLM(LLM):
+    """LLM that answers immediately with a canned itinerary."""
+
+    def call(self, messages, *args, **kwargs):
+        return STUB_ITINERARY
+
+
+def _prompt(i: int) -> str:
+    return build_itinerary_prompt(
+        must_visit_locations=f"Attraction {i}",
+        flights_text="✈️ **Available Flight Options**:\n\n**Flight 1:**\n💰 **Price:** $420",
+        hotels_text="🏨 **Available Hotel Options**:\n\n**Hotel 1:**\n🏨 **Name:** Harbour Inn",
+        check_in_date="2026-11-01",
+        check_out_date="2026-11-05",
+    )
+
+
+def _modes(llm):
+    pool = PlannerPool(size=1, factory=lambda: build_planner_crew(llm))
+
+    async def rebuild(prompt):
+        crew = build_planner_crew(llm)
+        return crew_output_text(await asyncio.to_thread(crew.kickoff, inputs={"itinerary_prompt": prompt}))
+
+    async def pooled(prompt):
+        return await pool.run(prompt)
+
+    async def direct(prompt):
+        return await run_direct(prompt, llm)
+
+    return {"rebuild per request": rebuild, "pooled crew": pooled, "direct LLM": direct}
+
+
+async def _time_mode(run, requests: int):
+    await run(_prompt(-1))  # warm-up: imports, pool construction
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        output = await run(_prompt(i))
+        timings.append((time.perf_counter() - start) * 1000)
+        assert STUB_ITINERARY.strip() in output
+    return timings
+
+
+async def _memory_mode(run, requests: int):
+    await run(_prompt(-1))
+    tracemalloc.start()
+    for i in range(requests):
+        await run(_prompt(i))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    llm = StubLLM(model="gemini/gemini-2.0-flash", api_key="stub")
+    print(f"{'mode':<22}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'retained KiB':>15}{'peak KiB':>12}")
+    for name, run in _modes(llm).items():
+        timings = asyncio.run(_time_mode(run, args.requests))
+        current, peak = asyncio.run(_memory_mode(run, args.requests))
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        print(f"{name:<22}{statistics.mean(timings):>10.2f}{statistics.median(timings):>10.2f}{p95:>10.2f}"
+              f"{current / 1024:>15.1f}{peak / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Cold-start time of the API process: module import, first /health answer, and warm-up.
+
+Each run starts a fresh interpreter, so nothing is shared with earlier runs
+except the OS page cache. With --warmup the server is started with
+WARMUP_ON_STARTUP=true and the time until the background warm-up reports
+'done' on /health is measured as well.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 3 --warmup
+"""
+import sys
+sys.path.append('')
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import time
+import urllib.request
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], check=True, env=_env(), stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _env(**extra) -> dict:
+    env = dict(os.environ, CREWAI_TESTING="true", LOG_LEVEL="WARNING", **extra)
+    env["PYTHONPATH"] = os.getcwd()
+    return env
+
+
+def _health(port: int):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+
+def time_server(warmup: bool, timeout: float = 120.0):
+    """Seconds until /health first answers, and until warm-up finished (None without --warmup)."""
+    port = _free_port()
+    env = _env(WARMUP_ON_STARTUP="true" if warmup else "false")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    healthy = warmed = None
+    try:
+        while time.perf_counter() - start < timeout:
+            body = _health(port)
+            if body is not None:
+                if healthy is None:
+                    healthy = time.perf_counter() - start
+                if not warmup:
+                    break
+                if body["warmup"]["state"] in ("done", "failed"):
+                    warmed = time.perf_counter() - start
+                    break
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return healthy, warmed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", action="store_true", help="also measure the background warm-up")
+    args = parser.parse_args()
+
+    imports, healthy, warmed = [], [], []
+    for _ in range(args.runs):
+        imports.append(time_import())
+        to_health, to_warm = time_server(args.warmup)
+        healthy.append(to_health)
+        if to_warm is not None:
+            warmed.append(to_warm)
+
+    print(f"{'measurement':<28}{'median s':>10}{'max s':>10}")
+    rows = [("import app", imports), ("first /health answer", healthy)]
+    if warmed:
+        rows.append(("warm-up finished", warmed))
+    for label, values in rows:
+        values = [value for value in values if value is not None]
+        print(f"{label:<28}{statistics.median(values):>10.2f}{max(values):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Offline load test of the full API: req/s and latency percentiles per endpoint.
+
+Drives the FastAPI app in-process through httpx's ASGI transport with SerpAPI
+and the LLM in replay mode, so no network access or API keys are needed.
+Without --fixtures, synthetic per-engine and LLM default fixtures are written
+to a temporary directory; point --fixtures at a directory recorded with
+SERPAPI_TRANSPORT=record / LLM_MODE=record (it must contain serpapi/ and llm/)
+to replay real responses instead.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --requests 200 --concurrency 20 --latency-ms 150
+"""
+import sys
+sys.path.append('')
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from utils.fixtures import FixtureStore
+
+
+def write_synthetic_fixtures(directory: str, days: int = 5) -> None:
+    """Per-engine SerpAPI defaults and an LLM default shaped like the real responses."""
+    serpapi = FixtureStore(os.path.join(directory, "serpapi"))
+    serpapi.save("google_flights", None, {"best_flights": [
+        {
+            "flights": [
+                {"departure_airport": {"name": "JFK", "time": "2026-11-01 08:00"},
+                 "arrival_airport": {"name": "Hub", "time": "2026-11-01 11:00"}},
+                {"departure_airport": {"name": "Hub", "time": "2026-11-01 12:30"},
+                 "arrival_airport": {"name": "Lisbon Airport", "time": "2026-11-01 20:00"}},
+            ][:1 + i % 2],
+            "total_duration": 420 + 30 * i,
+            "price": 380 + 25 * i,
+        }
+        for i in range(8)
+    ]}, default=True)
+    serpapi.save("google_hotels", None, {"properties": [
+        {"name": f"Hotel {i}", "description": "Central hotel with rooftop bar and breakfast included.",
+         "rate_per_night": {"lowest": f"${90 + 15 * i}"}, "overall_rating": 3.8 + (i % 5) / 5,
+         "link": f"https://example.com/hotel/{i}", "extracted_hotel_class": 3 + i % 3}
+        for i in range(15)
+    ]}, default=True)
+    serpapi.save("tripadvisor", None, {"locations": [
+        {"title": f"Sight {i}", "description": "Popular landmark with panoramic views.",
+         "location": "Lisbon, Portugal", "rating": 4.0 + (i % 10) / 10, "link": f"https://example.com/sight/{i}"}
+        for i in range(30)
+    ]}, default=True)
+
+    sections = ["# 🌍 Lisbon Getaway\n\n✈️ Arrive at Lisbon Airport, 🏨 check in at Hotel 3."]
+    for day in range(1, days + 1):
+        sections.append(
+            f"## Day {day}\n"
+            "- 🕘 09:00 🏛️ Sight walk through the old town (2h)\n"
+            "- 🍽️ 13:00 Lunch at a local tasca\n"
+            "- 🕒 15:00 🖼️ Museum visit (2h)\n"
+            "- 🍷 20:00 Dinner with a view\n"
+            "- 🚋 Tip: take tram 28 early to beat the queues"
+        )
+    FixtureStore(os.path.join(directory, "llm")).save("llm", None, "\n\n".join(sections), default=True)
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def plan_payload(i: int) -> dict:
+    # Vary the dates so requests are distinct searches and prompts
+    day = 1 + i % 28
+    return {
+        "flight_request": {"departure_airport_code": "JFK", "arrival_airport_code": "LIS",
+                           "outbound_date": f"2026-11-{day:02d}", "return_date": f"2026-12-{day:02d}"},
+        "hotel_request": {"city": "Lisbon", "check_in_date": f"2026-11-{day:02d}",
+                          "check_out_date": f"2026-11-{min(day + 4, 30):02d}", "hotel_class": "4"},
+        "sights_request": {"query": f"Lisbon attractions {i}"},
+    }
+
+
+async def run_load(client, method: str, path: str, payloads, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(payload):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, path, json=payload)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(payload) for payload in payloads))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(payloads),
+        "errors": failures,
+        "rps": len(payloads) / elapsed,
+        "mean": statistics.fmean(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+async def main_async(args):
+    import httpx
+    from app import app
+    from benchmarks.bench_pdf import sample_itinerary
+    from modules.warmup import warm_up
+
+    distinct = args.distinct or args.requests
+    plan_payloads = [plan_payload(i % distinct) for i in range(args.requests)]
+    base_text = sample_itinerary(args.days)
+    pdf_payloads = [{"itinerary_text": f"{base_text}\n\nRequest {i % distinct}"} for i in range(args.requests)]
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with app.router.lifespan_context(app):
+        # Measure steady state, not the lazy first-use import of CrewAI and ReportLab
+        await asyncio.to_thread(warm_up)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            if "plan" in args.endpoints:
+                results["/plan-itinerary"] = await run_load(client, "POST", "/plan-itinerary", plan_payloads, args.concurrency)
+            if "pdf" in args.endpoints:
+                results["/generate-pdf"] = await run_load(client, "POST", "/generate-pdf", pdf_payloads, args.concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="artificial latency per replayed upstream call")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct payloads, the rest repeat and hit caches (default: all distinct)")
+    parser.add_argument("--days", type=int, default=7, help="itinerary length for /generate-pdf")
+    parser.add_argument("--endpoints", default="plan,pdf", help="comma-separated subset of: plan, pdf")
+    parser.add_argument("--fixtures", default=None, help="recorded fixture directory (default: synthetic)")
+    args = parser.parse_args()
+
+    fixtures = args.fixtures or tempfile.mkdtemp(prefix="smartitinerary-fixtures-")
+    if args.fixtures is None:
+        write_synthetic_fixtures(fixtures)
+    # Configure replay before the app (and its module-level clients) is imported
+    os.environ.update({
+        "SERPAPI_TRANSPORT": "replay",
+        "SERPAPI_FIXTURES_DIR": os.path.join(fixtures, "serpapi"),
+        "LLM_MODE": "replay",
+        "LLM_FIXTURES_DIR": os.path.join(fixtures, "llm"),
+        "REPLAY_LATENCY_MS": str(args.latency_ms),
+    })
+    # Upstream rate budgets protect real quotas; they would only measure the token bucket here
+    os.environ.setdefault("SERPAPI_RATE_PER_SEC", "0")
+    os.environ.setdefault("LLM_RATE_PER_SEC", "0")
+    os.environ.setdefault("CREWAI_TESTING", "true")  # skip CrewAI's interactive first-run trace prompt
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    results = asyncio.run(main_async(args))
+    print(f"{args.requests} requests per endpoint, concurrency {args.concurrency}, "
+          f"replay latency {args.latency_ms:.0f} ms, {args.distinct or args.requests} distinct payloads")
+    print(f"{'endpoint':<18}{'req/s':>9}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for endpoint, r in results.items():
+        print(f"{endpoint:<18}{r['rps']:>9.1f}{r['mean'] * 1000:>10.1f}{r['p50'] * 1000:>9.1f}"
+              f"{r['p95'] * 1000:>9.1f}{r['p99'] * 1000:>9.1f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
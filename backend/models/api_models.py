@@ -1,5 +1,7 @@
 from pydantic import BaseModel, field_validator, Field
+from typing import List, Optional
 from datetime import date
+from utils.callback_urls import callback_url_error
 
 
 class Sights(BaseModel):
@@ -29,6 +31,8 @@ class SightsResponse(BaseModel):
     location: str
     rating: float                            
     link: str
+    latitude: Optional[float] = None  # when the api reports gps coordinates
+    longitude: Optional[float] = None
 
 
 class FlightResponse(BaseModel):
@@ -50,6 +54,9 @@ class HotelResponse(BaseModel):
     cost_per_night: str
     rating: float
     link: str 
+    hotel_class: Optional[int] = None  # star class when the api reports it
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     
 
 class RequestResponse(BaseModel):
@@ -58,9 +65,85 @@ class RequestResponse(BaseModel):
     hotel_request: HotelDetails
     sights_request: Sights 
 
+class PlanItineraryRequest(RequestResponse):
+    """Request body for planning, with the plan id of an earlier response to refine that plan"""
+    plan_id: Optional[str] = None
+
+
+class FlexibleItineraryRequest(RequestResponse):
+    """Planning request whose flight and stay dates may move by up to the given number of days"""
+    outbound_flex_days: int = Field(2, ge=0, le=7, description="Days the outbound/check-in date may move either way")
+    return_flex_days: int = Field(2, ge=0, le=7, description="Days the return/check-out date may move either way")
+    stay_flex_nights: int = Field(0, ge=0, le=7, description="Nights the stay may be shorter or longer than requested")
+
+
+class DatePairCost(BaseModel):
+    """Cheapest flight and hotel prices found for one outbound/return date pair"""
+    outbound_date: str
+    return_date: str
+    nights: int
+    flight_price: Optional[float] = None
+    hotel_nightly: Optional[float] = None
+    total_cost: Optional[float] = None  # round-trip flight + nightly rate x nights
+    cost_per_night: Optional[float] = None  # total_cost / nights, what date pairs are ranked by
+
+
+class FlexibleItineraryResponse(BaseModel):
+    """Itinerary for the cheapest date pair, with the searched date grid"""
+    itinerary: str
+    outbound_date: str
+    return_date: str
+    cheapest: List[DatePairCost]
+    grid: List[DatePairCost]
+
+
 class ItineraryResponse(BaseModel):
     """Final itinerary response"""
     itinerary: str
+    plan_id: Optional[str] = None  # send back with a changed request to refine this plan
 
 class PDFRequest(BaseModel):
     itinerary_text: str
+
+
+class ItineraryJobRequest(RequestResponse):
+    """Request body for queuing an itinerary job, with an optional completion webhook"""
+    callback_url: Optional[str] = None
+
+    @field_validator("callback_url")
+    @classmethod
+    def callback_url_is_public(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            error = callback_url_error(value)
+            if error is not None:
+                raise ValueError(error)
+        return value
+
+
+class JobStatusResponse(BaseModel):
+    """State of a queued itinerary job"""
+    job_id: str
+    status: str  # pending, running, succeeded or failed
+    deduplicated: bool = False
+    itinerary: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    expires_at: float
+
+
+class BatchItineraryRequest(BaseModel):
+    """Several itinerary requests planned together, e.g. a group or candidate destinations"""
+    requests: List[RequestResponse] = Field(..., min_length=1, max_length=50)
+
+
+class BatchItemResult(BaseModel):
+    """Outcome for one request of a batch, in request order"""
+    index: int
+    itinerary: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchItineraryResponse(BaseModel):
+    """Per-request results of a batch planning call"""
+    results: List[BatchItemResult]
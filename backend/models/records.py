@@ -0,0 +1,71 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+
+# Lightweight counterparts of FlightResponse / HotelResponse / SightsResponse for
+# data we parse out of SerpAPI ourselves. They have the same fields, but skip
+# pydantic validation and store attributes in __slots__, which matters when a
+# search returns hundreds of results that are only ranked and rendered to text.
+# Numbers are still coerced the way the models do, so both render the same text
+# (an int rating of 4 is shown as 4.0).
+
+
+def _optional_float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+@dataclass(slots=True)
+class FlightRecord:
+    destination_airport: str
+    duration: int
+    stops: int
+    departure_time: str
+    arrival_time: str
+    price: str
+
+    def __post_init__(self):
+        self.duration = int(self.duration)
+        self.stops = int(self.stops)
+
+    def model_dump(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class HotelRecord:
+    name: str
+    description: str
+    cost_per_night: str
+    rating: float
+    link: str
+    hotel_class: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    def __post_init__(self):
+        self.rating = float(self.rating)
+        self.hotel_class = None if self.hotel_class is None else int(self.hotel_class)
+        self.latitude = _optional_float(self.latitude)
+        self.longitude = _optional_float(self.longitude)
+
+    def model_dump(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class SightRecord:
+    name: str
+    description: str
+    location: str
+    rating: float
+    link: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    def __post_init__(self):
+        self.rating = float(self.rating)
+        self.latitude = _optional_float(self.latitude)
+        self.longitude = _optional_float(self.longitude)
+
+    def model_dump(self) -> Dict[str, Any]:
+        return asdict(self)
@@ -3,26 +3,162 @@ sys.path.append('')
 from fastapi import HTTPException
 from typing import List
 import asyncio
-import serpapi
+import hashlib
+import json
 import os
 from models.api_models import Sights, FlightSchedule, HotelDetails, FlightResponse, HotelResponse, SightsResponse
+from models.records import FlightRecord, HotelRecord, SightRecord
+from modules.prefetcher import prefetcher_from_env
+from modules.serpapi_transport import transport_from_env
+from utils.cache import cache_from_env
 from utils.logger import get_logger
+from utils.metrics import stage
+from utils.resilience import CircuitBreaker, CircuitOpenError, UpstreamGuard
+from utils.scheduler import scheduler
+from utils.singleflight import SingleFlight
 from dotenv import load_dotenv
 load_dotenv()
 
 logger = get_logger(__name__)
 
-serpapi_client = serpapi.Client(api_key=os.getenv("SERP_API_KEY"))  # need to export it as export SERP_API_KEY
+serpapi_transport = transport_from_env(os.getenv("SERP_API_KEY"))  # need to export it as export SERP_API_KEY
 
+# Flights go stale within minutes, hotel rates within the hour, TripAdvisor barely changes.
+# Override per engine with e.g. SEARCH_CACHE_TTL_GOOGLE_FLIGHTS=600 (0 disables caching).
+DEFAULT_SEARCH_TTLS = {
+    "google_flights": 15 * 60,
+    "google_hotels": 60 * 60,
+    "tripadvisor": 24 * 60 * 60,
+}
+search_cache = cache_from_env("SEARCH_CACHE", namespace="serpapi", default_max_entries=2048)
+# Identical searches issued while one is already in flight share its result.
+search_singleflight = SingleFlight()
 
-async def run_search(params):
-    """Generic function to run SerpAPI searches asynchronously."""
+# A slow engine must not hold up the whole plan. Override per engine with e.g. SEARCH_TIMEOUT_GOOGLE_HOTELS=10.
+DEFAULT_SEARCH_TIMEOUTS = {
+    "google_flights": 20.0,
+    "google_hotels": 15.0,
+    "tripadvisor": 10.0,
+}
+_search_guards = {}
+
+
+def search_fast_path() -> bool:
+    """SEARCH_FAST_PATH (default: true) builds slotted records instead of validated pydantic models for parsed results."""
+    return os.getenv("SEARCH_FAST_PATH", "true").lower() not in ("0", "false", "no")
+
+
+def search_ttl(engine: str) -> float:
+    """TTL in seconds for results of the given SerpAPI engine."""
+    default = DEFAULT_SEARCH_TTLS.get(engine, int(os.getenv("SEARCH_CACHE_TTL_DEFAULT", "1800")))
+    return float(os.getenv(f"SEARCH_CACHE_TTL_{engine.upper()}", str(default)))
+
+
+def search_guard(engine: str) -> UpstreamGuard:
+    """Per-engine deadline, hedging and circuit breaker, configured by SEARCH_TIMEOUT_* / SEARCH_HEDGE* / SEARCH_BREAKER_*."""
+    guard = _search_guards.get(engine)
+    if guard is None:
+        default_timeout = DEFAULT_SEARCH_TIMEOUTS.get(engine, float(os.getenv("SEARCH_TIMEOUT_DEFAULT", "20")))
+        guard = UpstreamGuard(
+            engine,
+            timeout=float(os.getenv(f"SEARCH_TIMEOUT_{engine.upper()}", str(default_timeout))),
+            hedge=os.getenv("SEARCH_HEDGE", "true").lower() not in ("0", "false", "no"),
+            hedge_percentile=float(os.getenv("SEARCH_HEDGE_PERCENTILE", "95")),
+            hedge_min_samples=int(os.getenv("SEARCH_HEDGE_MIN_SAMPLES", "20")),
+            hedge_min_delay=float(os.getenv("SEARCH_HEDGE_MIN_DELAY", "0.25")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("SEARCH_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("SEARCH_BREAKER_COOLDOWN", "30")),
+            ),
+            # Our own scheduler rejecting a call says nothing about the engine's health
+            is_failure=lambda error: not isinstance(error, HTTPException),
+            # Queueing for a slot happens before the engine's deadline and latency clock start
+            admission=lambda: scheduler.slot("serpapi"),
+        )
+        _search_guards[engine] = guard
+    return guard
+
+
+def search_guard_stats() -> dict:
+    return {engine: guard.stats() for engine, guard in _search_guards.items()}
+
+
+def search_cache_key(params: dict) -> str:
+    """Normalize search params into a stable cache key (order, case and whitespace insensitive)."""
+    normalized = {}
+    for key, value in params.items():
+        if key == "api_key" or value is None:
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split()).lower()
+            if not value:
+                continue
+        normalized[key.lower()] = value
+    digest = hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{normalized.get('engine', 'unknown')}:{digest}"
+
+
+async def _fetch_search(params: dict, key: str) -> dict:
+    """Call SerpAPI once and store successful results in the search cache.
+
+    The caller holds the scheduler slot (see ``search_guard``).
+    """
     try:
-        return await asyncio.to_thread(lambda: serpapi_client.search(params).as_dict())
-        # return await asyncio.to_thread(serpapi_client.search, params).as_dict()
+        results = await serpapi_transport.search(params)
     except Exception as e:
         logger.exception(f"SerpAPI search error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Search API error: {str(e)}")
+        raise
+    if "error" not in results:
+        search_cache.set(key, results, search_ttl(params.get("engine", "")))
+    return results
+
+
+async def _guarded_fetch(params: dict, key: str) -> dict:
+    """Fetch through the engine's guard; concurrent identical fetches share one call."""
+    guard = search_guard(params.get("engine", "unknown"))
+    return await search_singleflight.do(key, lambda: guard.call(lambda: _fetch_search(params, key)))
+
+
+async def refresh_search(params: dict) -> dict:
+    """Fetch a search from SerpAPI even if it is cached, storing the fresh result (used by the prefetcher)."""
+    return await _guarded_fetch(params, search_cache_key(params))
+
+
+# Tracks how often each search is requested and keeps the popular ones warm (PREFETCH_*).
+search_prefetcher = prefetcher_from_env(search_cache, refresh_search, search_cache_key, search_ttl)
+
+
+async def run_search(params):
+    """Generic function to run SerpAPI searches asynchronously, served from the search cache when fresh.
+
+    Calls are bounded by the engine's deadline, hedged once they run past the
+    recent p95 latency, and short-circuited while the engine keeps failing. On
+    any failure an expired cache entry (up to SEARCH_STALE_MAX_AGE old) is served instead.
+    """
+    engine = params.get("engine", "unknown")
+    with stage(f"search.{engine}"):
+        key = search_cache_key(params)
+        search_prefetcher.record(params, key=key)
+        cached = search_cache.get(key)
+        if cached is not None:
+            logger.debug(f"Search cache hit for {key}")
+            return cached
+        guard = search_guard(engine)
+        try:
+            return await _guarded_fetch(params, key)
+        except Exception as e:
+            stale = search_cache.get_stale(key, max_stale=float(os.getenv("SEARCH_STALE_MAX_AGE", "86400")))
+            if stale is not None:
+                logger.warning(f"Serving stale {engine} results after {type(e).__name__}: {e}")
+                return stale
+            if isinstance(e, HTTPException):
+                raise
+            if isinstance(e, CircuitOpenError):
+                raise HTTPException(status_code=503, detail=f"Search engine {engine} is unavailable",
+                                    headers={"Retry-After": str(max(1, round(e.retry_after)))})
+            if isinstance(e, asyncio.TimeoutError):
+                raise HTTPException(status_code=504, detail=f"Search engine {engine} timed out after {guard.timeout}s")
+            raise HTTPException(status_code=500, detail=f"Search API error: {str(e)}")
 
 
 async def flight_schedules(flights:FlightSchedule) -> List[FlightResponse]:
@@ -42,6 +178,7 @@ async def flight_schedules(flights:FlightSchedule) -> List[FlightResponse]:
         return {"error":search_results["error"]}
     
     formatted_flights = []
+    record = FlightRecord if search_fast_path() else FlightResponse
     best_flights = search_results.get("best_flights", [])
     
     if not best_flights:
@@ -59,7 +196,7 @@ async def flight_schedules(flights:FlightSchedule) -> List[FlightResponse]:
         arrival_time = details.get("flights", [{}])[-1].get("arrival_airport", {}).get("time", "Unknown")
 
 
-        formatted_flights.append(FlightResponse(
+        formatted_flights.append(record(
             destination_airport=destination_airport,
             duration=details.get("total_duration",0),
             departure_time=departure_time,
@@ -94,14 +231,18 @@ async def hotel_list(hotel_request:HotelDetails) -> List[HotelResponse]:
         return []
 
     formatted_hotels = []
+    record = HotelRecord if search_fast_path() else HotelResponse
     
     for hotel in hotel_properties:
-        formatted_hotels.append(HotelResponse(
+        formatted_hotels.append(record(
             name = hotel.get("name", "Unknown Name"),
             description=hotel.get("description", "unknown description"),
-            cost_per_night=hotel.get("rate_per_night",{}).get("lowest", "N/A"),
-            rating=hotel.get("overall_rating", 0.0),
-            link=hotel.get("link", "N/A")
+            cost_per_night=str((hotel.get("rate_per_night") or {}).get("lowest", "N/A")),
+            rating=hotel.get("overall_rating") or 0.0,  # reported as null for unrated hotels
+            link=hotel.get("link", "N/A"),
+            hotel_class=hotel.get("extracted_hotel_class"),
+            latitude=hotel.get("gps_coordinates", {}).get("latitude"),
+            longitude=hotel.get("gps_coordinates", {}).get("longitude")
             ))
 
     logger.info(f"Found {len(formatted_hotels)} hotels")
@@ -128,14 +269,17 @@ async def tourist_attractions(attractions_request:Sights) -> List[SightsResponse
         return []
 
     formatted_attractions = []
+    record = SightRecord if search_fast_path() else SightsResponse
     
     for loc in attractions:
-        formatted_attractions.append(SightsResponse(
+        formatted_attractions.append(record(
             name=loc.get("title","N/A"),
             description=loc.get("description", "N/A"),
             location=loc.get("location", "Unknown"),
-            rating=loc.get("rating", 0.0),
-            link=loc.get("link", "N/A")    
+            rating=loc.get("rating") or 0.0,
+            link=loc.get("link", "N/A"),
+            latitude=loc.get("gps_coordinates", {}).get("latitude"),
+            longitude=loc.get("gps_coordinates", {}).get("longitude")
         ))
             
     logger.info(f"Found {len(formatted_attractions)} attractions")
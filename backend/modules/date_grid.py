@@ -0,0 +1,151 @@
+import sys
+sys.path.append('')
+import asyncio
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from fastapi import HTTPException
+
+from models.api_models import FlightSchedule, HotelDetails
+from modules.Service_Api import flight_schedules, hotel_list
+from modules.prompt_budget import parse_price
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def expand_dates(day: str, flex_days: int) -> List[str]:
+    """``day`` and the ``flex_days`` days either side of it, in order (YYYY-MM-DD)."""
+    try:
+        center = datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date {day!r}, expected YYYY-MM-DD")
+    return [(center + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(-flex_days, flex_days + 1)]
+
+
+def min_price_matrix(shape: Tuple[int, int], cells: List[Tuple[int, int, Any]], price_of):
+    """Cheapest price per grid cell from each cell's search results; NaN where a cell has none."""
+    import numpy as np
+    flat_index, prices = [], []
+    for row, col, results in cells:
+        if isinstance(results, dict):  # {"error": ...} from a failed search
+            continue
+        for item in results:
+            price = parse_price(price_of(item))
+            if price is not None:
+                flat_index.append(row * shape[1] + col)
+                prices.append(price)
+    matrix = np.full(shape[0] * shape[1], np.inf)
+    np.fmin.at(matrix, np.asarray(flat_index, dtype=np.intp), np.asarray(prices, dtype=float))
+    matrix[np.isinf(matrix)] = np.nan
+    return matrix.reshape(shape)
+
+
+def stay_nights(outbound_dates: List[str], return_dates: List[str]):
+    """Nights between every outbound and return date."""
+    import numpy as np
+    return (np.asarray(return_dates, dtype="datetime64[D]")[None, :]
+            - np.asarray(outbound_dates, dtype="datetime64[D]")[:, None]).astype(int)
+
+
+def trip_cost_matrix(outbound_dates: List[str], return_dates: List[str], flight_prices, hotel_nightly):
+    """Total trip cost (round-trip flight + nightly rate x nights), nights and cost per night for every date pair.
+
+    Pairs that are not a valid stay or lack a flight or hotel price cost ``inf``.
+    Cost per night is what stays of different lengths are compared on.
+    """
+    import numpy as np
+    nights = stay_nights(outbound_dates, return_dates)
+    total = flight_prices + hotel_nightly * nights
+    total = np.where((nights > 0) & np.isfinite(total), total, np.inf)
+    per_night = np.divide(total, nights, out=np.full(total.shape, np.inf), where=nights > 0)
+    return total, nights, per_night
+
+
+def cheapest_pairs(cost, k: int) -> List[Tuple[int, int]]:
+    """Grid indexes of the ``k`` cheapest finite cells, cheapest first."""
+    import numpy as np
+    order = np.argsort(cost, axis=None, kind="stable")[:k]
+    rows, cols = np.unravel_index(order, cost.shape)
+    return [(int(row), int(col)) for row, col in zip(rows, cols) if np.isfinite(cost[row, col])]
+
+
+def max_grid_cells() -> int:
+    """FLEX_MAX_CELLS bounds the date pairs (and so flight + hotel searches) per request (default: 49)."""
+    return int(os.getenv("FLEX_MAX_CELLS", "49"))
+
+
+async def search_date_grid(flight_request: FlightSchedule, hotel_request: HotelDetails, outbound_flex_days: int,
+                           return_flex_days: int, stay_flex_nights: int = 0, top: int = 5) -> Dict[str, Any]:
+    """Search flights and hotels for every outbound/return pair around the requested dates.
+
+    Only pairs whose stay is within ``stay_flex_nights`` of the requested number
+    of nights are searched, and they are ranked by cost per night, so a shorter
+    trip never wins just for being shorter. Searches run concurrently, at most
+    FLEX_MAX_PARALLEL at a time, and go through the search cache, so cells
+    searched before cost nothing. Returns the grid, the ``top`` cheapest pairs
+    and the search results of the cheapest one.
+    """
+    outbound_dates = expand_dates(flight_request.outbound_date, outbound_flex_days)
+    return_dates = expand_dates(flight_request.return_date, return_flex_days)
+    shape = (len(outbound_dates), len(return_dates))
+    requested_nights = int(stay_nights([flight_request.outbound_date], [flight_request.return_date])[0, 0])
+    nights = stay_nights(outbound_dates, return_dates)
+    pairs = [(row, col) for row in range(shape[0]) for col in range(shape[1])
+             if nights[row, col] > 0 and abs(nights[row, col] - requested_nights) <= stay_flex_nights]
+    if len(pairs) > max_grid_cells():
+        raise HTTPException(status_code=400, detail=f"Date grid has {len(pairs)} date pairs, at most {max_grid_cells()} are allowed")
+
+    semaphore = asyncio.Semaphore(int(os.getenv("FLEX_MAX_PARALLEL", "8")))
+
+    async def bounded(search, service_request):
+        async with semaphore:
+            try:
+                return await search(service_request)
+            except HTTPException as he:
+                return {"error": str(he.detail)}
+            except Exception as e:
+                logger.exception("Date grid search failed")
+                return {"error": str(e)}
+
+    searches = []
+    for row, col in pairs:
+        dates = {"outbound_date": outbound_dates[row], "return_date": return_dates[col]}
+        stay = {"check_in_date": outbound_dates[row], "check_out_date": return_dates[col]}
+        searches.append(bounded(flight_schedules, flight_request.model_copy(update=dates)))
+        searches.append(bounded(hotel_list, hotel_request.model_copy(update=stay)))
+    results = await asyncio.gather(*searches)
+    flights = [(row, col, result) for (row, col), result in zip(pairs, results[0::2])]
+    hotels = [(row, col, result) for (row, col), result in zip(pairs, results[1::2])]
+
+    flight_prices = min_price_matrix(shape, flights, lambda flight: flight.price)
+    hotel_nightly = min_price_matrix(shape, hotels, lambda hotel: hotel.cost_per_night)
+    total, nights, per_night = trip_cost_matrix(outbound_dates, return_dates, flight_prices, hotel_nightly)
+    best = cheapest_pairs(per_night, top)
+
+    def cell(row: int, col: int) -> Dict[str, Any]:
+        def value(matrix):
+            return None if not math.isfinite(matrix[row, col]) else round(float(matrix[row, col]), 2)
+        return {
+            "outbound_date": outbound_dates[row],
+            "return_date": return_dates[col],
+            "nights": int(nights[row, col]),
+            "flight_price": value(flight_prices),
+            "hotel_nightly": value(hotel_nightly),
+            "total_cost": value(total),
+            "cost_per_night": value(per_night),
+        }
+
+    by_cell = {(row, col): (flight, hotel) for (row, col, flight), (_, _, hotel) in zip(flights, hotels)}
+    cheapest_results = by_cell[best[0]] if best else None
+    return {
+        "grid": [cell(row, col) for row, col in pairs],
+        "cheapest": [cell(row, col) for row, col in best],
+        "flights": cheapest_results[0] if cheapest_results else None,
+        "hotels": cheapest_results[1] if cheapest_results else None,
+    }
+
+
+__all__ = ["expand_dates", "stay_nights", "min_price_matrix", "trip_cost_matrix", "cheapest_pairs", "search_date_grid"]
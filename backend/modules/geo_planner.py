@@ -0,0 +1,259 @@
+import sys
+sys.path.append('')
+import json
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from modules.prompt_budget import rank_hotels, rank_sights
+from utils.cache import cache_from_env
+from utils.logger import get_logger
+from utils.metrics import stage
+
+logger = get_logger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _place_key(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+class Gazetteer:
+    """Offline geocoder: a JSON file of known places plus coordinates learned from search results.
+
+    The file maps place names (optionally "name, location") to ``[latitude, longitude]``.
+    Coordinates that SerpAPI reports are remembered in ``cache`` so later results
+    for the same place, which may come without them, can still be placed.
+    """
+
+    def __init__(self, places: Optional[Dict[str, Sequence[float]]] = None, cache=None, ttl: float = 30 * 24 * 60 * 60):
+        self.places = {_place_key(name): (float(lat), float(lon)) for name, (lat, lon) in (places or {}).items()}
+        self.cache = cache
+        self.ttl = ttl
+
+    @classmethod
+    def from_file(cls, path: Optional[str], cache=None) -> "Gazetteer":
+        places = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as handle:
+                places = json.load(handle)
+        return cls(places, cache)
+
+    def learn(self, name: str, location: str, latitude: float, longitude: float) -> None:
+        if self.cache is not None:
+            self.cache.set(_place_key(f"{name}, {location}"), [latitude, longitude], self.ttl)
+
+    def locate(self, name: str, location: str = "") -> Optional[Tuple[float, float]]:
+        for key in (_place_key(f"{name}, {location}"), _place_key(name)):
+            if key in self.places:
+                return self.places[key]
+            learned = self.cache.get(key) if self.cache is not None else None
+            if learned is not None:
+                return tuple(learned)
+        return None
+
+    def coordinates(self, item) -> Optional[Tuple[float, float]]:
+        """Coordinates of a hotel or sight: reported by the search, else looked up."""
+        location = getattr(item, "location", "")
+        if item.latitude is not None and item.longitude is not None:
+            self.learn(item.name, location, item.latitude, item.longitude)
+            return float(item.latitude), float(item.longitude)
+        return self.locate(item.name, location)
+
+
+def haversine_matrix(a, b=None):
+    """Great-circle distances in km between every row of ``a`` and of ``b`` (``[lat, lon]`` in degrees)."""
+    import numpy as np
+    b = a if b is None else b
+    lat1, lon1 = np.radians(a[:, 0])[:, None], np.radians(a[:, 1])[:, None]
+    lat2, lon2 = np.radians(b[:, 0])[None, :], np.radians(b[:, 1])[None, :]
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def _project(coords, origin):
+    """Equirectangular projection to km around ``origin``; accurate enough within a city."""
+    import numpy as np
+    scale = np.radians(1.0) * EARTH_RADIUS_KM
+    return np.column_stack(((coords[:, 1] - origin[1]) * scale * math.cos(math.radians(origin[0])),
+                            (coords[:, 0] - origin[0]) * scale))
+
+
+def balanced_kmeans(points, k: int, iterations: int = 25, seed: int = 0):
+    """Cluster 2-D points into ``k`` groups of at most ``ceil(n / k)`` points; returns a label per point."""
+    import numpy as np
+    n = len(points)
+    k = max(1, min(k, n))
+    capacity = math.ceil(n / k)
+    rng = np.random.default_rng(seed)
+    # k-means++ seeding
+    centroids = [points[rng.integers(n)]]
+    for _ in range(1, k):
+        d2 = np.min(((points[:, None, :] - np.array(centroids)[None, :, :]) ** 2).sum(-1), axis=1)
+        total = d2.sum()
+        centroids.append(points[rng.choice(n, p=d2 / total)] if total > 0 else points[rng.integers(n)])
+    centroids = np.array(centroids)
+
+    labels = np.zeros(n, dtype=int)
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(-1)
+        # Capacity-constrained assignment: the most clear-cut points choose first
+        order = np.argsort(np.sort(distances, axis=1)[:, 0] - distances.mean(axis=1))
+        preferences = np.argsort(distances, axis=1)
+        counts = np.zeros(k, dtype=int)
+        new_labels = np.empty(n, dtype=int)
+        for index in order:
+            for cluster in preferences[index]:
+                if counts[cluster] < capacity:
+                    new_labels[index] = cluster
+                    counts[cluster] += 1
+                    break
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, new_labels, points)
+        counts = np.bincount(new_labels, minlength=k)
+        moved = counts > 0
+        centroids[moved] = sums[moved] / counts[moved, None]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
+
+
+def order_route(distances) -> List[int]:
+    """Visiting order for a closed tour starting and ending at node 0 (the hotel).
+
+    Nearest-neighbour construction followed by 2-opt improvement. Returns the
+    visited nodes without the hotel.
+    """
+    import numpy as np
+    n = len(distances)
+    if n <= 2:
+        return list(range(1, n))
+    route, remaining = [0], set(range(1, n))
+    while remaining:
+        last = route[-1]
+        nearest = min(remaining, key=lambda node: distances[last, node])
+        route.append(nearest)
+        remaining.remove(nearest)
+    route.append(0)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(route) - 2):
+            # Gain of reversing route[i..j] for every j at once
+            j = np.arange(i + 1, len(route) - 1)
+            a, b = route[i - 1], route[i]
+            c, d = np.array(route)[j], np.array(route)[j + 1]
+            delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                route[i:j[best] + 1] = reversed(route[i:j[best] + 1])
+                improved = True
+    return route[1:-1]
+
+
+def route_length(distances, order: List[int]) -> float:
+    stops = [0] + order + [0]
+    return float(sum(distances[a, b] for a, b in zip(stops, stops[1:])))
+
+
+def plan_days(hotel: Tuple[float, float], sights: List[Any], coordinates: List[Tuple[float, float]], days: int,
+              per_day: int = 4, max_distance_km: float = 60.0) -> List[Dict[str, Any]]:
+    """Group located sights into ``days`` routes around the hotel, each ordered as a short round trip.
+
+    ``sights`` are expected best-first; only the top ``days * per_day`` within
+    ``max_distance_km`` of the hotel are planned. Days are ordered nearest-first.
+    """
+    import numpy as np
+    hotel_point = np.array([hotel], dtype=float)
+    points = np.array(coordinates, dtype=float).reshape(-1, 2)
+    if not len(points):
+        return []
+    within = np.flatnonzero(haversine_matrix(points, hotel_point)[:, 0] <= max_distance_km)[:max(1, days) * per_day]
+    if not len(within):
+        return []
+    chosen = points[within]
+    labels = balanced_kmeans(_project(chosen, hotel_point[0]), days)
+
+    plans = []
+    for cluster in np.unique(labels):
+        members = within[labels == cluster]
+        distances = haversine_matrix(np.vstack([hotel_point, points[members]]))
+        order = order_route(distances)
+        plans.append({
+            "sights": [sights[members[node - 1]] for node in order],
+            "distance_km": round(route_length(distances, order), 1),
+            "_centroid_km": float(haversine_matrix(points[members].mean(axis=0, keepdims=True), hotel_point)[0, 0]),
+        })
+    plans.sort(key=lambda plan: plan.pop("_centroid_km"))
+    for day, plan in enumerate(plans, start=1):
+        plan["day"] = day
+    return plans
+
+
+def geo_planning_enabled() -> bool:
+    """GEO_DAY_PLANNING=true pre-plans day routes for the prompt instead of listing every attraction (default: off)."""
+    return os.getenv("GEO_DAY_PLANNING", "false").lower() in ("1", "true", "yes")
+
+
+def gazetteer_from_env() -> Gazetteer:
+    """Gazetteer from GEO_GAZETTEER_PATH (default: data/gazetteer.json) with learned places in the GEO_CACHE_* store."""
+    path = os.getenv("GEO_GAZETTEER_PATH", os.path.join("data", "gazetteer.json"))
+    return Gazetteer.from_file(path, cache_from_env("GEO_CACHE", namespace="geo", default_max_entries=20000))
+
+
+gazetteer = gazetteer_from_env()
+
+
+def _trip_days(check_in_date: str, check_out_date: str) -> int:
+    return (datetime.strptime(check_out_date, "%Y-%m-%d") - datetime.strptime(check_in_date, "%Y-%m-%d")).days
+
+
+def render_day_plan(hotel_name: str, plans: List[Dict[str, Any]]) -> str:
+    lines = [f"🗺️ **Day routes** (pre-planned by location; each day starts and ends at {hotel_name}, follow this order):"]
+    for plan in plans:
+        stops = " → ".join(f"{sight.name} (⭐ {sight.rating})" for sight in plan["sights"])
+        lines.append(f"- Day {plan['day']} (~{plan['distance_km']} km): {stops}")
+    return "\n".join(lines)
+
+
+def plan_sights_text(sights, hotels, check_in_date: str, check_out_date: str) -> Optional[str]:
+    """Prompt text with the attractions grouped into ordered day routes around the best located hotel.
+
+    Returns None when there is no located hotel or sight, so the caller can
+    fall back to the plain attraction listing.
+    """
+    if not sights or not hotels or isinstance(sights, dict) or isinstance(hotels, dict):
+        return None
+    with stage("geo_plan"):
+        hotel = hotel_point = None
+        for candidate in rank_hotels(list(hotels)):
+            hotel_point = gazetteer.coordinates(candidate)
+            if hotel_point is not None:
+                hotel = candidate
+                break
+        if hotel is None:
+            return None
+        located = [(sight, gazetteer.coordinates(sight)) for sight in rank_sights(list(sights))]
+        located = [(sight, point) for sight, point in located if point is not None]
+        if not located:
+            return None
+        plans = plan_days(
+            hotel_point,
+            [sight for sight, _ in located],
+            [point for _, point in located],
+            days=max(1, _trip_days(check_in_date, check_out_date)),
+            per_day=int(os.getenv("GEO_SIGHTS_PER_DAY", "4")),
+            max_distance_km=float(os.getenv("GEO_MAX_DISTANCE_KM", "60")),
+        )
+    if not plans:
+        return None
+    logger.info(f"Planned {sum(len(plan['sights']) for plan in plans)} of {len(sights)} attractions into {len(plans)} day routes")
+    return render_day_plan(hotel.name, plans)
+
+
+__all__ = ["Gazetteer", "haversine_matrix", "balanced_kmeans", "order_route", "plan_days",
+           "geo_planning_enabled", "plan_sights_text", "gazetteer"]
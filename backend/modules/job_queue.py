@@ -0,0 +1,389 @@
+import sys
+sys.path.append('')
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from utils.callback_urls import callback_target_allowed
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_PENDING, JOB_RUNNING)
+
+
+def job_dedup_key(payload: Dict[str, Any]) -> str:
+    """Stable hash of a job payload so identical pending requests share one job."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class MemoryJobStore:
+    """In-process job store. Jobs are lost on restart."""
+
+    backend_name = "memory"
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def create(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields) -> None:
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    def claim(self, job_id: str, now: float) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != JOB_PENDING:
+            return False
+        job.update(status=JOB_RUNNING, updated_at=now)
+        return True
+
+    def find_active(self, dedup_key: str) -> Optional[Dict[str, Any]]:
+        for job in self._jobs.values():
+            if job["dedup_key"] == dedup_key and job["status"] in ACTIVE_STATUSES:
+                return dict(job)
+        return None
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        jobs = [dict(job) for job in self._jobs.values() if job["status"] in ACTIVE_STATUSES]
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def purge_expired(self, now: float) -> int:
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["expires_at"] <= now and job["status"] not in ACTIVE_STATUSES]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    def count_by_status(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+
+class SQLiteJobStore:
+    """Job store persisted to SQLite so queued jobs survive restarts."""
+
+    backend_name = "sqlite"
+    _columns = ("id", "status", "dedup_key", "request", "result", "error",
+                "callback_urls", "created_at", "updated_at", "expires_at")
+    _json_columns = ("request", "result", "callback_urls")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                       id TEXT PRIMARY KEY,
+                       status TEXT NOT NULL,
+                       dedup_key TEXT NOT NULL,
+                       request TEXT NOT NULL,
+                       result TEXT,
+                       error TEXT,
+                       callback_urls TEXT NOT NULL,
+                       created_at REAL NOT NULL,
+                       updated_at REAL NOT NULL,
+                       expires_at REAL NOT NULL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key, status)")
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        job = dict(zip(self._columns, row))
+        for column in self._json_columns:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+    def _encode(self, column: str, value: Any) -> Any:
+        return json.dumps(value) if column in self._json_columns and value is not None else value
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT INTO jobs ({', '.join(self._columns)}) VALUES ({', '.join('?' * len(self._columns))})",
+                [self._encode(column, job.get(column)) for column in self._columns],
+            )
+            conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {', '.join(self._columns)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def update(self, job_id: str, **fields) -> None:
+        if not fields:
+            return
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        values = [self._encode(column, value) for column, value in fields.items()]
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", values + [job_id])
+            conn.commit()
+
+    def claim(self, job_id: str, now: float) -> bool:
+        """Atomically move a pending job to running; False if another worker got it first."""
+        with self._lock:
+            conn = self._connection()
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (JOB_RUNNING, now, job_id, JOB_PENDING),
+            ).rowcount
+            conn.commit()
+        return claimed == 1
+
+    def find_active(self, dedup_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {', '.join(self._columns)} FROM jobs WHERE dedup_key = ? AND status IN (?, ?) LIMIT 1",
+                (dedup_key, *ACTIVE_STATUSES),
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(self._columns)} FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                ACTIVE_STATUSES,
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def purge_expired(self, now: float) -> int:
+        with self._lock:
+            conn = self._connection()
+            deleted = conn.execute("DELETE FROM jobs WHERE expires_at <= ? AND status NOT IN (?, ?)",
+                                   (now, *ACTIVE_STATUSES)).rowcount
+            conn.commit()
+        return deleted
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+class JobQueue:
+    """Background worker pool that runs submitted jobs and records their results.
+
+    ``handler`` receives the stored request payload and returns a JSON-serializable
+    result. Identical payloads submitted while a job is still pending or running
+    are attached to that job instead of creating a new one.
+
+    Several processes may share one sqlite store: each job is claimed atomically
+    before it runs, so a job queued in more than one process still runs once.
+    Set ``recover_running=False`` when siblings may be running jobs at start-up.
+    """
+
+    def __init__(self, store, handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 workers: int = 4, ttl: float = 3600.0, max_pending: int = 1000,
+                 callback_timeout: float = 10.0, recover_running: bool = True):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.callback_timeout = callback_timeout
+        self.recover_running = recover_running
+        self.deduplicated = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        if self.recover_running:
+            self.recover()
+        # Pick up work left behind by a previous process (sqlite store only)
+        for job in self.store.list_active():
+            if job["status"] == JOB_PENDING:
+                self._queue.put_nowait(job["id"])
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+        logger.info(f"Job queue started with {self.workers} workers ({self.store.backend_name} store)")
+
+    def recover(self) -> int:
+        """Return jobs a dead process left running to pending; returns how many."""
+        running = [job for job in self.store.list_active() if job["status"] == JOB_RUNNING]
+        for job in running:
+            self.store.update(job["id"], status=JOB_PENDING, updated_at=time.time())
+        return len(running)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, payload: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a job for ``payload`` or return the identical job that is already pending."""
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Job queue is not running")
+
+        dedup_key = job_dedup_key(payload)
+        existing = self.store.find_active(dedup_key)
+        if existing is not None:
+            self.deduplicated += 1
+            if callback_url and callback_url not in existing["callback_urls"]:
+                existing["callback_urls"].append(callback_url)
+                self.store.update(existing["id"], callback_urls=existing["callback_urls"])
+            existing["deduplicated"] = True
+            return existing
+
+        if self._queue.qsize() >= self.max_pending:
+            raise HTTPException(status_code=503, detail="Too many pending jobs", headers={"Retry-After": "5"})
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": JOB_PENDING,
+            "dedup_key": dedup_key,
+            "request": payload,
+            "result": None,
+            "error": None,
+            "callback_urls": [callback_url] if callback_url else [],
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + self.ttl,
+        }
+        self.store.create(job)
+        self._queue.put_nowait(job["id"])
+        job["deduplicated"] = False
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        # Only finished jobs expire; a job still waiting for a worker is never reported missing
+        if job is None or (job["status"] not in ACTIVE_STATUSES and job["expires_at"] <= time.time()):
+            return None
+        return job
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception(f"Job worker {index} failed on job {job_id}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        if not self.store.claim(job_id, time.time()):
+            return
+        job = self.store.get(job_id)
+        try:
+            result = await self.handler(job["request"])
+            fields = {"status": JOB_SUCCEEDED, "result": result}
+        except HTTPException as he:
+            fields = {"status": JOB_FAILED, "error": str(he.detail)}
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            fields = {"status": JOB_FAILED, "error": str(e)}
+
+        now = time.time()
+        self.store.update(job_id, updated_at=now, expires_at=now + self.ttl, **fields)
+        job = self.store.get(job_id)
+        if job is not None and job["callback_urls"]:
+            await self._notify(job)
+
+    async def _notify(self, job: Dict[str, Any]) -> None:
+        """POST the finished job to every registered callback URL (best effort)."""
+        import aiohttp  # only needed once a job has a callback
+
+        body = {key: job[key] for key in ("id", "status", "result", "error")}
+        timeout = aiohttp.ClientTimeout(total=self.callback_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            for url in job["callback_urls"]:
+                if not await callback_target_allowed(url):
+                    logger.warning(f"Skipping callback {url} for job {job['id']}: not a public address")
+                    continue
+                try:
+                    # No redirects: they could lead to an address that was never checked
+                    async with session.post(url, json=body, allow_redirects=False) as response:
+                        if response.status >= 400:
+                            logger.warning(f"Callback {url} for job {job['id']} returned {response.status}")
+                except Exception as e:
+                    logger.warning(f"Callback {url} for job {job['id']} failed: {str(e)}")
+
+    async def _janitor(self, interval: float = 60.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            purged = self.store.purge_expired(time.time())
+            if purged:
+                logger.info(f"Purged {purged} expired jobs")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.store.backend_name,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "deduplicated": self.deduplicated,
+            "jobs": self.store.count_by_status(),
+        }
+
+
+def job_queue_from_env(handler: Callable[[Dict[str, Any]], Awaitable[Any]]) -> JobQueue:
+    """Build the job queue configured by environment variables.
+
+    Honors:
+    - JOB_STORE_BACKEND: 'memory' (default) or 'sqlite'
+    - JOB_STORE_PATH: SQLite file for the sqlite store (default: .cache/jobs.sqlite3)
+    - JOB_WORKERS: number of background workers (default: 4)
+    - JOB_TTL: seconds a job and its result are kept (default: 3600)
+    - JOB_MAX_PENDING: queued jobs accepted before returning 503 (default: 1000)
+    - JOB_RECOVER_RUNNING: re-run jobs left 'running' at start-up (default: true; the
+      multi-worker launcher recovers once before forking and turns this off)
+    """
+    backend = os.getenv("JOB_STORE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        store = SQLiteJobStore(os.getenv("JOB_STORE_PATH", os.path.join(".cache", "jobs.sqlite3")))
+    elif backend == "memory":
+        store = MemoryJobStore()
+    else:
+        raise ValueError(f"Unknown JOB_STORE_BACKEND: {backend!r}")
+    return JobQueue(
+        store,
+        handler,
+        workers=int(os.getenv("JOB_WORKERS", "4")),
+        ttl=float(os.getenv("JOB_TTL", "3600")),
+        max_pending=int(os.getenv("JOB_MAX_PENDING", "1000")),
+        recover_running=os.getenv("JOB_RECOVER_RUNNING", "true").lower() in ("1", "true", "yes"),
+    )
+
+
+__all__ = ["JobQueue", "MemoryJobStore", "SQLiteJobStore", "job_queue_from_env",
+           "JOB_PENDING", "JOB_RUNNING", "JOB_SUCCEEDED", "JOB_FAILED"]
@@ -0,0 +1,327 @@
+import sys
+sys.path.append('')
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from utils.cache import cache_from_env
+from utils.logger import get_logger
+from utils.metrics import stage
+from utils.singleflight import SingleFlight
+
+logger = get_logger(__name__)
+
+# Page settings (A4, points)
+PAGE_WIDTH = 595.27
+PAGE_HEIGHT = 841.89
+LEFT_MARGIN = 50
+RIGHT_MARGIN = 50
+TOP_MARGIN = 50
+BOTTOM_MARGIN = 50
+LINE_HEIGHT = 14
+MAX_WIDTH = PAGE_WIDTH - LEFT_MARGIN - RIGHT_MARGIN
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Emoji and other non-ASCII characters are not in the base-14 fonts; whitespace is kept.
+_UNSUPPORTED_CHARS = re.compile(r"[^\x00-\x7F\s]")
+
+pdf_cache = cache_from_env("PDF_CACHE", namespace="pdf", default_max_entries=64)
+pdf_singleflight = SingleFlight()
+
+
+@lru_cache(maxsize=65536)
+def word_units(word: str, font: str) -> int:
+    """Width of one word in glyph units (1/1000 of the font size), memoized across lines and documents."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth  # ReportLab is imported on first render
+    return round(stringWidth(word, font, 1000))
+
+
+def line_style(line: str) -> Tuple[str, float, str]:
+    """Font, size and printable text for one markdown-ish line."""
+    clean_line = line.strip()
+    if clean_line.startswith('###'):
+        font, size, clean_line = "Helvetica-Bold", 11, clean_line.replace('###', '').strip()
+    elif clean_line.startswith('##'):
+        font, size, clean_line = "Helvetica-Bold", 13, clean_line.replace('##', '').strip()
+    elif clean_line.startswith('#'):
+        font, size, clean_line = "Helvetica-Bold", 16, clean_line.replace('#', '').strip()
+    elif '**' in clean_line:
+        font, size, clean_line = "Helvetica-Bold", 10, clean_line.replace('**', '')
+    else:
+        font, size = "Helvetica", 10
+    return font, size, _UNSUPPORTED_CHARS.sub('', clean_line)
+
+
+def wrap_words(text: str, font: str, size: float, max_width: float = MAX_WIDTH) -> List[str]:
+    """Greedy word wrap in linear time.
+
+    Keeps a running width instead of re-measuring the growing line for every
+    word. The width is summed in integer glyph units and scaled the way
+    ReportLab's ``stringWidth`` does, so even lines of exactly ``max_width``
+    break where re-measuring would.
+    """
+    space = word_units(' ', font)
+    lines = []
+    current: List[str] = []
+    current_units = 0  # includes one trailing space per word, like the original test_line
+    for word in text.split(' '):
+        candidate = current_units + word_units(word, font) + space
+        if candidate * 0.001 * size < max_width:  # same expression, same rounding as stringWidth
+            current.append(word)
+            current_units = candidate
+        else:
+            if current:
+                lines.append(' '.join(current).strip())
+            current = [word]
+            current_units = word_units(word, font) + space
+    if current and ' '.join(current).strip():
+        lines.append(' '.join(current).strip())
+    return lines
+
+
+def render_pdf_bytes(text: str, invariant: bool = False) -> bytes:
+    """Render itinerary text to PDF bytes (CPU-bound; call off the event loop)."""
+    from reportlab.pdfgen import canvas  # ReportLab is imported on first render
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, invariant=invariant)
+    y_position = PAGE_HEIGHT - TOP_MARGIN
+
+    for line in text.split('\n'):
+        if y_position < BOTTOM_MARGIN:
+            c.showPage()
+            y_position = PAGE_HEIGHT - TOP_MARGIN
+
+        font, size, clean_line = line_style(line)
+        c.setFont(font, size)
+
+        if not clean_line:
+            # Empty line - just add spacing
+            y_position -= LINE_HEIGHT / 2
+            continue
+
+        wrapped = wrap_words(clean_line, font, size)
+        for index, segment in enumerate(wrapped):
+            c.drawString(LEFT_MARGIN, y_position, segment)
+            y_position -= LINE_HEIGHT
+            if index < len(wrapped) - 1 and y_position < BOTTOM_MARGIN:
+                c.showPage()
+                c.setFont(font, size)
+                y_position = PAGE_HEIGHT - TOP_MARGIN
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def render_pdf_to_file(text: str, tmp_dir: str) -> str:
+    """Process-pool entry point: render to a temp file and return its path.
+
+    Only the path travels back to the parent, not the pickled document bytes.
+    """
+    fd, path = tempfile.mkstemp(prefix="itinerary-", suffix=".pdf", dir=tmp_dir)
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(render_pdf_bytes(text))
+    return path
+
+
+def _noop() -> None:
+    return None
+
+
+def _default_tmp_dir() -> str:
+    # Prefer a memory-backed filesystem when the OS provides one.
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else tempfile.gettempdir()
+
+
+class PDFRenderPool:
+    """Runs PDF renders off the event loop with bounded admission.
+
+    The 'thread' backend shares the process (and the GIL); the 'process' backend
+    spreads renders over worker processes so they scale with cores. Once
+    ``workers + max_queue`` renders are outstanding new ones get a 503 with
+    Retry-After, and a render that exceeds ``timeout`` seconds returns 504.
+    """
+
+    def __init__(self, backend: str = "thread", workers: int = 2, max_queue: int = 8,
+                 timeout: float = 30.0, tmp_dir: Optional[str] = None, start_method: Optional[str] = None):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown PDF render backend: {backend!r}")
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.tmp_dir = tmp_dir or _default_tmp_dir()
+        self.start_method = start_method
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._warmup = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.backend == "process":
+                method = self.start_method or ("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+                context = multiprocessing.get_context(method)
+                if method == "forkserver":
+                    # Import the main module once in the fork server rather than once per worker
+                    context.set_forkserver_preload(["__main__", "modules.pdf_renderer"])
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pdf-render")
+        return self._executor
+
+    async def start(self) -> None:
+        """Create the executor and bring worker processes up in the background."""
+        executor = self._get_executor()
+        if self.backend == "process":
+            loop = asyncio.get_running_loop()
+            self._warmup = asyncio.gather(*(loop.run_in_executor(executor, _noop) for _ in range(self.workers)))
+            self._warmup.add_done_callback(self._warmed_up)
+
+    async def ready(self) -> None:
+        """Wait until the background warm-up started by ``start()`` has finished."""
+        if self._warmup is not None:
+            await self._warmup
+
+    def _warmed_up(self, future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            logger.warning("PDF process pool warm-up failed")
+        else:
+            logger.info(f"PDF process pool ready with {self.workers} workers")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _finished(self, future, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        if job["abandoned"] and self.backend == "process" and not future.cancelled() and future.exception() is None:
+            _unlink_quietly(future.result())
+
+    async def render(self, text: str) -> bytes:
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="PDF renderer is busy, please retry shortly",
+                                    headers={"Retry-After": "2"})
+            self.pending += 1
+
+        executor = self._get_executor()
+        job = {"abandoned": False}
+        try:
+            if self.backend == "process":
+                future = executor.submit(render_pdf_to_file, text, self.tmp_dir)
+            else:
+                future = executor.submit(render_pdf_bytes, text)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(lambda done, job=job: self._finished(done, job))
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            job["abandoned"] = True
+            self.timed_out += 1
+            raise HTTPException(status_code=504, detail="PDF rendering timed out")
+
+        if self.backend == "process":
+            try:
+                with open(result, "rb") as handle:
+                    return handle.read()
+            finally:
+                _unlink_quietly(result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def pdf_pool_from_env() -> PDFRenderPool:
+    """Build the render pool configured by environment variables.
+
+    Honors:
+    - PDF_RENDER_BACKEND: 'thread' (default) or 'process'
+    - PDF_RENDER_WORKERS: worker threads/processes (default: 2)
+    - PDF_RENDER_QUEUE: renders allowed to wait for a worker before 503s (default: 8)
+    - PDF_RENDER_TIMEOUT: seconds per render before a 504 (default: 30)
+    - PDF_RENDER_TMPDIR: where process workers write results (default: /dev/shm if available)
+    """
+    return PDFRenderPool(
+        backend=os.getenv("PDF_RENDER_BACKEND", "thread").lower(),
+        workers=int(os.getenv("PDF_RENDER_WORKERS", "2")),
+        max_queue=int(os.getenv("PDF_RENDER_QUEUE", "8")),
+        timeout=float(os.getenv("PDF_RENDER_TIMEOUT", "30")),
+        tmp_dir=os.getenv("PDF_RENDER_TMPDIR") or None,
+    )
+
+
+pdf_render_pool = pdf_pool_from_env()
+
+
+def pdf_cache_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pdf_ttl() -> float:
+    """TTL in seconds for rendered PDFs (PDF_CACHE_TTL, default: 24 hours)."""
+    return float(os.getenv("PDF_CACHE_TTL", str(24 * 60 * 60)))
+
+
+async def _render_and_cache(text: str, key: str) -> bytes:
+    pdf = await pdf_render_pool.render(text)
+    pdf_cache.set(key, pdf, pdf_ttl())
+    return pdf
+
+
+async def render_pdf(text: str) -> bytes:
+    """Render ``text`` in the PDF worker pool, reusing cached output for identical itineraries."""
+    with stage("pdf_render"):
+        key = pdf_cache_key(text)
+        cached = pdf_cache.get(key)
+        if cached is not None:
+            return cached
+        return await pdf_singleflight.do(key, lambda: _render_and_cache(text, key))
+
+
+def iter_chunks(data: bytes, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield ``data`` in slices for StreamingResponse."""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
+
+
+__all__ = ["render_pdf", "render_pdf_bytes", "iter_chunks", "wrap_words", "pdf_cache",
+           "PDFRenderPool", "pdf_render_pool"]
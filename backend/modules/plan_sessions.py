@@ -0,0 +1,149 @@
+import sys
+sys.path.append('')
+import os
+import re
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from models.records import HotelRecord, SightRecord
+from utils.cache import cache_from_env
+
+# A plan session remembers the last request of a plan, the search texts it was
+# planned from and the itinerary, so a refined request only redoes what changed.
+plan_session_store = cache_from_env("PLAN_SESSION", namespace="plan_sessions", default_max_entries=1024)
+
+TEXT_KEYS = ("flight_text", "hotel_text", "sights_text")
+# Parsed results kept so a partial refinement can re-plan day routes against the side that did not change
+RESULT_RECORDS = {"hotels": HotelRecord, "attractions": SightRecord}
+
+# Sections start at "# " / "## " headings; "###" sub-headings stay inside their section.
+_HEADING = re.compile(r"^#{1,2}\s+\S", re.MULTILINE)
+_DAY_HEADING = re.compile(r"\bday\s*\d+", re.IGNORECASE)
+# Names in the compact ("- H1: Name | ...", "- A2: Name (City) | ...") and full ("**Name:** Name") listings
+_ENTITY_NAMES = (
+    re.compile(r"^- [HA]\d+: (.+?)(?: \(| \|)", re.MULTILINE),
+    re.compile(r"\*\*Name:\*\*\s*(.+)$", re.MULTILINE),
+)
+
+
+def plan_session_ttl() -> float:
+    """Seconds a plan can still be refined (PLAN_SESSION_TTL, default: 24 hours)."""
+    return float(os.getenv("PLAN_SESSION_TTL", str(24 * 60 * 60)))
+
+
+def new_plan_id() -> str:
+    return uuid.uuid4().hex
+
+
+def load_session(plan_id: str) -> Optional[Dict[str, Any]]:
+    return plan_session_store.get(plan_id)
+
+
+def save_session(plan_id: str, request: Dict[str, Any], texts: Dict[str, str], itinerary: str,
+                 results: Optional[Dict[str, Any]] = None) -> None:
+    session = {"request": request, "texts": {key: texts[key] for key in TEXT_KEYS}, "itinerary": itinerary,
+               "results": dump_results(results or {})}
+    plan_session_store.set(plan_id, session, plan_session_ttl())
+
+
+def dump_results(results: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Hotel and attraction results as plain dicts, for any session store backend."""
+    return {data_type: [item.model_dump() for item in items] for data_type, items in results.items()
+            if data_type in RESULT_RECORDS and isinstance(items, list) and all(hasattr(item, "model_dump") for item in items)}
+
+
+def restore_results(session: Dict[str, Any]) -> Dict[str, list]:
+    """The hotel and attraction results stored with a session, as records."""
+    return {data_type: [RESULT_RECORDS[data_type](**item) for item in items]
+            for data_type, items in (session.get("results") or {}).items() if data_type in RESULT_RECORDS}
+
+
+def changed_services(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Request fields (flight_request, hotel_request, sights_request) whose values differ."""
+    return [field for field in ("flight_request", "hotel_request", "sights_request")
+            if previous.get(field) != current.get(field)]
+
+
+def dates_changed(previous: Dict[str, Any], current: Dict[str, Any]) -> bool:
+    """A different stay changes the number and dates of the days, so the whole plan is redone."""
+    old, new = previous.get("hotel_request", {}), current.get("hotel_request", {})
+    return (old.get("check_in_date"), old.get("check_out_date")) != (new.get("check_in_date"), new.get("check_out_date"))
+
+
+def split_sections(itinerary: str) -> List[str]:
+    """Split markdown into sections starting at each top- or day-level heading (text before the first is kept)."""
+    starts = [match.start() for match in _HEADING.finditer(itinerary)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [itinerary[start:end].strip("\n") for start, end in zip(starts, starts[1:] + [len(itinerary)])]
+    return [section for section in sections if section.strip()]
+
+
+def section_heading(section: str) -> str:
+    first_line = section.split("\n", 1)[0].strip()
+    return first_line if _HEADING.match(first_line) else ""
+
+
+def day_indexes(sections: List[str]) -> List[int]:
+    return [i for i, section in enumerate(sections) if _DAY_HEADING.search(section_heading(section))]
+
+
+def entity_names(text: str) -> Set[str]:
+    """Hotel and attraction names listed in a rendered search section."""
+    names = set()
+    for pattern in _ENTITY_NAMES:
+        names.update(match.strip().lower() for match in pattern.findall(text or ""))
+    return {name for name in names if len(name) > 3}
+
+
+def _mentioning(sections: List[str], names: Iterable[str]) -> Set[int]:
+    names = list(names)
+    return {i for i, section in enumerate(sections) if any(name in section.lower() for name in names)}
+
+
+def sections_to_regenerate(sections: List[str], old_texts: Dict[str, str], new_texts: Dict[str, str]) -> Optional[List[int]]:
+    """Indexes of the sections affected by changed search texts, or None to regenerate everything.
+
+    - flights: the intro and the arrival and departure days
+    - hotels: the intro, check-in and check-out days, and days naming a hotel no longer offered
+    - sights: days naming an attraction no longer offered, or every day if none does
+    """
+    days = day_indexes(sections)
+    if not days:
+        return None
+    # A headingless preamble cannot be matched in a revision, so only headed intro sections are rewritten
+    intro = {i for i in range(days[0]) if section_heading(sections[i])}
+    ends = {days[0], days[-1]}
+    targets: Set[int] = set()
+    if old_texts["flight_text"] != new_texts["flight_text"]:
+        targets |= intro | ends
+    if old_texts["hotel_text"] != new_texts["hotel_text"]:
+        removed = entity_names(old_texts["hotel_text"]) - entity_names(new_texts["hotel_text"])
+        targets |= intro | ends | _mentioning(sections, removed)
+    if old_texts["sights_text"] != new_texts["sights_text"]:
+        removed = entity_names(old_texts["sights_text"]) - entity_names(new_texts["sights_text"])
+        targets |= (_mentioning(sections, removed) & set(days)) or set(days)
+    if len(targets) >= len(sections):
+        return None
+    return sorted(targets)
+
+
+def splice_sections(sections: List[str], revised: str, indexes: List[int]) -> Optional[str]:
+    """Replace ``sections[indexes]`` with the same-headed sections of ``revised``.
+
+    Returns None when the revision does not contain every requested heading.
+    """
+    by_heading = {}
+    for section in split_sections(revised):
+        by_heading.setdefault(" ".join(section_heading(section).split()).lower(), section)
+    result = list(sections)
+    for index in indexes:
+        replacement = by_heading.get(" ".join(section_heading(sections[index]).split()).lower())
+        if not replacement:
+            return None
+        result[index] = replacement
+    return "\n\n".join(result)
+
+
+__all__ = ["plan_session_store", "new_plan_id", "load_session", "save_session", "dump_results", "restore_results", "changed_services",
+           "dates_changed", "split_sections", "section_heading", "sections_to_regenerate", "splice_sections"]
@@ -0,0 +1,290 @@
+import sys
+sys.path.append('')
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.cache import BaseCache, cache_from_env
+from utils.logger import get_logger
+from utils.workers import serving_workers, worker_index
+
+logger = get_logger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+class SearchPrefetcher:
+    """Keeps the most requested searches in the cache by refreshing them before they expire.
+
+    Every search lookup is recorded with an exponentially decayed hit count, so
+    yesterday's popular routes fade out. Each cycle the hottest keys whose cache
+    entry is missing or within ``refresh_ahead`` of its TTL are fetched again,
+    spending at most ``budget_per_hour`` upstream calls per hour.
+
+    Counts are kept per process. With several workers each one publishes its
+    hottest counts to the ``shared`` store every ``interval`` seconds, and the
+    worker that refreshes ranks on the sum of all of them.
+    """
+
+    def __init__(
+        self,
+        cache: BaseCache,
+        fetch: Callable[[Dict[str, Any]], Awaitable[Any]],
+        key_for: Callable[[Dict[str, Any]], str],
+        ttl_for: Callable[[str], float],
+        budget_per_hour: int = 120,
+        interval: float = 60.0,
+        top_keys: int = 200,
+        min_score: float = 2.0,
+        refresh_ahead: float = 0.2,
+        half_life: float = 6 * 60 * 60,
+        concurrency: int = 2,
+        max_tracked: int = 5000,
+        shared: Optional[BaseCache] = None,
+        worker: Optional[int] = None,
+        workers: Optional[int] = None,
+    ):
+        self.cache = cache
+        self.fetch = fetch
+        self.key_for = key_for
+        self.ttl_for = ttl_for
+        self.budget_per_hour = max(0, budget_per_hour)
+        self.interval = interval
+        self.top_keys = top_keys
+        self.min_score = min_score
+        self.refresh_ahead = refresh_ahead
+        self.half_life = half_life
+        self.concurrency = max(1, concurrency)
+        self.max_tracked = max(1, max_tracked)
+        self.shared = shared
+        # Read from the environment when not given: serve.py sets them after the fork
+        self._worker = worker
+        self._workers = workers
+        # key -> [decayed score, time of last update, search params]
+        self._tracked: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._spent: "deque[float]" = deque()
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.failed = 0
+
+    def _decayed(self, entry: List[Any], now: float) -> float:
+        return entry[0] * 0.5 ** ((now - entry[1]) / self.half_life)
+
+    def record(self, params: Dict[str, Any], weight: float = 1.0, key: Optional[str] = None) -> None:
+        """Count one request for the search described by ``params``."""
+        key = key or self.key_for(params)
+        now = time.time()
+        with self._lock:
+            entry = self._tracked.get(key)
+            if entry is None:
+                if len(self._tracked) >= self.max_tracked:
+                    coldest = min(self._tracked, key=lambda k: self._decayed(self._tracked[k], now))
+                    del self._tracked[coldest]
+                self._tracked[key] = [weight, now, {k: v for k, v in params.items() if k != "api_key"}]
+            else:
+                entry[0] = self._decayed(entry, now) + weight
+                entry[1] = now
+
+    @property
+    def worker(self) -> int:
+        return worker_index() if self._worker is None else self._worker
+
+    @property
+    def workers(self) -> int:
+        return serving_workers() if self._workers is None else self._workers
+
+    def _local_counts(self, now: float) -> Dict[str, List[Any]]:
+        with self._lock:
+            return {key: [self._decayed(entry, now), entry[2]] for key, entry in self._tracked.items()}
+
+    def publish(self) -> int:
+        """Write this worker's hottest counts to the shared store; returns how many were published."""
+        if self.shared is None or self.workers < 1:
+            return 0
+        now = time.time()
+        ranked = sorted(self._local_counts(now).items(), key=lambda item: item[1][0], reverse=True)[:self.top_keys]
+        entries = [[key, score, params] for key, (score, params) in ranked]
+        self.shared.set(f"worker:{self.worker}", {"at": now, "entries": entries}, max(3 * self.interval, 300))
+        return len(entries)
+
+    def _counts(self, now: float) -> Dict[str, List[Any]]:
+        """This worker's counts plus those the other workers published."""
+        counts = self._local_counts(now)
+        if self.shared is None:
+            return counts
+        for other in range(self.workers):
+            published = self.shared.get(f"worker:{other}") if other != self.worker else None
+            if published is None:
+                continue
+            decay = 0.5 ** ((now - published["at"]) / self.half_life)
+            for key, score, params in published["entries"]:
+                entry = counts.setdefault(key, [0.0, params])
+                entry[0] += score * decay
+        return counts
+
+    def hottest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Searches by decayed request count across all workers, most popular first."""
+        ranked = sorted(((score, key, params) for key, (score, params) in self._counts(time.time()).items()), reverse=True)
+        return [{"key": key, "score": round(score, 3), "params": params} for score, key, params in ranked[:limit]]
+
+    def _budget_left(self, now: float) -> int:
+        while self._spent and self._spent[0] <= now - 3600:
+            self._spent.popleft()
+        return self.budget_per_hour - len(self._spent)
+
+    def due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Hot searches whose cache entry is missing or about to expire, most popular first."""
+        now = now or time.time()
+        due = []
+        for item in self.hottest(self.top_keys):
+            if item["score"] < self.min_score:
+                break
+            ttl = self.ttl_for(item["params"].get("engine", ""))
+            if ttl <= 0:
+                continue
+            expires_at = self.cache.expiry(item["key"])
+            if expires_at is None or expires_at - now <= ttl * self.refresh_ahead:
+                due.append(item)
+        return due
+
+    async def run_once(self) -> int:
+        """Refresh due searches within the remaining hourly budget; returns how many were refreshed."""
+        now = time.time()
+        items = self.due(now)[:max(0, self._budget_left(now))]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(item):
+            async with semaphore:
+                self._spent.append(time.time())
+                try:
+                    await self.fetch(item["params"])
+                    return True
+                except Exception as e:
+                    logger.warning(f"Prefetch of {item['key']} failed: {e}")
+                    return False
+
+        results = await asyncio.gather(*(refresh(item) for item in items))
+        self.cycles += 1
+        self.refreshed += sum(results)
+        self.failed += len(results) - sum(results)
+        if items:
+            logger.info(f"Prefetched {sum(results)} of {len(items)} due searches")
+        return sum(results)
+
+    async def _loop(self, refresh: bool) -> None:
+        while True:
+            try:
+                if self.workers > 1:
+                    self.publish()
+                if refresh:
+                    await self.run_once()
+            except Exception:
+                logger.exception("Prefetch cycle failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self, refresh: bool = True) -> None:
+        """Run the background loop; with ``refresh=False`` it only publishes this worker's counts."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loop(refresh))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def export_snapshot(self, path: str) -> int:
+        """Write the hottest searches, with their cached results, to a JSON file; returns the entry count."""
+        entries = []
+        for item in self.hottest(self.top_keys):
+            value = self.cache.get_stale(item["key"])
+            entries.append(dict(item, value=value, expires_at=self.cache.expiry(item["key"]) if value is not None else None))
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"  # workers may export at the same time
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"version": SNAPSHOT_VERSION, "created_at": time.time(), "entries": entries}, handle)
+        os.replace(tmp_path, path)
+        return len(entries)
+
+    def import_snapshot(self, path: str, counts: bool = True) -> int:
+        """Seed request counts and still-fresh cache entries from a snapshot; returns the entry count.
+
+        Entries only need ``params``, so a hand-written list of searches to keep warm works too.
+        With ``counts=False`` only the cache is seeded, so that several workers
+        loading the same snapshot do not count its requests several times.
+        """
+        with open(path, "r", encoding="utf-8") as handle:
+            snapshot = json.load(handle)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported prefetch snapshot version: {snapshot.get('version')!r}")
+        now = time.time()
+        for entry in snapshot["entries"]:
+            key = entry.get("key") or self.key_for(entry["params"])
+            if counts:
+                self.record(entry["params"], weight=entry.get("score", self.min_score), key=key)
+            if entry.get("value") is not None and (entry.get("expires_at") or 0) > now:
+                self.cache.set(key, entry["value"], entry["expires_at"] - now)
+        return len(snapshot["entries"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "tracked": len(self._tracked),
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "budget_left": self._budget_left(time.time()),
+        }
+
+
+def prefetch_enabled() -> bool:
+    """PREFETCH_ENABLED=true runs the background refresh loop (default: off, it spends SerpAPI quota)."""
+    return os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def prefetch_snapshot_path() -> Optional[str]:
+    """PREFETCH_SNAPSHOT_PATH: snapshot loaded on start-up and written on shutdown (default: none)."""
+    return os.getenv("PREFETCH_SNAPSHOT_PATH") or None
+
+
+def prefetcher_from_env(cache: BaseCache, fetch, key_for, ttl_for) -> SearchPrefetcher:
+    """Build a prefetcher configured by ``PREFETCH_*`` environment variables.
+
+    Honors:
+    - PREFETCH_BUDGET_PER_HOUR: upstream calls the prefetcher may spend per hour (default: 120)
+    - PREFETCH_INTERVAL: seconds between refresh cycles (default: 60)
+    - PREFETCH_TOP_KEYS / PREFETCH_MIN_SCORE: how many of the hottest searches are considered, and the
+      decayed request count a search needs to be kept warm (default: 200 / 2)
+    - PREFETCH_REFRESH_AHEAD: refresh once less than this fraction of the TTL is left (default: 0.2)
+    - PREFETCH_HALF_LIFE: seconds after which a request counts half (default: 21600)
+    - PREFETCH_CONCURRENCY: refreshes in flight at once (default: 2)
+    - PREFETCH_DEMAND_BACKEND / PREFETCH_DEMAND_PATH: store where each worker publishes its request counts
+      (default: memory; serve.py uses sqlite so the refreshing worker sees every worker's traffic)
+    """
+    return SearchPrefetcher(
+        cache,
+        fetch,
+        key_for,
+        ttl_for,
+        budget_per_hour=int(os.getenv("PREFETCH_BUDGET_PER_HOUR", "120")),
+        interval=float(os.getenv("PREFETCH_INTERVAL", "60")),
+        top_keys=int(os.getenv("PREFETCH_TOP_KEYS", "200")),
+        min_score=float(os.getenv("PREFETCH_MIN_SCORE", "2")),
+        refresh_ahead=float(os.getenv("PREFETCH_REFRESH_AHEAD", "0.2")),
+        half_life=float(os.getenv("PREFETCH_HALF_LIFE", str(6 * 60 * 60))),
+        concurrency=int(os.getenv("PREFETCH_CONCURRENCY", "2")),
+        shared=cache_from_env("PREFETCH_DEMAND", namespace="prefetch-demand", default_max_entries=256),
+    )
+
+
+__all__ = ["SearchPrefetcher", "prefetch_enabled", "prefetch_snapshot_path", "prefetcher_from_env"]
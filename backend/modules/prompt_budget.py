@@ -0,0 +1,143 @@
+import sys
+sys.path.append('')
+import math
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+from models.api_models import FlightResponse, HotelResponse, SightsResponse
+from modules.helper import format_api_data
+from utils.metrics import stage
+
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+# Share of the prompt token budget given to each section.
+BUDGET_SHARES = {"flights": 0.25, "hotels": 0.30, "attractions": 0.45}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return math.ceil(len(text) / 4)
+
+
+def parse_price(value) -> Optional[float]:
+    """Extract a numeric price from values like '420', '$1,234' or '$$120'."""
+    match = _NUMBER.search(str(value or ""))
+    if not match:
+        return None
+    price = float(match.group().replace(",", ""))
+    return price if price > 0 else None
+
+
+def _normalized(values: Sequence[Optional[float]], missing: float = 1.0) -> List[float]:
+    """Scale values into [0, 1]; missing values get ``missing``."""
+    known = [value for value in values if value is not None]
+    if not known:
+        return [missing] * len(values)
+    low, high = min(known), max(known)
+    span = (high - low) or 1.0
+    return [missing if value is None else (value - low) / span for value in values]
+
+
+def rank_flights(flights: List[FlightResponse]) -> List[FlightResponse]:
+    """Cheapest, shortest and most direct flights first."""
+    prices = _normalized([parse_price(flight.price) for flight in flights])
+    durations = _normalized([flight.duration or None for flight in flights])
+    stops = _normalized([float(flight.stops) for flight in flights])
+    scores = [0.5 * p + 0.3 * d + 0.2 * s for p, d, s in zip(prices, durations, stops)]
+    return [flight for _, _, flight in sorted(zip(scores, range(len(flights)), flights))]
+
+
+def rank_hotels(hotels: List[HotelResponse]) -> List[HotelResponse]:
+    """Best rated, highest class and cheapest hotels first."""
+    ratings = _normalized([hotel.rating or None for hotel in hotels], missing=0.0)
+    classes = _normalized([float(hotel.hotel_class) if hotel.hotel_class else None for hotel in hotels], missing=0.0)
+    costs = _normalized([parse_price(hotel.cost_per_night) for hotel in hotels])
+    scores = [0.5 * r + 0.2 * c - 0.3 * p for r, c, p in zip(ratings, classes, costs)]
+    return [hotel for _, _, hotel in sorted(zip((-score for score in scores), range(len(hotels)), hotels))]
+
+
+def rank_sights(sights: List[SightsResponse]) -> List[SightsResponse]:
+    """Best rated attractions first; ties keep TripAdvisor's popularity order."""
+    return [sight for _, _, sight in sorted(zip((-(sight.rating or 0.0) for sight in sights), range(len(sights)), sights))]
+
+
+def _truncate(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _compact_flight(i: int, flight: FlightResponse) -> str:
+    hours, minutes = divmod(int(flight.duration or 0), 60)
+    stops = "nonstop" if flight.stops == 0 else f"{flight.stops} stop{'s' if flight.stops > 1 else ''}"
+    return (f"- F{i}: ${flight.price} | {hours}h{minutes:02d}m | {stops} | "
+            f"dep {flight.departure_time} → arr {flight.arrival_time} | {flight.destination_airport}")
+
+
+def _compact_hotel(i: int, hotel: HotelResponse) -> str:
+    stars = f"{hotel.hotel_class}★ | " if hotel.hotel_class else ""
+    return (f"- H{i}: {hotel.name} | {stars}⭐ {hotel.rating} | {hotel.cost_per_night}/night | "
+            f"{_truncate(hotel.description, 60)}")
+
+
+def _compact_sight(i: int, sight: SightsResponse) -> str:
+    return f"- A{i}: {sight.name} ({sight.location}) | ⭐ {sight.rating} | {_truncate(sight.description, 60)}"
+
+
+_SECTIONS = {
+    "flights": ("✈️ **Top Flight Options** (price | duration | stops | times | airport):", rank_flights, _compact_flight),
+    "hotels": ("🏨 **Top Hotel Options** (name | class | rating | nightly cost | summary):", rank_hotels, _compact_hotel),
+    "attractions": ("🗿 **Top Tourist Attractions** (name | rating | summary):", rank_sights, _compact_sight),
+}
+
+
+def render_compact(data_type: str, data, max_items: int, max_tokens: int) -> str:
+    """Rank candidates and render the best ones, one line each, within ``max_tokens``.
+
+    The best-ranked candidate is always kept so a tight budget never empties a section.
+    """
+    if data_type not in _SECTIONS or not data or isinstance(data, dict):
+        return format_api_data(data_type, data)
+
+    header, rank, render_line = _SECTIONS[data_type]
+    lines = [header]
+    used = estimate_tokens(header)
+    for i, item in enumerate(rank(list(data))[:max_items], start=1):
+        line = render_line(i, item)
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens and i > 1:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def prompt_budget_settings() -> Dict[str, int]:
+    """Read the budget knobs.
+
+    Honors:
+    - PROMPT_COMPACT: set to 'false' to send the full, unranked listings (default: true)
+    - PROMPT_TOKEN_BUDGET: approximate tokens for the three listings together (default: 1200)
+    - PROMPT_TOP_FLIGHTS / PROMPT_TOP_HOTELS / PROMPT_TOP_SIGHTS: top-K per section (default: 5 / 5 / 12)
+    """
+    return {
+        "compact": os.getenv("PROMPT_COMPACT", "true").lower() not in ("0", "false", "no"),
+        "token_budget": int(os.getenv("PROMPT_TOKEN_BUDGET", "1200")),
+        "flights": int(os.getenv("PROMPT_TOP_FLIGHTS", "5")),
+        "hotels": int(os.getenv("PROMPT_TOP_HOTELS", "5")),
+        "attractions": int(os.getenv("PROMPT_TOP_SIGHTS", "12")),
+    }
+
+
+def render_for_prompt(data_type: str, data) -> str:
+    """Text for one section of the itinerary prompt, budgeted unless PROMPT_COMPACT is off."""
+    with stage("format"):
+        settings = prompt_budget_settings()
+        if not settings["compact"]:
+            return format_api_data(data_type, data)
+        max_tokens = int(settings["token_budget"] * BUDGET_SHARES.get(data_type, 0.3))
+        return render_compact(data_type, data, settings.get(data_type, 5), max_tokens)
+
+
+__all__ = ["render_for_prompt", "render_compact", "rank_flights", "rank_hotels", "rank_sights",
+           "estimate_tokens", "parse_price"]
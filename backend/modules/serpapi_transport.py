@@ -0,0 +1,199 @@
+import sys
+sys.path.append('')
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+from utils.fixtures import FixtureStore, replay_latency
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_BASE_URL = "https://serpapi.com"
+
+
+class ThreadedTransport:
+    """Fallback transport: runs the blocking ``serpapi.Client`` in the default executor."""
+
+    name = "thread"
+
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+        self._client = None
+
+    def _search(self, params: Dict[str, Any]) -> dict:
+        if self._client is None:
+            import serpapi  # only this fallback needs the serpapi package
+            self._client = serpapi.Client(api_key=self.api_key)
+        # serpapi.Client injects the api key into the dict it is given, so hand it a copy
+        return self._client.search(dict(params)).as_dict()
+
+    async def search(self, params: Dict[str, Any]) -> dict:
+        return await asyncio.to_thread(self._search, params)
+
+    async def close(self) -> None:
+        return None
+
+
+class AiohttpTransport:
+    """asyncio-native SerpAPI transport with a keep-alive connection pool.
+
+    One ``aiohttp.ClientSession`` is shared per event loop. The connector bounds
+    the total pool and the connections opened to any single host.
+    """
+
+    name = "aiohttp"
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str = DEFAULT_BASE_URL,
+        pool_size: int = 100,
+        pool_per_host: int = 20,
+        timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        keepalive_timeout: float = 30.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.pool_per_host = pool_per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self):
+        import aiohttp  # imported with the first search rather than at start-up
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+                headers={"User-Agent": "smartitinerary-aiohttp"},
+            )
+            self._loop = loop
+        return self._session
+
+    async def search(self, params: Dict[str, Any]) -> dict:
+        query = {key: str(value) for key, value in params.items() if value is not None}
+        if "api_key" not in query and self.api_key:
+            query["api_key"] = self.api_key
+
+        session = self._get_session()
+        async with session.get(f"{self.base_url}/search", params=query) as response:
+            if response.status != 200:
+                import aiohttp
+
+                # Mirror serpapi.Client, which raises on any non-200 response
+                body = await response.text()
+                raise aiohttp.ClientResponseError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=body[:500] or response.reason or "",
+                )
+            return await response.json(content_type=None)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+def _fixture_request(params: Dict[str, Any]) -> Dict[str, str]:
+    # Recordings must never contain the API key, and must match however values were typed
+    return {key: str(value) for key, value in params.items() if key != "api_key" and value is not None}
+
+
+class RecordingTransport:
+    """Wraps a live transport and saves every successful response as a fixture."""
+
+    name = "record"
+
+    def __init__(self, inner, fixtures: FixtureStore):
+        self.inner = inner
+        self.fixtures = fixtures
+
+    async def search(self, params: Dict[str, Any]) -> dict:
+        results = await self.inner.search(params)
+        request = _fixture_request(params)
+        await asyncio.to_thread(self.fixtures.save, request.get("engine", "serpapi"), request, results)
+        return results
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+class ReplayTransport:
+    """Serves recorded fixtures instead of calling SerpAPI, after an artificial delay.
+
+    Looks up the exact recording first and falls back to the per-engine default
+    (e.g. ``google_flights.json``). A search with neither raises ``LookupError``.
+    """
+
+    name = "replay"
+
+    def __init__(self, fixtures: FixtureStore, latency: float = 0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+
+    async def search(self, params: Dict[str, Any]) -> dict:
+        request = _fixture_request(params)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        results = self.fixtures.load(request.get("engine", "serpapi"), request)
+        if results is None:
+            raise LookupError(f"No recorded SerpAPI fixture for {request} in {self.fixtures.directory}")
+        return results
+
+    async def close(self) -> None:
+        return None
+
+
+def transport_from_env(api_key: Optional[str]):
+    """Build the SerpAPI transport configured by environment variables.
+
+    Honors:
+    - SERPAPI_TRANSPORT: 'aiohttp' (default), 'thread' for the serpapi.Client fallback,
+      'record' to save live aiohttp responses as fixtures, or 'replay' to serve them offline
+    - SERPAPI_FIXTURES_DIR: fixture directory for record/replay (default: fixtures/serpapi)
+    - REPLAY_LATENCY_MS: artificial delay added to each replayed response (default: 0)
+    - SERPAPI_BASE_URL: API base URL (default: https://serpapi.com)
+    - SERPAPI_POOL_SIZE: max pooled connections in total (default: 100)
+    - SERPAPI_POOL_PER_HOST: max connections per host (default: 20)
+    - SERPAPI_TIMEOUT: total request timeout in seconds (default: 30)
+    - SERPAPI_CONNECT_TIMEOUT: connect timeout in seconds (default: 10)
+    - SERPAPI_KEEPALIVE_TIMEOUT: idle keep-alive lifetime in seconds (default: 30)
+    """
+    mode = os.getenv("SERPAPI_TRANSPORT", "aiohttp").lower()
+    fixtures = FixtureStore(os.getenv("SERPAPI_FIXTURES_DIR", os.path.join("fixtures", "serpapi")))
+    if mode == "thread":
+        return ThreadedTransport(api_key)
+    if mode == "replay":
+        return ReplayTransport(fixtures, latency=replay_latency())
+    if mode not in ("aiohttp", "record"):
+        raise ValueError(f"Unknown SERPAPI_TRANSPORT: {mode!r}")
+    transport = AiohttpTransport(
+        api_key=api_key,
+        base_url=os.getenv("SERPAPI_BASE_URL", DEFAULT_BASE_URL),
+        pool_size=int(os.getenv("SERPAPI_POOL_SIZE", "100")),
+        pool_per_host=int(os.getenv("SERPAPI_POOL_PER_HOST", "20")),
+        timeout=float(os.getenv("SERPAPI_TIMEOUT", "30")),
+        connect_timeout=float(os.getenv("SERPAPI_CONNECT_TIMEOUT", "10")),
+        keepalive_timeout=float(os.getenv("SERPAPI_KEEPALIVE_TIMEOUT", "30")),
+    )
+    if mode == "record":
+        return RecordingTransport(transport, fixtures)
+    return transport
+
+
+__all__ = ["ThreadedTransport", "AiohttpTransport", "RecordingTransport", "ReplayTransport", "transport_from_env"]
@@ -0,0 +1,69 @@
+import sys
+sys.path.append('')
+import asyncio
+
+import numpy as np
+
+from models.api_models import FlightSchedule, HotelDetails
+from models.records import FlightRecord, HotelRecord
+from modules import date_grid
+
+
+def test_cost_matrix_masks_invalid_stays_and_missing_prices():
+    flights = np.array([[300.0, 320.0], [np.nan, 280.0]])
+    hotels = np.array([[100.0, 90.0], [100.0, 110.0]])
+    total, nights, per_night = date_grid.trip_cost_matrix(["2026-06-01", "2026-06-03"], ["2026-06-03", "2026-06-04"], flights, hotels)
+    assert nights.tolist() == [[2, 3], [0, 1]]
+    assert total[0, 0] == 500 and total[0, 1] == 590 and total[1, 1] == 390
+    assert np.isinf(total[1, 0]) and np.isinf(per_night[1, 0])  # no stay and no flight price
+    # Compared per night, the one-night trip is the most expensive rather than the cheapest
+    assert date_grid.cheapest_pairs(per_night, 5) == [(0, 1), (0, 0), (1, 1)]
+
+
+def test_grid_searches_every_pair_concurrently_and_picks_the_cheapest(monkeypatch):
+    in_flight = peak = 0
+
+    async def flight_schedules(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        # Flights get cheaper the later you leave
+        price = 500 - 10 * int(request.outbound_date[-2:])
+        return [FlightRecord("LIS", 420, 0, request.outbound_date, request.outbound_date, str(price)),
+                FlightRecord("LIS", 600, 1, request.outbound_date, request.outbound_date, str(price + 80))]
+
+    async def hotel_list(request):
+        if request.check_in_date == "2026-06-12":
+            return {"error": "no availability"}
+        return [HotelRecord("Casa Azul", "", "$120", 4.5, ""), HotelRecord("Hostel", "", "$40", 3.9, "")]
+
+    monkeypatch.setattr(date_grid, "flight_schedules", flight_schedules)
+    monkeypatch.setattr(date_grid, "hotel_list", hotel_list)
+    monkeypatch.setenv("FLEX_MAX_PARALLEL", "4")
+
+    def search(stay_flex_nights):
+        return asyncio.run(date_grid.search_date_grid(
+            FlightSchedule(departure_airport_code="JFK", arrival_airport_code="LIS", outbound_date="2026-06-10", return_date="2026-06-15"),
+            HotelDetails(city="Lisbon", check_in_date="2026-06-10", check_out_date="2026-06-15", hotel_class="4"),
+            outbound_flex_days=2, return_flex_days=1, stay_flex_nights=stay_flex_nights,
+        ))
+
+    # Only 5-night stays, like the one requested, are searched and compared
+    grid = search(0)
+    assert [(cell["outbound_date"], cell["return_date"]) for cell in grid["grid"]] == [
+        ("2026-06-09", "2026-06-14"), ("2026-06-10", "2026-06-15"), ("2026-06-11", "2026-06-16")]
+    best = grid["cheapest"][0]
+    assert (best["outbound_date"], best["return_date"], best["nights"]) == ("2026-06-11", "2026-06-16", 5)
+    assert best["total_cost"] == 390 + 40 * 5 and best["cost_per_night"] == 118
+    assert grid["flights"][0].departure_time == "2026-06-11"
+
+    # With a tolerance, stays of 4 to 6 nights compete on cost per night; the 12th has no hotel
+    grid = search(1)
+    assert len(grid["grid"]) == 9
+    assert peak <= 4
+    best = grid["cheapest"][0]
+    assert (best["outbound_date"], best["return_date"]) == ("2026-06-10", "2026-06-16")
+    assert best["cost_per_night"] == round((400 + 40 * 6) / 6, 2)
+    assert all(cell["outbound_date"] != "2026-06-12" for cell in grid["cheapest"])
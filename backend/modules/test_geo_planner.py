@@ -0,0 +1,63 @@
+import sys
+sys.path.append('')
+import time
+
+import numpy as np
+
+from models.records import HotelRecord, SightRecord
+from modules import geo_planner
+from utils.cache import MemoryCache
+
+HOTEL = (38.7100, -9.1400)
+
+
+def test_sights_are_grouped_by_neighbourhood_and_ordered_as_a_loop():
+    # Three tight neighbourhoods of three sights each, east, north and west of the hotel
+    centers = {"east": (38.71, -9.09), "north": (38.75, -9.14), "west": (38.71, -9.19)}
+    sights, coordinates = [], []
+    for area, (lat, lon) in centers.items():
+        for i in range(3):
+            sights.append(f"{area}-{i}")
+            coordinates.append((lat + 0.002 * i, lon + 0.002 * (i % 2)))
+
+    plans = geo_planner.plan_days(HOTEL, sights, coordinates, days=3, per_day=3)
+
+    assert [plan["day"] for plan in plans] == [1, 2, 3]
+    assert sorted(len({name.split("-")[0] for name in plan["sights"]}) for plan in plans) == [1, 1, 1]
+    assert all(len(plan["sights"]) == 3 and 0 < plan["distance_km"] < 20 for plan in plans)
+
+
+def test_two_opt_removes_crossings():
+    # Corners of a square visited in a crossing order cost more than the perimeter
+    points = np.array([[0.0, 0.0], [0.0, 0.01], [0.01, 0.01], [0.01, 0.0]])
+    distances = geo_planner.haversine_matrix(points)
+    order = geo_planner.order_route(distances)
+    perimeter = distances[0, 1] + distances[1, 2] + distances[2, 3] + distances[3, 0]
+    assert abs(geo_planner.route_length(distances, order) - perimeter) < 1e-9
+
+
+def test_hundreds_of_attractions_plan_in_milliseconds():
+    rng = np.random.default_rng(7)
+    coordinates = [tuple(point) for point in np.array(HOTEL) + rng.normal(0, 0.05, size=(400, 2))]
+    start = time.perf_counter()
+    plans = geo_planner.plan_days(HOTEL, list(range(400)), coordinates, days=10, per_day=40)
+    assert time.perf_counter() - start < 1.0
+    assert sorted(sight for plan in plans for sight in plan["sights"]) == list(range(400))
+    assert all(len(plan["sights"]) <= 40 for plan in plans)
+
+
+def test_plan_text_uses_learned_coordinates_and_falls_back_without_a_located_hotel(monkeypatch):
+    monkeypatch.setattr(geo_planner, "gazetteer", geo_planner.Gazetteer({"Belem Tower": [38.6916, -9.2160]}, MemoryCache("geo")))
+    hotel = HotelRecord("Casa Azul", "", "$120", 4.6, "", latitude=HOTEL[0], longitude=HOTEL[1])
+    castle = SightRecord("Castelo", "", "Lisbon", 4.7, "", latitude=38.7139, longitude=-9.1335)
+    unknown = SightRecord("Hidden Bar", "", "Lisbon", 4.9, "")
+
+    text = geo_planner.plan_sights_text([castle, unknown, SightRecord("Belem Tower", "", "Lisbon", 4.5, "")],
+                                        [hotel], "2026-06-01", "2026-06-03")
+    assert "each day starts and ends at Casa Azul" in text
+    assert "Castelo" in text and "Belem Tower" in text and "Hidden Bar" not in text
+    # Castelo's reported coordinates were remembered for results that lack them
+    assert geo_planner.gazetteer.locate("Castelo", "Lisbon") == (38.7139, -9.1335)
+
+    unlocated_hotel = HotelRecord("Pensao", "", "$60", 4.0, "")
+    assert geo_planner.plan_sights_text([castle], [unlocated_hotel], "2026-06-01", "2026-06-03") is None
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append('')
+
+import pytest
+from pydantic import ValidationError
+
+from models.api_models import ItineraryJobRequest
+from modules.job_queue import JOB_FAILED, JOB_SUCCEEDED, JobQueue, MemoryJobStore, SQLiteJobStore
+from utils.callback_urls import callback_target_allowed
+
+
+async def _wait_for(queue, job_id, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (JOB_SUCCEEDED, JOB_FAILED):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _run_queue(store):
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+        await asyncio.sleep(0.05)
+        if payload.get("fail"):
+            raise ValueError("boom")
+        return {"itinerary": f"trip to {payload['city']}"}
+
+    async def scenario():
+        queue = JobQueue(store, handler, workers=2, ttl=60)
+        await queue.start()
+        try:
+            first = queue.submit({"city": "Paris"})
+            duplicate = queue.submit({"city": "Paris"})
+            failing = queue.submit({"city": "Rome", "fail": True})
+            done = await _wait_for(queue, first["id"])
+            failed = await _wait_for(queue, failing["id"])
+            return first, duplicate, done, failed, queue.stats()
+        finally:
+            await queue.stop()
+
+    first, duplicate, done, failed, stats = asyncio.run(scenario())
+    assert duplicate["id"] == first["id"] and duplicate["deduplicated"]
+    assert done["result"] == {"itinerary": "trip to Paris"}
+    assert failed["status"] == JOB_FAILED and failed["error"] == "boom"
+    assert len(calls) == 2
+    assert stats["deduplicated"] == 1
+
+
+def test_memory_job_queue_runs_and_deduplicates():
+    _run_queue(MemoryJobStore())
+
+
+def test_sqlite_job_queue_runs_and_deduplicates():
+    with tempfile.TemporaryDirectory() as tmp:
+        _run_queue(SQLiteJobStore(os.path.join(tmp, "jobs.sqlite3")))
+
+
+def test_shared_sqlite_store_runs_each_job_once():
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+        await asyncio.sleep(0.05)
+        return {"itinerary": f"trip to {payload['city']}"}
+
+    async def scenario(path):
+        first = JobQueue(SQLiteJobStore(path), handler, workers=1, ttl=60)
+        await first.start()
+        job = first.submit({"city": "Lisbon"})
+        # A sibling worker starting later sees the pending job in the shared store
+        second = JobQueue(SQLiteJobStore(path), handler, workers=1, ttl=60, recover_running=False)
+        await second.start()
+        try:
+            done = await _wait_for(second, job["id"])
+            await asyncio.sleep(0.1)
+            return done
+        finally:
+            await first.stop()
+            await second.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        done = asyncio.run(scenario(os.path.join(tmp, "jobs.sqlite3")))
+    assert done["status"] == JOB_SUCCEEDED
+    assert len(calls) == 1
+
+
+def test_callback_urls_must_be_public_unless_allowlisted(monkeypatch):
+    body = {
+        "flight_request": {"departure_airport_code": "JFK", "arrival_airport_code": "LIS",
+                           "outbound_date": "2026-11-01", "return_date": "2026-11-04"},
+        "hotel_request": {"city": "Lisbon", "check_in_date": "2026-11-01", "check_out_date": "2026-11-04", "hotel_class": "4"},
+        "sights_request": {"query": "Lisbon"},
+    }
+    for url in ("file:///etc/passwd", "http://127.0.0.1:8000/admin", "http://169.254.169.254/latest/meta-data",
+                "http://10.0.0.5/hook", "http://[::1]/hook", "http://localhost/hook", "http://user:pw@example.com/"):
+        with pytest.raises(ValidationError):
+            ItineraryJobRequest.model_validate(dict(body, callback_url=url))
+    assert ItineraryJobRequest.model_validate(dict(body, callback_url="https://93.184.216.34/hook")).callback_url
+
+    monkeypatch.setenv("JOB_CALLBACK_ALLOWED_HOSTS", "10.0.0.5")
+    assert ItineraryJobRequest.model_validate(dict(body, callback_url="http://10.0.0.5/hook")).callback_url
+    # Names are checked against what they resolve to when the callback is sent
+    assert not asyncio.run(callback_target_allowed("http://localhost.localdomain/hook"))
+
+
+def test_queued_jobs_do_not_expire_before_they_finish():
+    async def handler(payload):
+        return {}
+
+    async def scenario():
+        store = MemoryJobStore()
+        queue = JobQueue(store, handler, ttl=0)
+        await queue.start()
+        await queue.stop()  # no workers left: the job stays pending
+        job = queue.submit({"city": "Porto"})
+        await asyncio.sleep(0.01)
+        return queue.get(job["id"]), store.purge_expired(time.time())
+
+    job, purged = asyncio.run(scenario())
+    assert job["status"] == "pending" and purged == 0
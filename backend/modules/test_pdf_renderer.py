@@ -0,0 +1,117 @@
+import sys
+sys.path.append('')
+import asyncio
+import random
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from modules import pdf_renderer
+from modules.pdf_renderer import MAX_WIDTH, PDFRenderPool, wrap_words
+
+
+def quadratic_wrap(text, font, size, max_width=MAX_WIDTH):
+    """The original helper.download_data loop: re-measure the whole growing line for every word."""
+    lines, current_line = [], ''
+    for word in text.split(' '):
+        test_line = current_line + word + ' '
+        if stringWidth(test_line, font, size) < max_width:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line.strip())
+            current_line = word + ' '
+    if current_line.strip():
+        lines.append(current_line.strip())
+    return lines
+
+
+STYLES = [("Helvetica", 10), ("Helvetica-Bold", 10), ("Helvetica-Bold", 11), ("Helvetica-Bold", 13), ("Helvetica-Bold", 16)]
+
+
+@pytest.mark.parametrize("font,size", STYLES)
+def test_wrap_matches_the_quadratic_algorithm(font, size):
+    rng = random.Random(f"{font}{size}")
+    vocabulary = ["a", "Lisbon", "09:00", "Belem Tower -", "(~12 km)", "Pasteis", "W" * 12, "i" * 40, ""]
+    cases = [
+        "",  # empty line
+        " ",
+        "word",
+        "x" * 400,  # one word wider than the page
+        "short " + "M" * 120 + " tail",  # long word in the middle
+        "double  spaces   between words ",
+    ] + [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 120))) for _ in range(200)]
+    for text in cases:
+        assert wrap_words(text, font, size) == quadratic_wrap(text, font, size), text
+
+
+@pytest.mark.parametrize("font,size", STYLES)
+def test_lines_of_exactly_the_available_width_break_the_same_way(font, size):
+    for words in (["Lisbon"] * 5, ["Day", "2:", "Alfama", "and", "Castelo"], ["W"] * 30):
+        text = " ".join(words)
+        for cut in range(1, len(words) + 1):
+            # A width the first ``cut`` words (plus trailing space) fill exactly, and the widths right around it
+            exact = stringWidth(" ".join(words[:cut]) + " ", font, size)
+            for max_width in (exact, exact + 1e-6, exact - 1e-6):
+                assert wrap_words(text, font, size, max_width) == quadratic_wrap(text, font, size, max_width)
+
+
+@pytest.fixture
+def slow_renderer(monkeypatch):
+    """Replace the real renderer with one that blocks until the returned event is set."""
+    release = threading.Event()
+
+    def render(text):
+        release.wait(5)
+        return f"%PDF {text}".encode()
+
+    monkeypatch.setattr(pdf_renderer, "render_pdf_bytes", render)
+    yield release
+    release.set()
+
+
+def test_renders_beyond_workers_plus_queue_get_503(slow_renderer):
+    pool = PDFRenderPool(workers=1, max_queue=1, timeout=5)
+
+    async def scenario():
+        admitted = [asyncio.create_task(pool.render(f"doc {i}")) for i in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as busy:
+            await pool.render("one too many")
+        slow_renderer.set()
+        return busy.value, await asyncio.gather(*admitted)
+
+    try:
+        busy, rendered = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert busy.status_code == 503 and busy.headers["Retry-After"] == "2"
+    assert rendered == [b"%PDF doc 0", b"%PDF doc 1"]
+    assert pool.stats()["rejected"] == 1 and pool.stats()["completed"] == 2
+
+
+def test_slow_render_gets_504_and_holds_its_slot_until_it_finishes(slow_renderer):
+    pool = PDFRenderPool(workers=1, max_queue=0, timeout=0.05)
+
+    async def scenario():
+        with pytest.raises(HTTPException) as slow:
+            await pool.render("stuck")
+        # The abandoned render still occupies the only worker
+        with pytest.raises(HTTPException) as busy:
+            await pool.render("next")
+        return slow.value, busy.value
+
+    try:
+        slow, busy = asyncio.run(scenario())
+        assert slow.status_code == 504 and busy.status_code == 503
+        slow_renderer.set()
+        deadline = time.monotonic() + 2
+        while pool.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.stats()["pending"] == 0 and pool.stats()["timed_out"] == 1
+        assert asyncio.run(pool.render("next")) == b"%PDF next"
+    finally:
+        pool.shutdown()
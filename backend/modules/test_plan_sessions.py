@@ -0,0 +1,191 @@
+import sys
+sys.path.append('')
+import asyncio
+
+from modules import plan_sessions
+from modules.plan_sessions import sections_to_regenerate, splice_sections, split_sections
+from utils.cache import MemoryCache
+
+ITINERARY = """# 🌍 Lisbon Getaway
+✈️ Arrive on F1, 🏨 check in at Casa Azul.
+
+## Day 1
+- 🏛️ Belem Tower
+## Day 2
+- 🖼️ Gulbenkian Museum
+## Day 3
+- 🚋 Alfama walk, fly home"""
+
+TEXTS = {
+    "flight_text": "- F1: $420 | 7h00m | nonstop",
+    "hotel_text": "- H1: Casa Azul | 4★ | ⭐ 4.5 | $120/night | Rooftop",
+    "sights_text": "- A1: Belem Tower (Lisbon) | ⭐ 4.6 | Fort\n- A2: Gulbenkian Museum (Lisbon) | ⭐ 4.8 | Art",
+}
+
+
+def test_changed_sights_only_touch_days_that_name_them():
+    sections = split_sections(ITINERARY)
+    assert [section.split("\n")[0] for section in sections] == ["# 🌍 Lisbon Getaway", "## Day 1", "## Day 2", "## Day 3"]
+
+    swapped = dict(TEXTS, sights_text="- A1: Belem Tower (Lisbon) | ⭐ 4.6 | Fort\n- A2: Oceanarium (Lisbon) | ⭐ 4.7 | Aquarium")
+    assert sections_to_regenerate(sections, TEXTS, swapped) == [2]
+    # A new hotel changes the intro, check-in and check-out days
+    assert sections_to_regenerate(sections, TEXTS, dict(TEXTS, hotel_text="- H1: Palacio | 5★")) == [0, 1, 3]
+    assert sections_to_regenerate(sections, TEXTS, dict(swapped, hotel_text="- H1: Palacio | 5★")) is None
+
+    spliced = splice_sections(sections, "## Day 2\n- 🐟 Oceanarium", [2])
+    assert "Oceanarium" in spliced and "Gulbenkian" not in spliced and spliced.count("## Day") == 3
+    assert splice_sections(sections, "## Day 5\n- lost", [2]) is None
+
+
+def test_refine_refetches_and_regenerates_only_what_changed(monkeypatch):
+    from api import routes
+    from models.api_models import PlanItineraryRequest
+
+    monkeypatch.setattr(plan_sessions, "plan_session_store", MemoryCache("test"))
+    calls = {"searches": [], "generate": 0, "revise": []}
+
+    def search(kind, text):
+        async def run(service_request):
+            calls["searches"].append(kind)
+            return text(service_request)
+        return run
+
+    monkeypatch.setattr(routes, "_SERVICES", (
+        ("flight_request", search("flights", lambda r: TEXTS["flight_text"]), "flights", "flight_text"),
+        ("hotel_request", search("hotels", lambda r: TEXTS["hotel_text"]), "hotels", "hotel_text"),
+        ("sights_request", search("sights", lambda r: TEXTS["sights_text"].replace("Gulbenkian Museum", r.query)), "attractions", "sights_text"),
+    ))
+    monkeypatch.setattr(routes, "render_for_prompt", lambda data_type, data: data)
+
+    async def generate_itinerary(**kwargs):
+        calls["generate"] += 1
+        return ITINERARY
+
+    async def revise_sections(itinerary, headings, **kwargs):
+        calls["revise"].append(headings)
+        return "## Day 2\n- 🐟 Oceanarium"
+
+    monkeypatch.setattr(routes, "generate_itinerary", generate_itinerary)
+    monkeypatch.setattr(routes, "revise_sections", revise_sections)
+
+    payload = {
+        "flight_request": {"departure_airport_code": "JFK", "arrival_airport_code": "LIS",
+                           "outbound_date": "2026-11-01", "return_date": "2026-11-04"},
+        "hotel_request": {"city": "Lisbon", "check_in_date": "2026-11-01", "check_out_date": "2026-11-04", "hotel_class": "4"},
+        "sights_request": {"query": "Gulbenkian Museum"},
+    }
+
+    async def main():
+        first = await routes.plan_itinerary(PlanItineraryRequest.model_validate(payload))
+        unchanged = await routes.plan_itinerary(PlanItineraryRequest.model_validate(dict(payload, plan_id=first.plan_id)))
+        refined = await routes.plan_itinerary(PlanItineraryRequest.model_validate(
+            dict(payload, plan_id=first.plan_id, sights_request={"query": "Oceanarium"})))
+        return first, unchanged, refined
+
+    first, unchanged, refined = asyncio.run(main())
+    assert first.plan_id and refined.plan_id == first.plan_id
+    assert unchanged.itinerary == ITINERARY
+    assert "Oceanarium" in refined.itinerary and "Belem Tower" in refined.itinerary
+    assert calls["searches"] == ["flights", "hotels", "sights", "sights"]
+    assert calls["generate"] == 1
+    assert calls["revise"] == [["## Day 2"]]
+
+
+def test_hotel_only_refinement_replans_day_routes_around_the_new_hotel(monkeypatch):
+    from api import routes
+    from models.api_models import PlanItineraryRequest
+    from models.records import HotelRecord, SightRecord
+    from modules import geo_planner
+
+    monkeypatch.setattr(plan_sessions, "plan_session_store", MemoryCache("test"))
+    monkeypatch.setattr(geo_planner, "gazetteer", geo_planner.Gazetteer(cache=MemoryCache("geo")))
+    monkeypatch.setenv("GEO_DAY_PLANNING", "true")
+    searches, prompts = [], []
+
+    def search(kind, results):
+        async def run(service_request):
+            searches.append(kind)
+            return results(service_request)
+        return run
+
+    monkeypatch.setattr(routes, "_SERVICES", (
+        ("flight_request", search("flights", lambda r: []), "flights", "flight_text"),
+        ("hotel_request", search("hotels", lambda r: [HotelRecord(f"{r.city} Inn", "", "$100", 4.5, "", 4, 38.71, -9.14)]),
+         "hotels", "hotel_text"),
+        ("sights_request", search("sights", lambda r: [SightRecord("Castelo", "", "Lisbon", 4.7, "", 38.7139, -9.1335)]),
+         "attractions", "sights_text"),
+    ))
+
+    async def generate_itinerary(**kwargs):
+        prompts.append(kwargs["must_visit_locations"])
+        return ITINERARY
+
+    monkeypatch.setattr(routes, "generate_itinerary", generate_itinerary)
+    monkeypatch.setattr(routes, "revise_sections", lambda *args, **kwargs: asyncio.sleep(0, "## Day 1\n- 🏰 Castelo"))
+    payload = {
+        "flight_request": {"departure_airport_code": "JFK", "arrival_airport_code": "LIS",
+                           "outbound_date": "2026-11-01", "return_date": "2026-11-04"},
+        "hotel_request": {"city": "Alfama", "check_in_date": "2026-11-01", "check_out_date": "2026-11-04", "hotel_class": "4"},
+        "sights_request": {"query": "Lisbon"},
+    }
+
+    async def main():
+        first = await routes.plan_itinerary(PlanItineraryRequest.model_validate(payload))
+        await routes.plan_itinerary(PlanItineraryRequest.model_validate(dict(
+            payload, plan_id=first.plan_id, hotel_request=dict(payload["hotel_request"], city="Baixa"))))
+        return plan_sessions.load_session(first.plan_id)
+
+    session = asyncio.run(main())
+    assert searches == ["flights", "hotels", "sights", "hotels"]
+    assert "ends at Alfama Inn" in prompts[0]
+    # The stored attractions were re-planned around the new hotel without searching them again
+    assert "ends at Baixa Inn" in session["texts"]["sights_text"] and "Castelo" in session["texts"]["sights_text"]
+    assert session["results"]["hotels"][0]["name"] == "Baixa Inn"
+
+
+def test_failed_generation_is_never_stored_or_reused(monkeypatch):
+    import pytest
+    from agents.crew_agent import ItineraryGenerationFailed
+    from api import routes
+    from models.api_models import PlanItineraryRequest
+
+    monkeypatch.setattr(plan_sessions, "plan_session_store", MemoryCache("test"))
+    monkeypatch.setattr(routes, "_SERVICES", tuple(
+        (field, lambda service_request, text=TEXTS[text_key]: asyncio.sleep(0, text), data_type, text_key)
+        for field, _, data_type, text_key in routes._SERVICES
+    ))
+    monkeypatch.setattr(routes, "render_for_prompt", lambda data_type, data: data)
+    outcomes = [ITINERARY, ItineraryGenerationFailed(), ITINERARY.replace("Casa Azul", "Palacio")]
+    calls = []
+
+    async def generate_itinerary(**kwargs):
+        calls.append(kwargs)
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(routes, "generate_itinerary", generate_itinerary)
+    payload = {
+        "flight_request": {"departure_airport_code": "JFK", "arrival_airport_code": "LIS",
+                           "outbound_date": "2026-11-01", "return_date": "2026-11-04"},
+        "hotel_request": {"city": "Lisbon", "check_in_date": "2026-11-01", "check_out_date": "2026-11-04", "hotel_class": "4"},
+        "sights_request": {"query": "Lisbon"},
+    }
+    moved = dict(payload, hotel_request=dict(payload["hotel_request"], check_in_date="2026-11-02"))
+
+    async def main():
+        first = await routes.plan_itinerary(PlanItineraryRequest.model_validate(payload))
+        with pytest.raises(ItineraryGenerationFailed) as failed:
+            await routes.plan_itinerary(PlanItineraryRequest.model_validate(dict(moved, plan_id=first.plan_id)))
+        kept = plan_sessions.load_session(first.plan_id)
+        retried = await routes.plan_itinerary(PlanItineraryRequest.model_validate(dict(moved, plan_id=first.plan_id)))
+        return failed.value, kept, retried
+
+    failed, kept, retried = asyncio.run(main())
+    assert failed.status_code == 502
+    # The failed refinement left the last good plan in place, and the retry generated again
+    assert kept["itinerary"] == ITINERARY and kept["request"]["hotel_request"]["check_in_date"] == "2026-11-01"
+    assert retried.itinerary == outcomes[2] and len(calls) == 3
+
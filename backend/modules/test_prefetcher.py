@@ -0,0 +1,82 @@
+import sys
+sys.path.append('')
+import asyncio
+import json
+
+from modules.prefetcher import SearchPrefetcher
+from utils.cache import MemoryCache
+
+
+def _prefetcher(cache, fetched, **kwargs):
+    async def fetch(params):
+        fetched.append(params["q"])
+        cache.set(key_for(params), {"q": params["q"]}, ttl=100)
+
+    def key_for(params):
+        return f"{params['engine']}:{params['q']}"
+
+    return SearchPrefetcher(cache, fetch, key_for, lambda engine: 100, min_score=2, **kwargs)
+
+
+def test_refreshes_hottest_expiring_searches_within_budget():
+    cache, fetched = MemoryCache("test"), []
+    prefetcher = _prefetcher(cache, fetched, budget_per_hour=2)
+    for q, hits in (("lisbon", 5), ("porto", 3), ("faro", 2), ("rare", 1)):
+        for _ in range(hits):
+            prefetcher.record({"engine": "google_hotels", "q": q})
+    cache.set("google_hotels:porto", {"q": "porto"}, ttl=100)  # fresh, not due yet
+    cache.set("google_hotels:faro", {"q": "faro"}, ttl=10)  # within the last 20% of its TTL
+
+    assert asyncio.run(prefetcher.run_once()) == 2
+    assert fetched == ["lisbon", "faro"]
+    # The hourly budget is spent, so nothing more is fetched this hour
+    cache.delete("google_hotels:porto")
+    assert asyncio.run(prefetcher.run_once()) == 0
+    assert prefetcher.stats()["budget_left"] == 0
+
+
+def test_snapshot_round_trip_warms_a_new_process(tmp_path):
+    cache, fetched = MemoryCache("old"), []
+    old = _prefetcher(cache, fetched)
+    for _ in range(3):
+        old.record({"engine": "tripadvisor", "q": "lisbon"})
+    cache.set("tripadvisor:lisbon", {"q": "lisbon"}, ttl=100)
+    path = str(tmp_path / "prefetch.json")
+    assert old.export_snapshot(path) == 1
+
+    new_cache = MemoryCache("new")
+    new = _prefetcher(new_cache, [])
+    assert new.import_snapshot(path) == 1
+    assert new_cache.get("tripadvisor:lisbon") == {"q": "lisbon"}
+    assert new.hottest()[0]["score"] >= 2.9
+
+    # A hand-written warm list only needs the search params
+    with open(path, "w") as handle:
+        json.dump({"version": 1, "entries": [{"params": {"engine": "tripadvisor", "q": "porto"}}]}, handle)
+    new.import_snapshot(path)
+    assert [item["key"] for item in new.due()] == ["tripadvisor:porto"]
+
+
+def test_refreshing_worker_ranks_on_the_counts_of_every_worker(tmp_path):
+    cache, demand, fetched = MemoryCache("shared"), MemoryCache("demand"), []
+    first = _prefetcher(cache, fetched, shared=demand, worker=0, workers=2)
+    second = _prefetcher(cache, [], shared=demand, worker=1, workers=2)
+    for q in ("porto", "porto", "lisbon"):
+        second.record({"engine": "google_hotels", "q": q})
+    first.record({"engine": "google_hotels", "q": "lisbon"})
+    # Neither worker alone sees lisbon twice
+    assert [item["key"] for item in first.due()] == []
+
+    assert second.publish() == 2
+    assert first.publish() == 1  # its own counts are not merged back in
+    scores = {item["key"]: item["score"] for item in first.hottest()}
+    assert scores == {"google_hotels:porto": 2, "google_hotels:lisbon": 2}
+    assert asyncio.run(first.run_once()) == 2 and sorted(fetched) == ["lisbon", "porto"]
+
+    path = str(tmp_path / "prefetch.json")
+    assert first.export_snapshot(path) == 2
+    # Seeding only the cache leaves the counts to the worker that loads them
+    fresh_cache = MemoryCache("new")
+    fresh = _prefetcher(fresh_cache, [])
+    assert fresh.import_snapshot(path, counts=False) == 2
+    assert fresh_cache.get("google_hotels:porto") == {"q": "porto"} and fresh.hottest() == []
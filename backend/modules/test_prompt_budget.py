@@ -0,0 +1,76 @@
+import sys
+sys.path.append('')
+
+import pytest
+
+from models.api_models import FlightResponse, HotelResponse, SightsResponse
+from modules.prompt_budget import (estimate_tokens, parse_price, rank_flights, rank_hotels, rank_sights,
+                                   render_for_prompt)
+
+
+def flight(price, duration=300, stops=0):
+    return FlightResponse(destination_airport="LIS", duration=duration, stops=stops, departure_time="08:00",
+                          arrival_time="20:00", price=str(price))
+
+
+def hotel(name, rating, cost, hotel_class=None):
+    return HotelResponse(name=name, description="Central", cost_per_night=cost, rating=rating, link="",
+                         hotel_class=hotel_class)
+
+
+def sight(name, rating, description="Worth a visit"):
+    return SightsResponse(name=name, description=description, location="Lisbon", rating=rating, link="")
+
+
+@pytest.fixture(autouse=True)
+def budget_env(monkeypatch):
+    for name in ("PROMPT_COMPACT", "PROMPT_TOKEN_BUDGET", "PROMPT_TOP_FLIGHTS", "PROMPT_TOP_HOTELS", "PROMPT_TOP_SIGHTS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_prices_are_parsed_from_display_strings():
+    assert parse_price("$1,234") == 1234.0
+    assert parse_price("$$120") == 120.0
+    assert parse_price("N/A") is None and parse_price("0") is None
+
+
+def test_rankings_put_the_best_candidates_first():
+    cheap, pricey, cheap_slow, cheap_stops = flight(400), flight(900), flight(420, duration=400), flight(400, stops=2)
+    assert rank_flights([pricey, cheap_stops, cheap_slow, cheap]) == [cheap, cheap_stops, cheap_slow, pricey]
+
+    # Rating comes first; between equal ratings the cheaper wins and an unknown price counts as expensive
+    great, good_cheap, good_unknown = hotel("Great", 4.8, "$200", 5), hotel("Cheap", 4.2, "$80"), hotel("Unknown", 4.2, "N/A")
+    assert rank_hotels([good_unknown, good_cheap, great]) == [great, good_cheap, good_unknown]
+
+    # Equal ratings keep the order TripAdvisor returned
+    first, second, best = sight("First", 4.5), sight("Second", 4.5), sight("Best", 4.9)
+    assert rank_sights([first, second, best]) == [best, first, second]
+
+
+def test_top_k_keeps_only_the_best_ranked(monkeypatch):
+    monkeypatch.setenv("PROMPT_TOP_SIGHTS", "2")
+    text = render_for_prompt("attractions", [sight("Low", 3.0), sight("Top", 4.9), sight("Mid", 4.5)])
+    lines = text.splitlines()
+    assert len(lines) == 3  # header + top 2
+    assert "A1: Top" in lines[1] and "A2: Mid" in lines[2]
+    assert "Low" not in text
+
+
+def test_token_budget_truncates_sections_but_keeps_the_best(monkeypatch):
+    sights = [sight(f"Sight {i}", 5.0 - i / 10, "A long description " * 10) for i in range(12)]
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "400")  # 45% of it, 180 tokens, for attractions
+    budgeted = render_for_prompt("attractions", sights)
+    assert estimate_tokens(budgeted) <= 180
+    assert 1 < len(budgeted.splitlines()) < 13
+
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "1")
+    tiny = render_for_prompt("attractions", sights)
+    assert tiny.splitlines()[1].startswith("- A1: Sight 0")
+    assert len(tiny.splitlines()) == 2
+
+
+def test_compact_mode_can_be_turned_off(monkeypatch):
+    monkeypatch.setenv("PROMPT_COMPACT", "false")
+    monkeypatch.setenv("PROMPT_TOP_SIGHTS", "1")
+    text = render_for_prompt("attractions", [sight("Low", 3.0), sight("Top", 4.9)])
+    assert "Low" in text and "Top" in text
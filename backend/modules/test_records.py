@@ -0,0 +1,53 @@
+import sys
+sys.path.append('')
+import asyncio
+
+import pytest
+
+from models.api_models import FlightResponse, HotelResponse, SightsResponse
+from models.records import FlightRecord, HotelRecord, SightRecord
+from models.api_models import HotelDetails, Sights
+from modules import Service_Api
+from modules.helper import format_api_data
+
+
+def test_records_render_like_validated_models():
+    flight = dict(destination_airport="Lisbon Airport", duration=420, stops=1,
+                  departure_time="08:00", arrival_time="20:00", price="455")
+    hotel = dict(name="Harbour Inn", description="x" * 150, cost_per_night="$120", rating=4.5,
+                 link="https://example.com/h", hotel_class=4)
+    sight = dict(name="Belém Tower", description="Fortified tower", location="Lisbon",
+                 rating=4.6, link="https://example.com/s")
+
+    assert format_api_data("flights", [FlightRecord(**flight)] * 3) == format_api_data("flights", [FlightResponse(**flight)] * 3)
+    assert format_api_data("hotels", [HotelRecord(**hotel)]) == format_api_data("hotels", [HotelResponse(**hotel)])
+    assert format_api_data("attractions", [SightRecord(**sight)]) == format_api_data("attractions", [SightsResponse(**sight)])
+    assert HotelRecord(**hotel).model_dump() == HotelResponse(**hotel).model_dump()
+
+
+@pytest.mark.parametrize("rating", [4, 4.5, None, "missing"])
+def test_fast_path_parses_and_renders_like_the_models(monkeypatch, rating):
+    hotel = {"name": "Harbour Inn", "description": "Quiet", "rate_per_night": {"lowest": "$120"},
+             "link": "https://example.com/h", "extracted_hotel_class": 4,
+             "gps_coordinates": {"latitude": 38, "longitude": -9}}
+    sight = {"title": "Belém Tower", "description": "Fortified tower", "location": "Lisbon", "link": "https://example.com/s"}
+    if rating != "missing":
+        hotel["overall_rating"] = sight["rating"] = rating
+
+    async def run_search(params):
+        return {"properties": [hotel]} if params["engine"] == "google_hotels" else {"locations": [sight]}
+
+    monkeypatch.setattr(Service_Api, "run_search", run_search)
+    hotels_request = HotelDetails(city="Lisbon", check_in_date="2026-05-01", check_out_date="2026-05-03", hotel_class="4")
+
+    def search(fast):
+        monkeypatch.setenv("SEARCH_FAST_PATH", "true" if fast else "false")
+        return asyncio.run(Service_Api.hotel_list(hotels_request)), asyncio.run(Service_Api.tourist_attractions(Sights(query="Lisbon")))
+
+    (fast_hotels, fast_sights), (model_hotels, model_sights) = search(True), search(False)
+    assert isinstance(fast_hotels[0], HotelRecord) and isinstance(model_hotels[0], HotelResponse)
+    assert format_api_data("hotels", fast_hotels) == format_api_data("hotels", model_hotels)
+    assert format_api_data("attractions", fast_sights) == format_api_data("attractions", model_sights)
+    assert fast_hotels[0].model_dump() == model_hotels[0].model_dump()
+    assert fast_sights[0].model_dump() == model_sights[0].model_dump()
+    assert "None" not in format_api_data("hotels", fast_hotels)
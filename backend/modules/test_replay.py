@@ -0,0 +1,78 @@
+import sys
+sys.path.append('')
+import os
+os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
+import asyncio
+
+import pytest
+
+from agents.llm import stream_completion
+from agents.replay_llm import RecordingLLM, ReplayLLM
+from modules.serpapi_transport import RecordingTransport, ReplayTransport
+from utils.fixtures import FixtureStore
+
+
+class StubTransport:
+    def __init__(self):
+        self.calls = 0
+
+    async def search(self, params):
+        self.calls += 1
+        return {"best_flights": [{"price": 420}], "echo": params["departure_id"]}
+
+    async def close(self):
+        return None
+
+
+def test_recorded_searches_replay_offline(tmp_path):
+    fixtures = FixtureStore(str(tmp_path))
+    params = {"engine": "google_flights", "departure_id": "JFK", "arrival_id": "LIS", "api_key": "secret"}
+
+    async def main():
+        recorder = RecordingTransport(StubTransport(), fixtures)
+        recorded = await recorder.search(params)
+        replayed = await ReplayTransport(fixtures).search(dict(params, api_key="other"))
+        return recorded, replayed
+
+    recorded, replayed = asyncio.run(main())
+    assert replayed == recorded
+    assert "secret" not in "".join(path.read_text() for path in tmp_path.iterdir())
+
+
+def test_replay_falls_back_to_engine_default_then_fails(tmp_path):
+    fixtures = FixtureStore(str(tmp_path))
+    fixtures.save("google_hotels", None, {"properties": [{"name": "Default Inn"}]}, default=True)
+    transport = ReplayTransport(fixtures, latency=0.01)
+
+    hotels = asyncio.run(transport.search({"engine": "google_hotels", "q": "Lisbon hotels"}))
+    assert hotels["properties"][0]["name"] == "Default Inn"
+    with pytest.raises(LookupError):
+        asyncio.run(transport.search({"engine": "tripadvisor", "q": "Lisbon"}))
+
+
+def test_llm_replay_serves_recordings_and_streams(tmp_path):
+    fixtures = FixtureStore(str(tmp_path))
+    messages = [{"role": "user", "content": "Plan 3 days in Lisbon"}]
+    fixtures.save("llm", {"model": "gemini/gemini-2.0-flash", "messages": messages}, "# Lisbon\n" + "## Day 1\n" * 20)
+    llm = ReplayLLM(model="gemini/gemini-2.0-flash", fixtures=fixtures)
+
+    assert llm.call(messages).startswith("# Lisbon")
+    with pytest.raises(LookupError):
+        llm.call([{"role": "user", "content": "Plan 3 days in Porto"}])
+
+    async def collect():
+        return [delta async for delta in stream_completion(messages, llm)]
+
+    deltas = asyncio.run(collect())
+    assert len(deltas) > 1
+    assert "".join(deltas) == llm.call(messages)
+
+
+def test_recording_llm_saves_completions(tmp_path, monkeypatch):
+    fixtures = FixtureStore(str(tmp_path))
+    monkeypatch.setattr("crewai.LLM.call", lambda self, messages, *args, **kwargs: "# Recorded")
+    llm = RecordingLLM(model="gemini/gemini-2.0-flash", fixtures=fixtures)
+
+    assert llm.call("Plan a weekend") == "# Recorded"
+    replay = ReplayLLM(model="gemini/gemini-2.0-flash", fixtures=fixtures)
+    assert replay.call("Plan a weekend") == "# Recorded"
@@ -0,0 +1,86 @@
+import sys
+sys.path.append('')
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from models.api_models import FlightSchedule, HotelDetails, RequestResponse, Sights
+from modules import Service_Api
+from utils.cache import MemoryCache
+
+FLIGHTS = {"engine": "google_flights", "departure_id": "JFK", "arrival_id": "LIS"}
+
+
+class FlakyTransport:
+    """Answers per engine with a payload, or sleeps / raises to mimic a bad upstream."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = 0
+
+    async def search(self, params):
+        self.calls += 1
+        action = self.behaviour[params["engine"]]
+        if action == "slow":
+            await asyncio.sleep(5)
+        if action == "error":
+            raise ConnectionError("upstream down")
+        return action
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(Service_Api, "search_cache", MemoryCache("test"))
+    monkeypatch.setattr(Service_Api, "_search_guards", {})
+    monkeypatch.setenv("SEARCH_TIMEOUT_DEFAULT", "0.1")
+    for engine in Service_Api.DEFAULT_SEARCH_TIMEOUTS:
+        monkeypatch.setenv(f"SEARCH_TIMEOUT_{engine.upper()}", "0.1")
+    monkeypatch.setenv("SEARCH_BREAKER_THRESHOLD", "2")
+    return Service_Api
+
+
+def test_slow_engine_times_out_then_circuit_serves_stale(service, monkeypatch):
+    service.search_cache.set(service.search_cache_key(FLIGHTS), {"best_flights": ["stale"]}, ttl=0.01)
+    time.sleep(0.02)
+    transport = FlakyTransport({"google_flights": "slow"})
+    monkeypatch.setattr(service, "serpapi_transport", transport)
+
+    async def main():
+        results = [await service.run_search(FLIGHTS) for _ in range(3)]
+        monkeypatch.setenv("SEARCH_STALE_MAX_AGE", "0")
+        with pytest.raises(HTTPException) as error:
+            await service.run_search(FLIGHTS)
+        return results, error.value
+
+    start = time.monotonic()
+    results, error = asyncio.run(main())
+    assert all(result == {"best_flights": ["stale"]} for result in results)
+    # Two timeouts open the breaker; later calls fail fast without reaching the engine
+    assert transport.calls == 2
+    assert error.status_code == 503
+    assert time.monotonic() - start < 1.0
+    assert service.search_guard_stats()["google_flights"]["breaker"]["state"] == "open"
+
+
+def test_plan_continues_with_partial_data(service, monkeypatch):
+    from api.routes import get_complete_iternary
+
+    monkeypatch.setattr(service, "serpapi_transport", FlakyTransport({
+        "google_flights": "error",
+        "google_hotels": {"properties": [{"name": "Casa Azul", "description": "Rooftop", "rate_per_night": {"lowest": "$120"},
+                                          "overall_rating": 4.5, "link": "https://example.com/casa"}]},
+        "tripadvisor": "slow",
+    }))
+    request = RequestResponse(
+        flight_request=FlightSchedule(departure_airport_code="JFK", arrival_airport_code="LIS",
+                                      outbound_date="2026-11-01", return_date="2026-11-08"),
+        hotel_request=HotelDetails(city="Lisbon", check_in_date="2026-11-01", check_out_date="2026-11-08", hotel_class="4"),
+        sights_request=Sights(query="Lisbon"),
+    )
+
+    data = asyncio.run(get_complete_iternary(request))
+    assert "Casa Azul" in data["hotel_text"]
+    assert "No flights information available" in data["flight_text"]
+    assert "No attractions information available" in data["sights_text"]
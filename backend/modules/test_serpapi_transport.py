@@ -0,0 +1,80 @@
+import asyncio
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append('')
+
+import aiohttp
+import pytest
+
+from modules.serpapi_transport import AiohttpTransport
+
+
+class StubSerpApiHandler(BaseHTTPRequestHandler):
+    """Minimal SerpAPI stand-in: echoes the query back and records client ports."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self.server.client_ports.add(self.client_address[1])
+        if query.get("engine") == "broken":
+            status, payload = 400, {"error": "Unsupported engine"}
+        else:
+            status, payload = 200, {"search_parameters": query, "path": url.path}
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSerpApiHandler)
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_reuses_pooled_connection(stub_server):
+    base_url = f"http://127.0.0.1:{stub_server.server_address[1]}"
+    transport = AiohttpTransport(api_key="test-key", base_url=base_url, pool_per_host=1)
+
+    async def scenario():
+        try:
+            return [await transport.search({"engine": "tripadvisor", "q": "Paris", "ssrc": "A"}) for _ in range(5)]
+        finally:
+            await transport.close()
+
+    results = asyncio.run(scenario())
+    assert results[0]["path"] == "/search"
+    assert results[0]["search_parameters"] == {"engine": "tripadvisor", "q": "Paris", "ssrc": "A", "api_key": "test-key"}
+    assert len(stub_server.client_ports) == 1
+
+
+def test_non_200_raises_like_serpapi_client(stub_server):
+    base_url = f"http://127.0.0.1:{stub_server.server_address[1]}"
+    transport = AiohttpTransport(api_key="test-key", base_url=base_url)
+
+    async def scenario():
+        try:
+            await transport.search({"engine": "broken"})
+        finally:
+            await transport.close()
+
+    with pytest.raises(aiohttp.ClientResponseError) as excinfo:
+        asyncio.run(scenario())
+    assert excinfo.value.status == 400
+    assert "Unsupported engine" in excinfo.value.message
@@ -0,0 +1,81 @@
+import sys
+sys.path.append('')
+import asyncio
+import importlib
+import os
+import time
+from typing import Any, Dict, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Imported lazily by the request path; listed here so they can be loaded ahead of time.
+HEAVY_MODULES = ("crewai", "litellm", "reportlab.pdfgen.canvas", "aiohttp")
+
+_status: Dict[str, Any] = {"state": "idle", "seconds": {}}
+_task: Optional[asyncio.Future] = None
+
+
+def warmup_enabled() -> bool:
+    """WARMUP_ON_STARTUP=true loads the heavy subsystems in the background once the app is up (default: off)."""
+    return os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+
+def import_heavy_modules() -> Dict[str, float]:
+    """Import CrewAI, LiteLLM, ReportLab and aiohttp; returns seconds spent per module."""
+    from agents.llm import import_crewai
+
+    seconds = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        if name == "crewai":
+            import_crewai()
+        else:
+            importlib.import_module(name)
+        seconds[name] = round(time.perf_counter() - start, 3)
+    return seconds
+
+
+def warm_up() -> Dict[str, float]:
+    """Import the heavy modules, then build the LLM, planner crews and ReportLab state (blocking)."""
+    from agents.crew_agent import execution_mode, planner_pool
+    from agents.llm import get_llm
+    from modules.pdf_renderer import render_pdf_bytes
+
+    seconds = import_heavy_modules()
+    steps = [("llm", get_llm), ("pdf", lambda: render_pdf_bytes("# Warm-up\n- ready"))]
+    if execution_mode() != "direct":
+        steps.append(("planner_crews", planner_pool.warm))
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        seconds[name] = round(time.perf_counter() - start, 3)
+    return seconds
+
+
+async def _run_warm_up() -> None:
+    _status["state"] = "running"
+    start = time.perf_counter()
+    try:
+        _status["seconds"] = await asyncio.to_thread(warm_up)
+        _status["state"] = "done"
+        logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        _status["state"] = "failed"
+        _status["error"] = str(e)
+        logger.exception("Warm-up failed; subsystems will load on first use")
+
+
+def start_warm_up() -> None:
+    """Warm up in a background thread without delaying start-up."""
+    global _task
+    if _task is None:
+        _task = asyncio.ensure_future(_run_warm_up())
+
+
+def warmup_status() -> Dict[str, Any]:
+    return dict(_status)
+
+
+__all__ = ["warmup_enabled", "import_heavy_modules", "warm_up", "start_warm_up", "warmup_status"]
@@ -0,0 +1,203 @@
+"""Multi-worker production launcher.
+
+Imports the app (CrewAI, ReportLab, serpapi and every module-level client) once
+in a supervisor process, binds the listening socket, then forks N uvicorn
+workers that share it. Forked workers start instantly and share the preloaded
+code copy-on-write. Search, itinerary and PDF caches and the job store default
+to the shared SQLite backend, so every worker sees the others' results.
+
+Upstream rate limits and concurrency (SERPAPI_*, LLM_*, SCHEDULER_*) are split
+evenly between the workers, and the search prefetcher, the model health loop
+and the prefetch snapshot run in worker 0 only, so N workers do not multiply
+them by N.
+
+SIGTERM/SIGINT drain gracefully: workers stop accepting connections, finish
+in-flight requests (up to --drain-timeout seconds) and run the app's shutdown.
+Workers that die unexpectedly are replaced.
+
+Usage (from backend/):
+    python serve.py --workers 4 --port 8000
+    WEB_CONCURRENCY=4 python app.py
+"""
+import sys
+sys.path.append('')
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+import traceback
+from typing import Dict, List, Optional
+
+# Stores every worker should share unless explicitly configured otherwise.
+SHARED_STORE_DEFAULTS = {
+    "SEARCH_CACHE_BACKEND": "sqlite",
+    "ITINERARY_CACHE_BACKEND": "sqlite",
+    "PDF_CACHE_BACKEND": "sqlite",
+    "JOB_STORE_BACKEND": "sqlite",
+    "PLAN_SESSION_BACKEND": "sqlite",
+    "PREFETCH_DEMAND_BACKEND": "sqlite",
+}
+
+# Don't respawn faster than this when a worker keeps crashing on start-up.
+RESPAWN_BACKOFF = 1.0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the API with several preloaded worker processes.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="worker processes (default: WEB_CONCURRENCY or 1)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--drain-timeout", type=float, default=float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "30")),
+                        help="seconds in-flight requests get to finish on shutdown (default: 30)")
+    return parser.parse_args(argv)
+
+
+def worker_count(argv: Optional[List[str]] = None) -> int:
+    """Workers requested on the command line or through WEB_CONCURRENCY."""
+    return parse_args(argv).workers
+
+
+def use_shared_stores() -> None:
+    for name, value in SHARED_STORE_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+    # The supervisor recovers interrupted jobs once; a respawned worker must not
+    # reset jobs its siblings are still running.
+    os.environ["JOB_RECOVER_RUNNING"] = "false"
+
+
+def share_limits(workers: int) -> None:
+    """Tell the app how many workers split the deployment-wide limits (read when it is imported)."""
+    os.environ["SERVE_WORKERS"] = str(max(1, workers))
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, drain_timeout: float) -> None:
+    """Serve ``app`` on the inherited socket until told to stop (runs in the forked child)."""
+    import uvicorn
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    config = uvicorn.Config(app, lifespan="on", timeout_graceful_shutdown=drain_timeout)
+    # uvicorn.Server installs its own SIGTERM/SIGINT handlers that drain before exiting
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Forks the workers, replaces dead ones and drains them all on shutdown."""
+
+    def __init__(self, app, sock: socket.socket, workers: int, drain_timeout: float):
+        self.app = app
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.drain_timeout = drain_timeout
+        self.children: Dict[int, float] = {}
+        self.slots: Dict[int, int] = {}  # pid -> worker index, kept by replacements
+        self.stopping = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            # Worker 0 runs the singleton background loops
+            os.environ["SERVE_WORKER_INDEX"] = str(index)
+            try:
+                run_worker(self.app, self.sock, self.drain_timeout)
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                # Never fall back into the supervisor's loop or run its atexit hooks
+                os._exit(status)
+        self.children[pid] = time.monotonic()
+        self.slots[pid] = index
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _reap(self) -> List[int]:
+        exited = []
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.children:
+                exited.append(pid)
+        return exited
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for index in range(self.workers):
+            self.spawn(index)
+        print(f"Serving on {self.sock.getsockname()} with {self.workers} workers: {sorted(self.children)}", flush=True)
+
+        while not self.stopping:
+            for pid in self._reap():
+                started = self.children.pop(pid)
+                index = self.slots.pop(pid)
+                if self.stopping:
+                    break
+                if time.monotonic() - started < RESPAWN_BACKOFF:
+                    time.sleep(RESPAWN_BACKOFF)
+                print(f"Worker {pid} exited, starting a replacement", flush=True)
+                self.spawn(index)
+            time.sleep(0.2)
+        self.drain()
+
+    def drain(self) -> None:
+        """Ask every worker to finish in-flight requests, then kill any that overrun."""
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            for pid in self._reap():
+                self.children.pop(pid, None)
+            time.sleep(0.1)
+        for pid in self.children:
+            os.kill(pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    use_shared_stores()
+    share_limits(args.workers)
+
+    # Preload: everything imported here is shared copy-on-write by the forked workers.
+    # The app itself imports CrewAI, LiteLLM, ReportLab and aiohttp lazily, so load them explicitly.
+    from app import app
+    from api.routes import job_queue
+    from modules.warmup import import_heavy_modules
+
+    import_heavy_modules()
+
+    recovered = job_queue.recover()
+    if recovered:
+        print(f"Re-queued {recovered} interrupted jobs", flush=True)
+    # Keep the garbage collector from touching (and so copying) preloaded objects in the workers
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    Supervisor(app, sock, args.workers, args.drain_timeout).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class BaseCache:
+    """Common bookkeeping for the TTL + LRU cache backends.
+
+    Backends store ``(expires_at, value)`` pairs keyed by string and evict the
+    least recently used entry once ``max_entries`` is exceeded. Hit, miss and
+    eviction counters are kept per instance and reported by ``stats()``.
+    """
+
+    backend_name = "base"
+
+    def __init__(self, namespace: str, max_entries: int = 1024):
+        self.namespace = namespace
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def _record(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def get_stale(self, key: str, max_stale: float = float("inf")) -> Optional[Any]:
+        """Return an entry even if it has expired, as long as it expired at most ``max_stale`` seconds ago.
+
+        Expired entries are kept until evicted, so they can be served when the
+        upstream is unavailable. Stale reads do not count as hits or misses.
+        """
+        raise NotImplementedError
+
+    def expiry(self, key: str) -> Optional[float]:
+        """Unix time at which ``key`` expires (possibly in the past), or None if it is not stored."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "namespace": self.namespace,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class MemoryCache(BaseCache):
+    """In-process cache backed by an ``OrderedDict`` kept in LRU order."""
+
+    backend_name = "memory"
+
+    def __init__(self, namespace: str, max_entries: int = 1024):
+        super().__init__(namespace, max_entries)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+        self._record(entry is not None)
+        return entry[1] if entry is not None else None
+
+    def get_stale(self, key: str, max_stale: float = float("inf")) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or time.time() - entry[0] > max_stale:
+            return None
+        return entry[1]
+
+    def expiry(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(BaseCache):
+    """On-disk cache stored in a SQLite file so entries survive restarts.
+
+    Several namespaces can share one database file. ``bytes`` values are stored
+    as raw blobs, everything else as JSON.
+    """
+
+    backend_name = "sqlite"
+
+    def __init__(self, namespace: str, path: str, max_entries: int = 1024):
+        super().__init__(namespace, max_entries)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not be shared across fork(), so reopen per process.
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache_entries (
+                       namespace TEXT NOT NULL,
+                       key TEXT NOT NULL,
+                       kind TEXT NOT NULL,
+                       value BLOB NOT NULL,
+                       expires_at REAL NOT NULL,
+                       accessed_at REAL NOT NULL,
+                       PRIMARY KEY (namespace, key)
+                   )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, accessed_at)"
+            )
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _encode(value: Any) -> Tuple[str, Any]:
+        if isinstance(value, (bytes, bytearray)):
+            return "bytes", sqlite3.Binary(bytes(value))
+        return "json", json.dumps(value)
+
+    @staticmethod
+    def _decode(kind: str, raw: Any) -> Any:
+        if kind == "bytes":
+            return bytes(raw)
+        return json.loads(raw)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT kind, value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is not None and row[2] > now:
+                conn.execute(
+                    "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    (now, self.namespace, key),
+                )
+                conn.commit()
+            else:
+                row = None
+        self._record(row is not None)
+        return self._decode(row[0], row[1]) if row is not None else None
+
+    def get_stale(self, key: str, max_stale: float = float("inf")) -> Optional[Any]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT kind, value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+        if row is None or time.time() - row[2] > max_stale:
+            return None
+        return self._decode(row[0], row[1])
+
+    def expiry(self, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT expires_at FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        kind, raw = self._encode(value)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, kind, raw, now + ttl, now),
+            )
+            count = conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                           SELECT key FROM cache_entries WHERE namespace = ?
+                           ORDER BY accessed_at ASC LIMIT ?)""",
+                    (self.namespace, self.namespace, overflow),
+                )
+                self.evictions += overflow
+            conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            )
+            conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+            conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+
+
+def cache_from_env(prefix: str, namespace: str, default_max_entries: int = 1024) -> BaseCache:
+    """Build a cache configured by ``<PREFIX>_*`` environment variables.
+
+    Honors:
+    - <PREFIX>_BACKEND: 'memory' (default) or 'sqlite'
+    - <PREFIX>_MAX_ENTRIES: LRU size bound (default: default_max_entries)
+    - <PREFIX>_PATH: SQLite file for the sqlite backend (default: .cache/smartitinerary.sqlite3)
+    """
+    backend = os.getenv(f"{prefix}_BACKEND", "memory").lower()
+    max_entries = int(os.getenv(f"{prefix}_MAX_ENTRIES", str(default_max_entries)))
+    if backend == "sqlite":
+        path = os.getenv(f"{prefix}_PATH", os.path.join(".cache", "smartitinerary.sqlite3"))
+        return SQLiteCache(namespace, path=path, max_entries=max_entries)
+    if backend != "memory":
+        raise ValueError(f"Unknown cache backend for {prefix}: {backend!r}")
+    return MemoryCache(namespace, max_entries=max_entries)
+
+
+__all__ = ["BaseCache", "MemoryCache", "SQLiteCache", "cache_from_env"]
@@ -0,0 +1,61 @@
+import asyncio
+import ipaddress
+import os
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+# Job webhooks are POSTed by the server, so a client-supplied URL must not reach
+# loopback, link-local (cloud metadata) or private addresses.
+
+
+def allowed_callback_hosts() -> List[str]:
+    """JOB_CALLBACK_ALLOWED_HOSTS: comma-separated hosts always allowed as callbacks, e.g. an internal receiver."""
+    return [host.strip().lower() for host in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+
+
+def _public_ip(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def callback_url_error(url: str) -> Optional[str]:
+    """Why ``url`` may not be used as a job callback, or None if it may."""
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        parts.port  # raises ValueError for an invalid port
+    except ValueError:
+        return "callback_url is not a valid URL"
+    if parts.scheme not in ("http", "https") or not host:
+        return "callback_url must be an http(s) URL with a host"
+    if parts.username or parts.password:
+        return "callback_url must not contain credentials"
+    if host in allowed_callback_hosts():
+        return None
+    if host == "localhost" or host.endswith(".localhost"):
+        return "callback_url must not point to this server"
+    try:
+        if not _public_ip(host):
+            return "callback_url must not point to a loopback, link-local or private address"
+    except ValueError:
+        pass  # a host name; its addresses are checked when the callback is sent
+    return None
+
+
+async def callback_target_allowed(url: str) -> bool:
+    """Re-check ``url`` when sending: every address its host resolves to must be public (or the host allowlisted)."""
+    if callback_url_error(url) is not None:
+        return False
+    host = urlsplit(url).hostname.lower()
+    if host in allowed_callback_hosts():
+        return True
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None)
+    except OSError:
+        return False
+    return bool(infos) and all(_public_ip(info[4][0]) for info in infos)
+
+
+__all__ = ["allowed_callback_hosts", "callback_url_error", "callback_target_allowed"]
@@ -0,0 +1,54 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Optional
+
+
+class FixtureStore:
+    """Directory of recorded upstream responses, one JSON file per request.
+
+    A fixture is named ``<kind>-<hash of the request>.json``. When no exact
+    recording exists, ``<kind>.json`` is used as a catch-all default, which is
+    what synthetic load tests provide instead of real recordings.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def request_key(kind: str, request: Any) -> str:
+        digest = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"{kind}-{digest[:24]}"
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def load(self, kind: str, request: Any) -> Optional[Any]:
+        """Recorded response for ``request``, else the ``kind`` default, else None."""
+        for name in (self.request_key(kind, request), kind):
+            path = self._path(name)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as handle:
+                    return json.load(handle)["response"]
+        return None
+
+    def save(self, kind: str, request: Any, response: Any, default: bool = False) -> str:
+        """Write a recording (or the ``kind`` default) and return its path."""
+        path = self._path(kind if default else self.request_key(kind, request))
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                json.dump({"request": request, "response": response}, handle, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+        return path
+
+
+def replay_latency() -> float:
+    """Artificial delay in seconds added to every replayed response (REPLAY_LATENCY_MS, default: 0)."""
+    return max(0.0, float(os.getenv("REPLAY_LATENCY_MS", "0")) / 1000.0)
+
+
+__all__ = ["FixtureStore", "replay_latency"]
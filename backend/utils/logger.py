@@ -1,11 +1,107 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
-from typing import Optional
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
 
 
 _CONFIGURED = False
+_LISTENER: Optional[QueueListener] = None
+_QUEUE_HANDLER: Optional["BoundedQueueHandler"] = None
+_SAMPLER: Optional["SamplingFilter"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random ``rate`` fraction of INFO-and-below records; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = min(1.0, max(0.0, rate))
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to the listener thread through a bounded queue.
+
+    When the queue is full, the 'drop' policy discards the record (and counts it)
+    so the caller never waits on log I/O; 'block' waits for room instead.
+    """
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop"):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve args and tracebacks now (they may not be picklable or thread-safe later),
+        # but keep the traceback apart from the message so the listener's formatter lays it out.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _restart_listener_in_child() -> None:
+    """A forked worker inherits the queue but not the listener thread; give it its own."""
+    global _LISTENER
+    if _LISTENER is None or _QUEUE_HANDLER is None:
+        return
+    # The parent's thread may have held the queue's lock at fork time, so start from a fresh queue
+    _QUEUE_HANDLER.queue = queue.Queue(maxsize=_QUEUE_HANDLER.queue.maxsize)
+    _LISTENER = QueueListener(_QUEUE_HANDLER.queue, *_LISTENER.handlers, respect_handler_level=True)
+    _LISTENER.start()
+
+
+def _stop_listener() -> None:
+    global _LISTENER
+    if _LISTENER is not None:
+        # Flushes everything still queued before the process exits
+        _LISTENER.stop()
+        _LISTENER = None
 
 
 def _configure_root_logger() -> None:
@@ -16,8 +112,13 @@ def _configure_root_logger() -> None:
     - LOG_FILE: path to a rotating log file (optional)
     - LOG_FILE_MAX_BYTES: rotate at size in bytes (default: 5MB)
     - LOG_FILE_BACKUP_COUNT: number of rotated files to keep (default: 3)
+    - LOG_FORMAT: 'text' (default) or 'json' for one JSON object per line
+    - LOG_SAMPLE_RATE: fraction of INFO/DEBUG records kept, warnings and errors are never sampled (default: 1.0)
+    - LOG_ASYNC: when true, handlers run on a listener thread behind a queue (default: false)
+    - LOG_QUEUE_SIZE: bound of the async queue (default: 10000)
+    - LOG_QUEUE_POLICY: 'drop' (default) discards records when the queue is full, 'block' waits
     """
-    global _CONFIGURED
+    global _CONFIGURED, _LISTENER, _QUEUE_HANDLER, _SAMPLER
     if _CONFIGURED:
         return
 
@@ -26,7 +127,10 @@ def _configure_root_logger() -> None:
 
     fmt = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
     datefmt = "%Y-%m-%d %H:%M:%S"
-    formatter = logging.Formatter(fmt=fmt, datefmt=datefmt)
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(fmt=fmt, datefmt=datefmt)
 
     root = logging.getLogger()
     root.setLevel(level)
@@ -39,12 +143,13 @@ def _configure_root_logger() -> None:
         return False
 
     if not _has_our_handler():
+        handlers = []
         stream_handler = logging.StreamHandler(stream=sys.stdout)
         stream_handler.setLevel(level)
         stream_handler.setFormatter(formatter)
         # mark to detect later
         stream_handler._smartitinerary = True  # type: ignore[attr-defined]
-        root.addHandler(stream_handler)
+        handlers.append(stream_handler)
 
         log_file = os.getenv("LOG_FILE")
         if log_file:
@@ -56,7 +161,25 @@ def _configure_root_logger() -> None:
             file_handler.setLevel(level)
             file_handler.setFormatter(formatter)
             file_handler._smartitinerary = True  # type: ignore[attr-defined]
-            root.addHandler(file_handler)
+            handlers.append(file_handler)
+
+        _SAMPLER = SamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", "1.0")))
+        if os.getenv("LOG_ASYNC", "false").lower() in ("1", "true", "yes"):
+            log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+            _QUEUE_HANDLER = BoundedQueueHandler(log_queue, os.getenv("LOG_QUEUE_POLICY", "drop").lower())
+            _QUEUE_HANDLER.setLevel(level)
+            # Sample before enqueueing so sampled-out records never reach the listener
+            _QUEUE_HANDLER.addFilter(_SAMPLER)
+            _QUEUE_HANDLER._smartitinerary = True  # type: ignore[attr-defined]
+            root.addHandler(_QUEUE_HANDLER)
+            _LISTENER = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            _LISTENER.start()
+            atexit.register(_stop_listener)
+            os.register_at_fork(after_in_child=_restart_listener_in_child)
+        else:
+            for handler in handlers:
+                handler.addFilter(_SAMPLER)
+                root.addHandler(handler)
 
     _CONFIGURED = True
 
@@ -70,4 +193,20 @@ def get_logger(name: Optional[str] = None) -> logging.Logger:
     return logging.getLogger(name or "SMARTITINERARY")
 
 
-__all__ = ["get_logger"]
+def logging_stats() -> Dict[str, object]:
+    """Async queue depth and the number of records dropped or sampled out so far."""
+    stats: Dict[str, object] = {
+        "async": _QUEUE_HANDLER is not None,
+        "sampled_out": _SAMPLER.sampled_out if _SAMPLER is not None else 0,
+    }
+    if _QUEUE_HANDLER is not None:
+        stats.update({
+            "policy": _QUEUE_HANDLER.policy,
+            "queue_size": _QUEUE_HANDLER.queue.maxsize,
+            "queued": _QUEUE_HANDLER.queue.qsize(),
+            "dropped": _QUEUE_HANDLER.dropped,
+        })
+    return stats
+
+
+__all__ = ["get_logger", "logging_stats", "JsonFormatter", "SamplingFilter", "BoundedQueueHandler"]
@@ -0,0 +1,214 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit for '{name}' is open, retry in {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast for ``reset_timeout`` seconds. The first call after that is let
+    through as a probe: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def release(self) -> None:
+        """End a half-open probe without a verdict, letting the next call probe instead."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, "opens": self.opens}
+
+
+class LatencyTracker:
+    """Rolling window of recent call durations for percentile estimates."""
+
+    def __init__(self, window: int = 200):
+        self._samples: "deque[float]" = deque(maxlen=max(1, window))
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        """The ``pct`` percentile of the window, or None until ``min_samples`` calls were seen."""
+        if len(self._samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+async def hedged(
+    call: Callable[[], Awaitable[Any]],
+    delay: Optional[float],
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> Any:
+    """Await ``call()``; if it has not finished after ``delay`` seconds, start a second one.
+
+    Whichever attempt succeeds first wins and the other is cancelled. An error
+    is only raised once both attempts have failed. ``delay=None`` disables hedging.
+    """
+    if delay is None:
+        return await call()
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return tasks[0].result()
+        if on_hedge is not None:
+            on_hedge()
+        tasks.append(asyncio.ensure_future(call()))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class UpstreamGuard:
+    """Deadline, hedging and circuit breaking around calls to one upstream endpoint.
+
+    ``is_failure`` decides which exceptions (timeouts included) count against the
+    breaker, so that e.g. our own rate limiting does not open the circuit of a
+    healthy upstream. ``admission`` returns an async context manager entered
+    before each call, such as a scheduler slot; the deadline and the latency
+    clock only start once it is entered, so local queueing is not blamed on the
+    upstream, and a hedge shares the admitted call's slot rather than taking another.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: Optional[float] = None,
+        hedge: bool = True,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.25,
+        breaker: Optional[CircuitBreaker] = None,
+        is_failure: Callable[[BaseException], bool] = lambda error: True,
+        admission: Optional[Callable[[], AsyncContextManager]] = None,
+        latency_window: int = 200,
+    ):
+        self.name = name
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker(latency_window)
+        self.is_failure = is_failure
+        self.admission = admission or nullcontext
+        self.calls = 0
+        self.hedges = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Hedge after the recent p95 latency, once enough calls have been observed."""
+        if not self.hedge:
+            return None
+        p = self.latency.percentile(self.hedge_percentile, self.hedge_min_samples)
+        return None if p is None else max(self.hedge_min_delay, p)
+
+    def _count_hedge(self) -> None:
+        self.hedges += 1
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+        try:
+            async with self.admission():
+                self.calls += 1
+                start = time.monotonic()
+                result = await asyncio.wait_for(hedged(fn, self.hedge_delay(), self._count_hedge), self.timeout)
+                elapsed = time.monotonic() - start
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+            if self.is_failure(e):
+                self.failures += 1
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            raise
+        self.breaker.record_success()
+        self.latency.observe(elapsed)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(95.0)
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "p95_seconds": round(p95, 4) if p95 is not None else None,
+            "timeout_seconds": self.timeout,
+            "breaker": self.breaker.stats(),
+        }
+
+
+__all__ = ["CircuitOpenError", "CircuitBreaker", "LatencyTracker", "hedged", "UpstreamGuard"]
@@ -0,0 +1,288 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException
+from utils.workers import serving_workers
+
+
+# Lower value = served first when a slot frees up.
+PRIORITY_SEARCH = 0
+PRIORITY_LLM = 1
+
+
+class SchedulerRejected(HTTPException):
+    """Raised when an outbound call cannot be admitted in time.
+
+    429 means the upstream's queue or rate budget is exhausted, 503 means the
+    call waited ``queue_timeout`` seconds without getting a slot. Both carry a
+    ``Retry-After`` header so clients back off instead of hammering us.
+    """
+
+    def __init__(self, upstream: str, reason: str, status_code: int, retry_after: float):
+        self.upstream = upstream
+        self.reason = reason
+        super().__init__(
+            status_code=status_code,
+            detail=f"Upstream '{upstream}' is saturated: {reason}",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class _QueueFull(Exception):
+    pass
+
+
+class _QueueTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    """Token bucket using reservations: a caller takes a token and sleeps off any debt."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def delay_for(self, calls: int) -> float:
+        """Seconds until ``calls`` more tokens are available, without taking any."""
+        if self.rate <= 0:
+            return 0.0
+        tokens = min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate)
+        return max(0.0, (calls - tokens) / self.rate)
+
+    def refund(self) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+class PriorityGate:
+    """Counting semaphore with a bounded, priority-ordered wait queue.
+
+    Freed slots are handed directly to the highest-priority (then oldest) waiter,
+    so a backlog of slow low-priority work cannot starve cheap high-priority calls.
+    """
+
+    def __init__(self, capacity: int, max_queue: int):
+        self.capacity = max(1, capacity)
+        self.max_queue = max(0, max_queue)
+        self.in_use = 0
+        self.queued = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int, timeout: float) -> None:
+        if self.in_use < self.capacity and not self.queued:
+            self.in_use += 1
+            return
+        if self.queued >= self.max_queue:
+            raise _QueueFull()
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        try:
+            done, _ = await asyncio.wait({future}, timeout=max(0.0, timeout))
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if not done:
+            self._abandon(future)
+            raise _QueueTimeout()
+
+    def _abandon(self, future: asyncio.Future) -> None:
+        if future.done() and not future.cancelled():
+            # The slot was handed over just as we gave up; pass it on.
+            self.release()
+        else:
+            future.cancel()
+            self.queued -= 1
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.queued -= 1
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+
+class _Lane:
+    """Per-upstream limits plus the counters reported by ``Scheduler.stats()``."""
+
+    def __init__(self, name: str, max_concurrency: int, rate: float, burst: float,
+                 priority: int, queue_timeout: float, max_queue: int):
+        self.name = name
+        self.priority = priority
+        self.queue_timeout = queue_timeout
+        self.gate = PriorityGate(max_concurrency, max_queue)
+        self.bucket = TokenBucket(rate, burst)
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_rate_limited = 0
+        self.rejected_timeout = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "priority": self.priority,
+            "max_concurrency": self.gate.capacity,
+            "in_flight": self.gate.in_use,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_rate_limited": self.rejected_rate_limited,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds_avg": round(self.wait_seconds_total / self.admitted, 4) if self.admitted else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 4),
+        }
+
+
+class Scheduler:
+    """Admission control for outbound calls, shared by every request in the process.
+
+    Each upstream gets its own concurrency gate and token bucket. On top of that a
+    global priority gate caps total outbound work (and therefore worker threads),
+    and lets search calls overtake queued LLM generations.
+    """
+
+    def __init__(self, max_concurrency: int = 32, max_queue: int = 256):
+        self.global_gate = PriorityGate(max_concurrency, max_queue)
+        self.lanes: Dict[str, _Lane] = {}
+
+    def register(self, name: str, max_concurrency: int, rate: float = 0.0, burst: float = 1.0,
+                 priority: int = PRIORITY_SEARCH, queue_timeout: float = 10.0, max_queue: int = 128) -> None:
+        self.lanes[name] = _Lane(name, max_concurrency, rate, burst, priority, queue_timeout, max_queue)
+
+    def fits(self, upstream: str, calls: int) -> bool:
+        """Whether ``calls`` more calls to ``upstream`` would get past its rate limit within the queue timeout."""
+        lane = self.lanes[upstream]
+        return lane.bucket.delay_for(calls) <= lane.queue_timeout
+
+    @asynccontextmanager
+    async def slot(self, upstream: str):
+        """Hold one admitted slot for ``upstream`` for the duration of the block."""
+        lane = self.lanes[upstream]
+        start = time.monotonic()
+        deadline = start + lane.queue_timeout
+        lane.waiting += 1
+        try:
+            await self._admit(lane, deadline)
+        finally:
+            lane.waiting -= 1
+
+        waited = time.monotonic() - start
+        lane.admitted += 1
+        lane.wait_seconds_total += waited
+        lane.wait_seconds_max = max(lane.wait_seconds_max, waited)
+        try:
+            yield
+        finally:
+            self.global_gate.release()
+            lane.gate.release()
+
+    async def _admit(self, lane: _Lane, deadline: float) -> None:
+        try:
+            await lane.gate.acquire(lane.priority, deadline - time.monotonic())
+        except _QueueFull:
+            lane.rejected_queue_full += 1
+            raise SchedulerRejected(lane.name, "too many queued calls", 429, lane.queue_timeout)
+        except _QueueTimeout:
+            lane.rejected_timeout += 1
+            raise SchedulerRejected(lane.name, "timed out waiting for a slot", 503, lane.queue_timeout)
+
+        try:
+            delay = lane.bucket.reserve()
+            if delay > deadline - time.monotonic():
+                lane.bucket.refund()
+                lane.rejected_rate_limited += 1
+                raise SchedulerRejected(lane.name, "rate limit exceeded", 429, delay)
+            if delay:
+                await asyncio.sleep(delay)
+            await self.global_gate.acquire(lane.priority, deadline - time.monotonic())
+        except _QueueFull:
+            lane.gate.release()
+            lane.rejected_queue_full += 1
+            raise SchedulerRejected(lane.name, "too many queued calls", 429, lane.queue_timeout)
+        except _QueueTimeout:
+            lane.gate.release()
+            lane.rejected_timeout += 1
+            raise SchedulerRejected(lane.name, "timed out waiting for a slot", 503, lane.queue_timeout)
+        except BaseException:
+            lane.gate.release()
+            raise
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_concurrency": self.global_gate.capacity,
+            "in_flight": self.global_gate.in_use,
+            "queue_depth": self.global_gate.queued,
+            "upstreams": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
+
+
+def scheduler_from_env() -> Scheduler:
+    """Build the process-wide scheduler with the 'serpapi' and 'llm' upstreams.
+
+    Honors:
+    - SCHEDULER_MAX_CONCURRENCY / SCHEDULER_MAX_QUEUE: global outbound cap and queue bound (default: 32 / 256)
+    - <UPSTREAM>_MAX_CONCURRENCY: concurrent calls per upstream (SERPAPI: 16, LLM: 4)
+    - <UPSTREAM>_RATE_PER_SEC / <UPSTREAM>_BURST: token bucket, 0 disables (SERPAPI: 10/20, LLM: 1/4)
+    - <UPSTREAM>_QUEUE_TIMEOUT: seconds to wait for admission before a 503 (SERPAPI: 10, LLM: 30)
+    - <UPSTREAM>_MAX_QUEUE: queued calls per upstream before a 429 (default: 128)
+
+    Concurrency, rate and burst are deployment-wide: with SERVE_WORKERS
+    processes each gets its share, so the workers together stay within them.
+    """
+    workers = serving_workers()
+
+    def share(total, minimum):
+        return max(minimum, total / workers)
+
+    scheduler = Scheduler(
+        max_concurrency=int(share(int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "32")), 1)),
+        max_queue=int(os.getenv("SCHEDULER_MAX_QUEUE", "256")),
+    )
+    defaults = {
+        "serpapi": (PRIORITY_SEARCH, 16, 10.0, 20.0, 10.0),
+        "llm": (PRIORITY_LLM, 4, 1.0, 4.0, 30.0),
+    }
+    for name, (priority, concurrency, rate, burst, queue_timeout) in defaults.items():
+        prefix = name.upper()
+        scheduler.register(
+            name,
+            max_concurrency=int(share(int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(concurrency))), 1)),
+            rate=share(float(os.getenv(f"{prefix}_RATE_PER_SEC", str(rate))), 0.0),
+            burst=share(float(os.getenv(f"{prefix}_BURST", str(burst))), 1.0),
+            priority=priority,
+            queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", str(queue_timeout))),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", "128")),
+        )
+    return scheduler
+
+
+scheduler = scheduler_from_env()
+
+
+__all__ = ["Scheduler", "SchedulerRejected", "TokenBucket", "PriorityGate", "scheduler",
+           "PRIORITY_SEARCH", "PRIORITY_LLM"]
@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append('')
+
+from utils.cache import MemoryCache, SQLiteCache
+
+
+def _exercise_cache(cache):
+    """Shared TTL + LRU assertions for every backend."""
+    cache.set("a", {"value": 1}, ttl=60)
+    cache.set("b", {"value": 2}, ttl=60)
+    assert cache.get("a") == {"value": 1}
+
+    # "b" is now least recently used and should be evicted first
+    cache.set("c", {"value": 3}, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("c") == {"value": 3}
+
+    cache.set("short", {"value": 4}, ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    # Expired entries stay readable as stale data until evicted
+    assert cache.get_stale("short") == {"value": 4}
+    assert cache.get_stale("short", max_stale=0.01) is None
+    assert cache.get_stale("missing") is None
+    assert cache.expiry("short") < time.time() < cache.expiry("c")
+    assert cache.expiry("missing") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] >= 1
+    assert len(cache) <= cache.max_entries
+
+
+def test_memory_cache_ttl_and_lru():
+    _exercise_cache(MemoryCache("test", max_entries=2))
+
+
+def test_sqlite_cache_ttl_and_lru():
+    with tempfile.TemporaryDirectory() as tmp:
+        _exercise_cache(SQLiteCache("test", path=os.path.join(tmp, "cache.sqlite3"), max_entries=2))
+
+
+def test_sqlite_cache_survives_reopen():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        SQLiteCache("test", path=path).set("pdf", b"%PDF-1.4", ttl=60)
+        SQLiteCache("test", path=path).set("search", {"best_flights": []}, ttl=60)
+
+        reopened = SQLiteCache("test", path=path)
+        assert reopened.get("pdf") == b"%PDF-1.4"
+        assert reopened.get("search") == {"best_flights": []}
+        assert SQLiteCache("other", path=path).get("pdf") is None
@@ -0,0 +1,54 @@
+import sys
+sys.path.append('')
+import json
+import logging
+import queue
+
+from utils.logger import BoundedQueueHandler, JsonFormatter, SamplingFilter
+
+
+def _record(level=logging.INFO, msg="Found %d flights", args=(3,)):
+    return logging.LogRecord("modules.Service_Api", level, __file__, 1, msg, args, None)
+
+
+def test_drop_policy_counts_records_when_queue_is_full():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2), policy="drop")
+    for _ in range(5):
+        handler.handle(_record())
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert handler.queue.get_nowait().getMessage() == "Found 3 flights"
+
+
+def test_sampling_never_drops_warnings():
+    sampler = SamplingFilter(0.0)
+    assert not sampler.filter(_record(logging.INFO))
+    assert sampler.filter(_record(logging.WARNING))
+    assert sampler.filter(_record(logging.ERROR))
+    assert sampler.sampled_out == 1
+
+
+def test_json_formatter_emits_one_object_per_record():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("api.routes", logging.ERROR, __file__, 1, "failed %s", ("search",), sys.exc_info())
+
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["level"] == "ERROR"
+    assert payload["logger"] == "api.routes"
+    assert payload["message"] == "failed search"
+    assert "ValueError: boom" in payload["exc_info"]
+
+
+def test_queued_records_keep_the_traceback_apart_from_the_message():
+    handler = BoundedQueueHandler(queue.Queue(), policy="block")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        handler.handle(logging.LogRecord("api.routes", logging.ERROR, __file__, 1, "failed %s", ("search",), sys.exc_info()))
+
+    payload = json.loads(JsonFormatter().format(handler.queue.get_nowait()))
+    assert payload["message"] == "failed search"
+    assert "ValueError: boom" in payload["exc_info"]
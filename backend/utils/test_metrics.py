@@ -0,0 +1,61 @@
+import sys
+sys.path.append('')
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils.metrics import Counter, Histogram, MetricsMiddleware, Registry, stage, stage_errors, stage_seconds
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0)))
+    counter = registry.register(Counter("errors_total", "Errors.", ("stage",)))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "llm")
+    counter.inc("llm")
+
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{stage="llm",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="llm",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{stage="llm",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{stage="llm"} 4' in text
+    assert 'errors_total{stage="llm"} 1' in text
+
+
+def test_stage_records_duration_and_errors():
+    before = stage_seconds.count("test_stage")
+    errors = stage_errors.value("test_stage")
+
+    async def main():
+        async with stage("test_stage"):
+            await asyncio.sleep(0)
+        try:
+            with stage("test_stage"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+
+    asyncio.run(main())
+    assert stage_seconds.count("test_stage") == before + 2
+    assert stage_errors.value("test_stage") == errors + 1
+
+
+def test_middleware_adds_server_timing_header():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        with stage("lookup"):
+            return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware, server_timing=True)
+    with TestClient(app) as client:
+        response = client.get("/items/7")
+
+    assert response.status_code == 200
+    header = response.headers["server-timing"]
+    assert header.startswith("lookup;dur=")
+    assert "total;dur=" in header
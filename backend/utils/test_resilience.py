@@ -0,0 +1,137 @@
+import asyncio
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+
+sys.path.append('')
+
+from utils.resilience import CircuitBreaker, CircuitOpenError, UpstreamGuard, hedged
+
+
+def test_hedge_fires_after_delay_and_fastest_wins():
+    async def scenario():
+        attempts = []
+
+        async def call():
+            attempts.append(time.monotonic())
+            # The first attempt is stuck, the hedged one answers quickly
+            await asyncio.sleep(1.0 if len(attempts) == 1 else 0.01)
+            return len(attempts)
+
+        start = time.monotonic()
+        result = await hedged(call, delay=0.05)
+        return result, len(attempts), time.monotonic() - start
+
+    result, attempts, elapsed = asyncio.run(scenario())
+    assert attempts == 2
+    assert result == 2
+    assert elapsed < 0.5
+
+
+def test_hedge_not_sent_when_first_attempt_is_fast():
+    async def scenario():
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            return "ok"
+
+        return await hedged(call, delay=0.05), calls
+
+    assert asyncio.run(scenario()) == ("ok", 1)
+
+
+def test_breaker_opens_then_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the single half-open probe
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_guard_times_out_and_fails_fast_once_open():
+    async def scenario():
+        guard = UpstreamGuard("slow", timeout=0.05, hedge=False,
+                              breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+        async def slow():
+            await asyncio.sleep(1.0)
+
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await guard.call(slow)
+        start = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            await guard.call(slow)
+        return guard.stats(), time.monotonic() - start
+
+    stats, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.01
+    assert stats["timeouts"] == 2
+    assert stats["rejected"] == 1
+    assert stats["breaker"]["state"] == "open"
+
+
+def test_guard_ignores_errors_that_are_not_upstream_failures():
+    async def scenario():
+        guard = UpstreamGuard("limited", breaker=CircuitBreaker(failure_threshold=1),
+                              is_failure=lambda error: not isinstance(error, PermissionError))
+
+        async def rejected():
+            raise PermissionError("rate limited locally")
+
+        with pytest.raises(PermissionError):
+            await guard.call(rejected)
+        return guard.breaker.state
+
+    assert asyncio.run(scenario()) == "closed"
+
+
+def test_guard_deadline_and_latency_start_after_admission():
+    @asynccontextmanager
+    async def congested_slot():
+        await asyncio.sleep(0.2)  # queued behind our own other calls
+        yield
+
+    async def scenario():
+        guard = UpstreamGuard("queued", timeout=0.1, hedge=False, admission=congested_slot,
+                              breaker=CircuitBreaker(failure_threshold=1))
+
+        async def fast():
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        return await guard.call(fast), guard
+
+    result, guard = asyncio.run(scenario())
+    assert result == "ok"
+    assert guard.breaker.state == "closed"
+    assert guard.latency.percentile(50) < 0.1
+
+
+def test_guard_timeouts_go_through_is_failure():
+    async def scenario():
+        guard = UpstreamGuard("lenient", timeout=0.01, breaker=CircuitBreaker(failure_threshold=1),
+                              is_failure=lambda error: not isinstance(error, asyncio.TimeoutError))
+
+        async def slow():
+            await asyncio.sleep(1.0)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await guard.call(slow)
+        return guard.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["timeouts"] == 1
+    assert stats["breaker"]["state"] == "closed"
@@ -0,0 +1,100 @@
+import asyncio
+import sys
+
+sys.path.append('')
+
+import pytest
+
+from utils.scheduler import PRIORITY_LLM, PRIORITY_SEARCH, Scheduler, SchedulerRejected, scheduler_from_env
+
+
+def test_search_lane_overtakes_queued_llm_calls():
+    async def scenario():
+        scheduler = Scheduler(max_concurrency=1, max_queue=10)
+        scheduler.register("serpapi", max_concurrency=4, priority=PRIORITY_SEARCH)
+        scheduler.register("llm", max_concurrency=4, priority=PRIORITY_LLM)
+        order = []
+
+        async def call(upstream, label):
+            async with scheduler.slot(upstream):
+                order.append(label)
+                await asyncio.sleep(0.01)
+
+        blocker = asyncio.create_task(call("llm", "llm-running"))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(call("llm", "llm-queued"))]
+        await asyncio.sleep(0)
+        queued.append(asyncio.create_task(call("serpapi", "search")))
+        await asyncio.gather(blocker, *queued)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["llm-running", "search", "llm-queued"]
+    assert stats["in_flight"] == 0
+    assert stats["upstreams"]["llm"]["admitted"] == 2
+
+
+def test_queue_timeout_and_full_queue_reject_early():
+    async def scenario():
+        scheduler = Scheduler(max_concurrency=8, max_queue=8)
+        scheduler.register("llm", max_concurrency=1, queue_timeout=0.05, max_queue=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("llm"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerRejected) as full:
+            await hold()
+        with pytest.raises(SchedulerRejected) as timed_out:
+            await waiter
+        release.set()
+        await holder
+        return full.value, timed_out.value, scheduler.stats()["upstreams"]["llm"]
+
+    full, timed_out, stats = asyncio.run(scenario())
+    assert full.status_code == 429
+    assert timed_out.status_code == 503
+    assert "Retry-After" in timed_out.headers
+    assert stats["rejected_queue_full"] == 1
+    assert stats["rejected_timeout"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_token_bucket_rejects_when_rate_budget_exceeds_deadline():
+    async def scenario():
+        scheduler = Scheduler()
+        scheduler.register("serpapi", max_concurrency=10, rate=1.0, burst=1.0, queue_timeout=0.1)
+        async with scheduler.slot("serpapi"):
+            pass
+        with pytest.raises(SchedulerRejected) as rejected:
+            async with scheduler.slot("serpapi"):
+                pass
+        return rejected.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+
+
+def test_limits_are_split_between_serve_workers(monkeypatch):
+    monkeypatch.setenv("SERVE_WORKERS", "3")
+    monkeypatch.setenv("LLM_BURST", "2")
+    scheduler = scheduler_from_env()
+    serpapi, llm = scheduler.lanes["serpapi"], scheduler.lanes["llm"]
+    assert scheduler.global_gate.capacity == 10 and serpapi.gate.capacity == 5 and llm.gate.capacity == 1
+    assert serpapi.bucket.rate == pytest.approx(10 / 3) and llm.bucket.rate == pytest.approx(1 / 3)
+    assert llm.bucket.burst == 1.0  # never below one call
+
+
+def test_fits_checks_a_batch_of_calls_against_the_rate_limit():
+    scheduler = Scheduler()
+    scheduler.register("llm", max_concurrency=4, rate=1.0, burst=4.0, queue_timeout=30.0)
+    scheduler.register("open", max_concurrency=4)
+    assert scheduler.fits("llm", 34) and not scheduler.fits("llm", 35)
+    assert scheduler.lanes["llm"].bucket.tokens == 4.0  # checking takes no tokens
+    assert scheduler.fits("open", 1000)  # no rate limit
+
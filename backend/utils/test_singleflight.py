@@ -0,0 +1,59 @@
+import asyncio
+import sys
+
+sys.path.append('')
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        group = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"calls": calls}
+
+        results = await asyncio.gather(*(group.do("key", work) for _ in range(10)))
+        return group, calls, results
+
+    group, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == {"calls": 1} for result in results)
+    assert group.stats() == {"calls": 1, "coalesced": 9, "in_flight": 0}
+
+
+def test_errors_fan_out_to_every_waiter():
+    async def scenario():
+        group = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        return await asyncio.gather(*(group.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelling_one_waiter_keeps_shared_call_alive():
+    async def scenario():
+        group = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(group.do("key", work))
+        second = asyncio.create_task(group.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    result, first_cancelled = asyncio.run(scenario())
+    assert result == "done"
+    assert first_cancelled
@@ -0,0 +1,23 @@
+import os
+
+# serve.py runs the app in several forked worker processes. Each has its own
+# scheduler and background loops, so process-wide limits are split between the
+# workers and singleton loops run in the first one only.
+
+
+def serving_workers() -> int:
+    """Worker processes serving the app (SERVE_WORKERS, set by serve.py; default: 1)."""
+    return max(1, int(os.getenv("SERVE_WORKERS", "1")))
+
+
+def worker_index() -> int:
+    """Index of this worker process, 0 to SERVE_WORKERS - 1 (SERVE_WORKER_INDEX, set by serve.py; default: 0)."""
+    return int(os.getenv("SERVE_WORKER_INDEX", "0"))
+
+
+def is_primary_worker() -> bool:
+    """Whether this process runs the once-per-deployment background loops (SERVE_WORKER_INDEX 0 or unset)."""
+    return worker_index() == 0
+
+
+__all__ = ["serving_workers", "worker_index", "is_primary_worker"]
@@ -9,6 +9,7 @@ const downloadPdfBtn = document.getElementById('download-pdf-btn');
 const API_URL = 'https://smartitinerary-2.onrender.com/plan-itinerary';
 
 // const API_URL = 'http://localhost:8000/plan-itinerary';
+const STREAM_URL = API_URL + '/stream';
 const PDF_URL = 'https://smartitinerary-2.onrender.com/generate-pdf';
 
 // Store the current itinerary text for PDF generation
@@ -59,7 +60,7 @@ form.addEventListener('submit', async (e) => {
   const payload = buildPayload(fd);
 
   try {
-    const res = await fetch(API_URL, {
+    const res = await fetch(STREAM_URL, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(payload),
@@ -69,10 +70,27 @@ form.addEventListener('submit', async (e) => {
       const err = await res.json().catch(() => ({ detail: res.statusText }));
       throw new Error(err.detail || 'Server error');
     }
-    const data = await res.json();
+
+    // Render search results and itinerary tokens as the server streams them
+    const found = [];
+    currentItinerary = '';
+    await readEventStream(res, (event, data) => {
+      if (event === 'flights' || event === 'hotels' || event === 'sights') {
+        found.push(STREAM_LABELS[event]);
+        setStatus('🔎 Found ' + found.join(', ') + '...');
+      } else if (event === 'itinerary') {
+        if (!currentItinerary) setStatus('✍️ Writing your itinerary...');
+        currentItinerary += data.delta;
+        itineraryDiv.innerHTML = renderMarkdownLite(currentItinerary);
+      } else if (event === 'done') {
+        currentItinerary = data.itinerary || currentItinerary;
+      } else if (event === 'error') {
+        throw new Error(data.detail || 'Server error');
+      }
+    });
+
+    if (!currentItinerary) currentItinerary = 'No itinerary returned.';
     setStatus('✅ Itinerary generated successfully!', 'success');
-    // Backend returns markdown-like text. We can do a very small conversion for headers + bold
-    currentItinerary = data.itinerary || 'No itinerary returned.';
     itineraryDiv.innerHTML = renderMarkdownLite(currentItinerary);
 
     // Show download button after successful generation
@@ -92,6 +110,32 @@ form.addEventListener('submit', async (e) => {
   }
 });
 
+const STREAM_LABELS = { flights: 'flights', hotels: 'hotels', sights: 'attractions' };
+
+// Parse a Server-Sent Events response body and call onEvent(event, data) per frame
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 function renderMarkdownLite(markdown) {
   // Extremely tiny markdown renderer (safe subset) - replace headings & bold
   let html = markdown